@@ -3,20 +3,28 @@ import os
 import json
 import random
 import math
+import bisect
+import heapq
+import itertools
+import operator
 import logging
+import time
+import datetime
 import re
 import csv
+import threading
 import concurrent.futures
 import requests
 import matplotlib.pyplot as plt
 import copy
-from collections import deque, Counter
-from decimal import Decimal, ROUND_DOWN
-from enum import Enum
+import functools
+from collections import deque, Counter, OrderedDict
+from decimal import Decimal, ROUND_DOWN, InvalidOperation
+from fractions import Fraction
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtWidgets import QSplashScreen
 from PyQt5.QtCore import Qt, QTimer
-from difflib import get_close_matches
+from difflib import SequenceMatcher
 from PyQt5.QtGui import QPixmap, QFont, QPainter, QColor
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 
@@ -36,6 +44,39 @@ SPLASH_TEXT_COLOR = "#FF5733"  # Orange-Red color
 SPLASH_OUTLINE_COLOR = "#000000"  # Black color
 SPLASH_GLOW_COLOR = "#FFD700"  # Gold color
 
+# Delay after the last keystroke before the Shop search runs, in milliseconds
+SHOP_SEARCH_DEBOUNCE_MS = 250
+
+# Base URL of the D&D 5e API used by the Shop and item descriptions.
+# Set DND_API_BASE_URL to point at a local stand-in (see dnd_api_stub_server.py)
+DND_API_BASE_URL = os.environ.get('DND_API_BASE_URL', 'https://www.dnd5eapi.co').rstrip('/')
+
+# Maximum number of matches listed by the inventory-wide search
+INVENTORY_SEARCH_RESULT_LIMIT = 100
+
+# Directory for the action journal (undo history and crash recovery).
+# Empty uses the application data directory; set DND_JOURNAL_DIR to override
+JOURNAL_DIR = os.environ.get('DND_JOURNAL_DIR', '')
+
+# Journal lines written before the state is snapshotted and the journal file starts over
+JOURNAL_SNAPSHOT_INTERVAL = 200
+
+# Number of actions that can be undone
+JOURNAL_UNDO_LIMIT = 500
+
+# Currency ledger lines between balance checkpoints; balance and session queries read at most this many
+LEDGER_CHECKPOINT_INTERVAL = 500
+
+# Number of coins (of any denomination) that weigh one pound
+COINS_PER_POUND = 50
+
+# Seconds the exact item allocation may search before settling for the best split found so far
+EXACT_ALLOCATION_TIME_BUDGET = 2.0
+
+# Coin system (from coin_systems.json) used when the app starts.
+# Costs from the D&D API are always in the units of the 'Standard' system
+DEFAULT_COIN_SYSTEM = 'Standard'
+
 # =================== End of Configurable Sections ===================
 
 def resource_path(relative_path):
@@ -58,12 +99,550 @@ with open(resource_path('base-item-tables.json'), 'r') as f:
 with open(resource_path('gems.json'), 'r') as f:
     gems_data = json.load(f)
 
-class Currency(Enum):
-    PP = 'pp'
-    GP = 'gp'
-    EP = 'ep'
-    SP = 'sp'
-    CP = 'cp'
+with open(resource_path('coin_systems.json'), 'r') as f:
+    coin_system_definitions = json.load(f)
+
+class Coin:
+    """One denomination of a CoinSystem: value is its code ('gp') and name its display name ('GP')."""
+    __slots__ = ('value', 'name')
+
+    def __init__(self, value, name):
+        self.value = value
+        self.name = name
+
+    def __repr__(self):
+        return f"Coin({self.value!r}, {self.name!r})"
+
+class CoinSystem:
+    """
+    A set of coin denominations defined in coin_systems.json.
+
+    Iterating yields the coins in display order. price_coin is the coin that list prices quoted
+    in gp are paid in, and conversion_rates holds the rates between coins as defined; they are
+    compiled into a CurrencyRateTable and a CoinPaymentSolver, which raise ValueError if they
+    are inconsistent or too fine-grained to pay with.
+    """
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.description = definition.get('description', '')
+        self.coins = [Coin(entry['code'], entry.get('name', entry['code'].upper())) for entry in definition['coins']]
+        self.by_code = {coin.value: coin for coin in self.coins}
+        self.base = definition.get('base', self.coins[-1].value)
+        self.price_coin = definition.get('price_coin', 'gp')
+        self.conversion_rates = definition['rates']
+        for code in (self.base, self.price_coin):
+            if code not in self.by_code:
+                raise ValueError(f"Coin system '{name}' has no coin '{code}'.")
+        self.rates = CurrencyRateTable(self.conversion_rates, self.codes(), self.base)
+        self.solver = CoinPaymentSolver(self.rates.base_values)
+
+    def __iter__(self):
+        return iter(self.coins)
+
+    def __contains__(self, code):
+        return code in self.by_code
+
+    def coin(self, code):
+        return self.by_code[code]
+
+    def codes(self):
+        return [coin.value for coin in self.coins]
+
+def load_coin_systems(definitions):
+    """Build the CoinSystem of every definition, leaving out (and logging) broken ones."""
+    systems = {}
+    for name, definition in definitions.items():
+        try:
+            systems[name] = CoinSystem(name, definition)
+        except (KeyError, TypeError, ValueError) as e:
+            logging.error(f"Skipping coin system '{name}' in coin_systems.json: {e}")
+    return systems
+
+class CurrencyRateTable:
+    """Exact all-pairs conversion matrix compiled from the pairwise rates in conversion_rates.
+
+    Every currency is valued as a Fraction of the base unit by walking the rate graph once,
+    so that lookups are plain dict reads and chained conversions (cp -> ep -> pp) agree with
+    the direct rate, however many denominations there are.
+    """
+    # A given rate agrees with the compiled one if it is within this fraction of it, or within
+    # half the last of the 4 decimals the customization dialog shows
+    TOLERANCE = Fraction(1, 10000)
+    ROUNDING = Fraction(1, 20000)
+
+    def __init__(self, conversion_rates, currencies, base):
+        self.base = base
+        self.currencies = list(currencies)
+        given = {}
+        for currency, targets in conversion_rates.items():
+            for target_currency, rate in targets.items():
+                if rate and currency in self.currencies and target_currency in self.currencies:
+                    given[(currency, target_currency)] = Fraction(str(rate))
+        # Of the two directions of a pair, the one that is at least 1 is trusted (1 GP = 10 SP
+        # rather than 1 SP = 0.1 GP): it is the figure users type exactly, while the dialog
+        # cannot even show an inverse as small as 1/50000
+        given = {
+            (currency, target_currency): rate for (currency, target_currency), rate in given.items()
+            if rate >= 1 or given.get((target_currency, currency), 0) < 1
+        }
+
+        self.base_values = self.compile_base_values(given)
+        self.rates = {
+            (currency, target_currency): self.base_values[currency] / self.base_values[target_currency]
+            for currency in self.currencies for target_currency in self.currencies
+        }
+        contradictions = [
+            (currency, target_currency, rate, self.rates[(currency, target_currency)])
+            for (currency, target_currency), rate in given.items()
+            if (currency, target_currency) in self.rates
+            and abs(rate - self.rates[(currency, target_currency)])
+            > max(self.rates[(currency, target_currency)] * self.TOLERANCE, self.ROUNDING)
+        ]
+        if contradictions:
+            raise ValueError("Conversion rates contradict each other:\n" + "\n".join(
+                f"1 {currency.upper()} = {float(rate):g} {target_currency.upper()}, "
+                f"but the other rates give {float(derived):g}"
+                for currency, target_currency, rate, derived in contradictions
+            ))
+        self.float_rates = {pair: float(rate) for pair, rate in self.rates.items()}
+        self.decimal_rates = {
+            pair: Decimal(rate.numerator) / Decimal(rate.denominator) for pair, rate in self.rates.items()
+        }
+
+    def compile_base_values(self, given):
+        """
+        Value every currency in base units by walking the given rates outward from the base.
+
+        :param given: {(from, to): Fraction} rates as entered, trusted direction only.
+        :return: {currency: Fraction} value of one coin in base units.
+        """
+        pair_rates = {}
+        for (currency, target_currency), rate in given.items():
+            pair_rates[(currency, target_currency)] = rate
+            pair_rates.setdefault((target_currency, currency), 1 / rate)
+
+        values = {self.base: Fraction(1)}
+        pending = deque([self.base])
+        while pending:
+            known = pending.popleft()
+            for currency in self.currencies:
+                rate = pair_rates.get((currency, known))
+                if currency not in values and rate:
+                    values[currency] = values[known] * rate
+                    pending.append(currency)
+        missing = [currency.upper() for currency in self.currencies if currency not in values]
+        if missing:
+            raise ValueError(f"No conversion rate links {', '.join(missing)} to {self.base.upper()}.")
+        return values
+
+    def rate(self, from_currency, to_currency):
+        """Exact number of to_currency coins worth one from_currency coin."""
+        return self.rates.get((from_currency, to_currency))
+
+    def decimal_rate(self, from_currency, to_currency):
+        return self.decimal_rates.get((from_currency, to_currency))
+
+    def float_rate(self, from_currency, to_currency):
+        return self.float_rates.get((from_currency, to_currency))
+
+class CoinPaymentSolver:
+    """Exact coin payments, with change given back, for one set of denominations.
+
+    Amounts are handled in integer units. A payment never contains a superfluous coin:
+    the change is less than the smallest coin paid and is made up of the fewest coins.
+    When every denomination divides the next (as CP, SP, EP, GP and PP do), choosing the
+    smallest coin paid fixes the amount paid, and the best payment for it is a bounded
+    greedy, so solving takes the same time for 10 cp as for hundreds of millions. Other
+    denominations need a table of the fewest coins for every amount below the largest coin,
+    so the largest coin may be worth at most CHANGE_TABLE_LIMIT units.
+    """
+    CHANGE_TABLE_LIMIT = 100000
+    MIN_WEIGHT = 'Lightest purse afterwards'
+    MIN_COINS = 'Fewest coins spent'
+    PRESERVE_HIGH = 'Keep high denominations'
+    POLICIES = (MIN_WEIGHT, MIN_COINS, PRESERVE_HIGH)
+
+    def __init__(self, coin_values):
+        """
+        :param coin_values: {coin: Fraction} value of one coin in a common unit.
+        :raises ValueError: if the denominations do not divide each other and the largest coin
+            is worth more than CHANGE_TABLE_LIMIT units.
+        """
+        self.coins = sorted(coin_values, key=coin_values.get)
+        scale = 1
+        for value in coin_values.values():
+            scale = scale * value.denominator // math.gcd(scale, value.denominator)
+        self.scale = scale
+        self.values = [int(coin_values[coin] * scale) for coin in self.coins]
+        self.divisible = all(higher % lower == 0 for lower, higher in zip(self.values, self.values[1:]))
+        self.change_table = None
+        if not self.divisible:
+            if self.values[-1] > self.CHANGE_TABLE_LIMIT:
+                largest = self.coins[-1]
+                raise ValueError(
+                    f"With these rates the coins do not divide into each other, so paying needs a table of "
+                    f"every amount up to 1 {largest.upper()}: {self.values[-1]:,} amounts, more than the "
+                    f"{self.CHANGE_TABLE_LIMIT:,} allowed. Use rates with fewer decimals."
+                )
+            self.change_table = self.build_change_table(self.values[-1])
+
+    def build_change_table(self, limit):
+        """Fewest-coin counts for every amount below limit. An amount that no coins make up
+        exactly gets the counts of the nearest smaller one; the shop keeps the difference."""
+        empty = (0,) * len(self.values)
+        best = [(0, empty)] + [None] * (limit - 1)
+        for amount in range(1, limit):
+            for index, value in enumerate(self.values):
+                if value > amount:
+                    break
+                previous = best[amount - value]
+                if previous is not None and (best[amount] is None or previous[0] + 1 < best[amount][0]):
+                    counts = list(previous[1])
+                    counts[index] += 1
+                    best[amount] = (previous[0] + 1, tuple(counts))
+        table = []
+        for entry in best:
+            if entry is not None:
+                last = entry[1]
+            table.append(last)
+        return table
+
+    def solve(self, holdings, price, policy):
+        """
+        Choose the coins to hand over for a purchase and the change to take back.
+
+        :param holdings: {coin: int} coins in the purse.
+        :param price: Fraction price in the unit of coin_values; rounded up to a whole unit.
+        :param policy: One of POLICIES.
+        :return: ({coin: paid}, {coin: change}), or None if the purse holds too little.
+        """
+        counts = [int(holdings.get(coin, 0)) for coin in self.coins]
+        target = math.ceil(price * self.scale)
+        if target <= 0:
+            return {coin: 0 for coin in self.coins}, {coin: 0 for coin in self.coins}
+        if sum(count * value for count, value in zip(counts, self.values)) < target:
+            return None
+
+        candidates = [self.spend_lowest_first(counts, target)]
+        if self.divisible:
+            candidates.extend(self.divisible_payments(counts, target, policy))
+        paid, change = min(candidates, key=lambda candidate: self.policy_key(policy, counts, *candidate))
+        return dict(zip(self.coins, paid)), dict(zip(self.coins, change))
+
+    def divisible_payments(self, counts, target, policy):
+        """Best payment for each choice of smallest coin paid; only valid when denominations divide each other."""
+        for lowest, value in enumerate(self.values):
+            amount = -(-target // value) * value
+            change = self.fewest_coins(amount - target)
+            if policy == self.MIN_COINS:
+                paid = self.take_from_top(counts, amount, lowest)
+            else:
+                # Paying with the most coins, or the lowest ones, is keeping the rest in the fewest, highest coins
+                available = sum(counts[index] * self.values[index] for index in range(lowest, len(counts)))
+                kept = self.take_from_top(counts, available - amount, lowest) if available >= amount else None
+                paid = None if kept is None else [
+                    counts[index] - kept[index] if index >= lowest else 0 for index in range(len(counts))
+                ]
+            if paid is not None:
+                yield paid, change
+
+    def take_from_top(self, counts, amount, lowest):
+        """Make up amount exactly from coins at index lowest and up, highest first; None if it cannot be done."""
+        taken = [0] * len(counts)
+        for index in range(len(counts) - 1, lowest - 1, -1):
+            taken[index] = min(counts[index], amount // self.values[index])
+            amount -= taken[index] * self.values[index]
+        return taken if amount == 0 else None
+
+    def spend_lowest_first(self, counts, target):
+        """Pay with as many low coins as possible, reaching up only for what they cannot cover."""
+        paid = [0] * len(counts)
+        remaining = target
+        lower_total = sum(count * value for count, value in zip(counts, self.values))
+        for index in range(len(counts) - 1, -1, -1):
+            lower_total -= counts[index] * self.values[index]
+            if remaining > lower_total:
+                paid[index] = -(-(remaining - lower_total) // self.values[index])
+                remaining -= paid[index] * self.values[index]
+            if remaining <= 0:
+                break
+        return paid, self.fewest_coins(-remaining)
+
+    def fewest_coins(self, amount):
+        """Fewest coins, any number of each, making up amount units (exact when denominations divide each other)."""
+        if self.divisible:
+            counts = [0] * len(self.values)
+            for index in range(len(self.values) - 1, -1, -1):
+                counts[index], amount = divmod(amount, self.values[index])
+            return counts
+        counts = list(self.change_table[amount % self.values[-1]])
+        counts[-1] += amount // self.values[-1]
+        return counts
+
+    def consolidate(self, holdings, fee_rate=Fraction(0)):
+        """
+        Exchange coins for the fewest coins of the same value, less a fee on the value exchanged.
+
+        :param holdings: {coin: int} coins in the purse.
+        :param fee_rate: Fraction of the exchanged value kept by the money changer.
+        :return: ({coin: handed in}, {coin: received}, fee in units).
+        """
+        counts = [int(holdings.get(coin, 0)) for coin in self.coins]
+        total = sum(count * value for count, value in zip(counts, self.values))
+        # The fee depends on which coins change hands, and those on the fee; raise it until it covers them
+        fee = 0
+        while True:
+            target = self.fewest_coins(total - fee)
+            handed = [max(count - wanted, 0) for count, wanted in zip(counts, target)]
+            exchanged = sum(count * value for count, value in zip(handed, self.values))
+            required = math.ceil(exchanged * fee_rate)
+            if required <= fee:
+                break
+            fee = required
+        received = [max(wanted - count, 0) for count, wanted in zip(counts, target)]
+        return dict(zip(self.coins, handed)), dict(zip(self.coins, received)), fee
+
+    def policy_key(self, policy, counts, paid, change):
+        final = [count - spent + back for count, spent, back in zip(counts, paid, change)]
+        if policy == self.MIN_COINS:
+            return sum(paid), sum(change)
+        if policy == self.PRESERVE_HIGH:
+            return tuple(-count for count in reversed(final))
+        return sum(final), sum(paid)
+
+def binomial_draw(trials, probability):
+    """Number of successes in trials that each succeed with probability. Uses
+    random.binomialvariate where Python has it (3.12+), otherwise draws the trials one by one,
+    which is cheap for coin leftovers as there are always fewer of them than party members."""
+    if probability >= 1:
+        return trials
+    if hasattr(random, 'binomialvariate'):
+        return random.binomialvariate(trials, probability)
+    return sum(random.random() < probability for _ in range(trials))
+
+
+def multinomial_draw(count, slots):
+    """
+    Share count identical things out at random, each equally likely to land in any slot, in a
+    single multinomial draw: each slot takes a binomial share of what the slots before it left.
+
+    :return: Count for each of the slots, adding up to count.
+    """
+    counts = []
+    for remaining_slots in range(slots, 0, -1):
+        drawn = binomial_draw(count, 1 / remaining_slots)
+        counts.append(drawn)
+        count -= drawn
+    return counts
+
+
+class ItemAllocator:
+    """Splits loot items between party members so that their totals come out as even as possible.
+
+    Every method starts from the value each member already holds (their coins). The heuristic
+    methods run in O(n log n) for n items, so large loot pools split quickly; the exact method
+    searches for the split with the smallest largest share within time_budget seconds.
+    """
+    KARMARKAR_KARP = 'Karmarkar-Karp'
+    LARGEST_FIRST = 'Largest first'
+    RANDOM_ORDER = 'Random order'
+    EXACT = 'Exact (time limited)'
+    METHODS = (KARMARKAR_KARP, LARGEST_FIRST, RANDOM_ORDER, EXACT)
+
+    def __init__(self, time_budget=EXACT_ALLOCATION_TIME_BUDGET):
+        self.time_budget = time_budget
+        self.last_search = None
+
+    def allocate(self, loads, values, method):
+        """
+        :param loads: Value each member holds before the items are handed out.
+        :param values: Value of each item.
+        :param method: One of METHODS.
+        :return: For each member, the indices of the items they receive.
+        """
+        if method in (self.KARMARKAR_KARP, self.EXACT):
+            loads, values, scale = self.whole_units(loads, values)
+            if method == self.EXACT:
+                return self.branch_and_bound(loads, values, scale)
+            return self.karmarkar_karp(loads, values)
+        order = list(range(len(values)))
+        if method == self.LARGEST_FIRST:
+            order.sort(key=values.__getitem__, reverse=True)
+        else:
+            random.shuffle(order)
+        return self.fill_poorest(loads, values, order)
+
+    @staticmethod
+    def whole_units(loads, values):
+        """Scale Decimal amounts to integers, which compare and add much faster."""
+        amounts = [Decimal(amount) for amount in itertools.chain(loads, values)]
+        places = max([0] + [-amount.as_tuple().exponent for amount in amounts])
+        scale = 10 ** places
+        units = [int(amount * scale) for amount in amounts]
+        return units[:len(loads)], units[len(loads):], scale
+
+    def fill_poorest(self, loads, values, order):
+        """Hand each item, in order, to the member holding the least so far."""
+        shares = [[] for _ in loads]
+        heap = [(load, member) for member, load in enumerate(loads)]
+        heapq.heapify(heap)
+        for index in order:
+            load, member = heap[0]
+            shares[member].append(index)
+            heapq.heapreplace(heap, (load + values[index], member))
+        return shares
+
+    def karmarkar_karp(self, loads, values):
+        """Multi-way largest differencing. Every item starts as a partial split of its own;
+        the two splits with the widest spread are merged, pairing the fullest share of one
+        with the emptiest share of the other, until a single split is left. Amounts are integers."""
+        members = len(loads)
+        counter = itertools.count()
+
+        def entry(shares):
+            shares.sort(key=operator.itemgetter(0), reverse=True)
+            return (shares[-1][0] - shares[0][0], next(counter), shares)
+
+        # A share is [total, item indices, member]; only the members' own loads carry a member.
+        # An item stays a bare index until it is merged: alone it can only join the emptiest
+        # share of the other split.
+        heap = [entry([[load, [], member] for member, load in enumerate(loads)])]
+        heap.extend((-value, next(counter), index) for index, value in enumerate(values))
+        heapq.heapify(heap)
+        while len(heap) > 1:
+            first = heapq.heappop(heap)[2]
+            second = heapq.heappop(heap)[2]
+            if isinstance(first, int):
+                first, second = second, first
+            if isinstance(first, int):
+                first = [[values[first], [first], None]] + [[0, [], None] for _ in range(members - 1)]
+            if isinstance(second, int):
+                first[-1][0] += values[second]
+                first[-1][1].append(second)
+            else:
+                for share, other in zip(first, reversed(second)):
+                    share[0] += other[0]
+                    if len(share[1]) < len(other[1]):
+                        share[1], other[1] = other[1], share[1]
+                    share[1].extend(other[1])
+                    if share[2] is None:
+                        share[2] = other[2]
+            heapq.heappush(heap, entry(first))
+        shares = [[] for _ in loads]
+        for total, items, member in heap[0][2]:
+            shares[member] = items
+        return shares
+
+    def branch_and_bound(self, loads, values, scale):
+        """
+        Depth-first search for the split whose largest share is smallest, starting from the
+        Karmarkar-Karp split. Items are placed largest first, each into the members in order
+        of their share, skipping members whose share equals one already tried and any move
+        that cannot beat the best split found. Stops early once the best split reaches the
+        lower bound, or when time_budget runs out.
+
+        :param loads: Integer amount each member holds before the items are handed out.
+        :param values: Integer value of each item.
+        :param scale: Units per gp, to report the search in gp.
+        :return: For each member, the indices of the items they receive. The outcome of the
+            search is left in last_search: {'optimal', 'largest_share', 'lower_bound', 'gap',
+            'nodes', 'elapsed'}, amounts in gp.
+        """
+        started = time.perf_counter()
+        deadline = started + self.time_budget
+        members = len(loads)
+        order = sorted(range(len(values)), key=values.__getitem__, reverse=True)
+        sizes = [values[index] for index in order]
+
+        best_shares = self.karmarkar_karp(loads, values)
+        best = max(load + sum(values[index] for index in share) for load, share in zip(loads, best_shares))
+        lower_bound = max(-(-(sum(loads) + sum(values)) // members), max(loads))
+        if sizes:
+            lower_bound = max(lower_bound, min(loads) + sizes[0])
+
+        shares = list(loads)
+        placed = [None] * len(sizes)
+
+        def candidates(depth):
+            # Members to try for the item at depth, poorest last so that pop() takes it first
+            seen = set()
+            options = []
+            for member in sorted(range(members), key=shares.__getitem__):
+                share = shares[member]
+                if share + sizes[depth] >= best:
+                    break
+                if share not in seen:
+                    seen.add(share)
+                    options.append(member)
+            options.reverse()
+            return options
+
+        nodes = 0
+        timed_out = False
+        stack = [candidates(0)] if sizes and best > lower_bound else []
+        while stack:
+            depth = len(stack) - 1
+            if placed[depth] is not None:
+                shares[placed[depth]] -= sizes[depth]
+                placed[depth] = None
+            options = stack[-1]
+            if not options:
+                stack.pop()
+                continue
+            member = options.pop()
+            if shares[member] + sizes[depth] >= best:
+                # Options run from poorest to richest, so none of the rest can do better either
+                options.clear()
+                continue
+            shares[member] += sizes[depth]
+            placed[depth] = member
+            nodes += 1
+            if depth + 1 < len(sizes):
+                stack.append(candidates(depth + 1))
+            else:
+                best = max(shares)
+                best_shares = [[] for _ in loads]
+                for position, owner in enumerate(placed):
+                    best_shares[owner].append(order[position])
+                if best <= lower_bound:
+                    break
+            if nodes % 4096 == 0 and time.perf_counter() > deadline:
+                timed_out = True
+                break
+
+        optimal = not timed_out
+        self.last_search = {
+            'optimal': optimal,
+            'largest_share': Decimal(best) / scale,
+            'lower_bound': Decimal(lower_bound) / scale,
+            'gap': Decimal(0 if optimal else best - lower_bound) / scale,
+            'nodes': nodes,
+            'elapsed': time.perf_counter() - started,
+        }
+        return best_shares
+
+    @staticmethod
+    def fairness(totals):
+        """
+        :param totals: Final value held by each member.
+        :return: {'fair_share', 'spread', 'max_deviation', 'gini'}; spread is richest minus
+            poorest and gini runs from 0 (perfectly even) towards 1.
+        """
+        totals = sorted(Decimal(total) for total in totals)
+        count = len(totals)
+        overall = sum(totals, Decimal('0'))
+        fair_share = overall / count
+        gini = Decimal('0')
+        if overall > 0:
+            gini = sum((2 * rank - count - 1) * total for rank, total in enumerate(totals, 1)) / (count * overall)
+        return {
+            'fair_share': fair_share,
+            'spread': totals[-1] - totals[0],
+            'max_deviation': max(abs(total - fair_share) for total in totals),
+            'gini': gini,
+        }
+
 
 class CurrencyCustomizationDialog(QtWidgets.QDialog):
     def __init__(self, parent=None):
@@ -71,20 +650,17 @@ class CurrencyCustomizationDialog(QtWidgets.QDialog):
         self.setWindowTitle("Customize Currency Rates")
         self.layout = QtWidgets.QFormLayout(self)
         self.rate_inputs = {}
-        for currency in Currency:
+        coin_system = self.parent().coin_system
+        for currency in coin_system:
             h_layout = QtWidgets.QHBoxLayout()
-            for target_currency in Currency:
+            for target_currency in coin_system:
                 if target_currency != currency:
                     label = QtWidgets.QLabel(f"{currency.name} to {target_currency.name}")
                     input = QtWidgets.QDoubleSpinBox()
                     input.setDecimals(4)
                     input.setRange(0.0001, 1000000)
                     input.setSingleStep(0.01)
-                    rate = self.parent().conversion_rates.get(currency.value, {}).get(target_currency.value, None)
-                    if rate is None:
-                        inverse_rate = self.parent().conversion_rates.get(target_currency.value, {}).get(currency.value, None)
-                        if inverse_rate:
-                            rate = 1 / inverse_rate
+                    rate = self.parent().currency_rates.float_rate(currency.value, target_currency.value)
                     if rate is not None:
                         input.setValue(rate)
                     else:
@@ -108,6 +684,1583 @@ class CurrencyCustomizationDialog(QtWidgets.QDialog):
                 rates[currency][target_currency] = rate
         return rates
 
+class ApiNameIndex:
+    """Lookup tables over one D&D API index list (the 'results' of /api/equipment or /api/magic-items).
+
+    Built once when the list is loaded so that name matching does not rescan the list,
+    re-run the punctuation regex or call difflib over every entry for each lookup.
+    """
+    FUZZY_CUTOFF = 0.8
+
+    def __init__(self, results):
+        self.results = results
+        self.exact = {}
+        self.normalized = {}
+        self.normalized_names = []
+        self.normalized_lengths = set()
+        self.trigrams = {}
+        self.first_position = {}
+        self.names_by_length = {}
+        self.fuzzy_cache = {}
+        for position, item in enumerate(results):
+            name = item['name']
+            self.exact.setdefault(name.lower(), []).append(position)
+            normalized_name = self.normalize(name)
+            self.normalized_names.append(normalized_name)
+            self.normalized.setdefault(normalized_name, []).append(position)
+            self.normalized_lengths.add(len(normalized_name))
+            for trigram in self.get_trigrams(normalized_name):
+                self.trigrams.setdefault(trigram, set()).add(position)
+            if name not in self.first_position:
+                self.first_position[name] = position
+                self.names_by_length.setdefault(len(name), []).append(name)
+
+    @staticmethod
+    def normalize(name):
+        return re.sub(r'[^\w\s]', '', name).lower()
+
+    @staticmethod
+    def get_trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def exact_matches(self, item_name):
+        """Positions whose name equals item_name, ignoring case."""
+        return self.exact.get(item_name.lower(), [])
+
+    def normalized_matches(self, item_name):
+        """Positions where either normalized name contains the other, in list order."""
+        normalized_input = self.normalize(item_name)
+        if not normalized_input:
+            return list(range(len(self.results)))
+        positions = set()
+        # Entries contained in the input: look up every substring of a length that occurs in the list.
+        input_length = len(normalized_input)
+        for length in self.normalized_lengths:
+            for start in range(input_length - length + 1):
+                positions.update(self.normalized.get(normalized_input[start:start + length], ()))
+        # Entries containing the input: every input trigram must occur in the entry.
+        input_trigrams = self.get_trigrams(normalized_input)
+        if input_trigrams:
+            candidates = set.intersection(*(self.trigrams.get(t, set()) for t in input_trigrams))
+        else:
+            candidates = range(len(self.results))
+        positions.update(p for p in candidates if normalized_input in self.normalized_names[p])
+        return sorted(positions)
+
+    def fuzzy_match(self, item_name):
+        """Same result as get_close_matches(item_name, names, n=1, cutoff=0.8), or None."""
+        if item_name in self.fuzzy_cache:
+            return self.fuzzy_cache[item_name]
+        cutoff = self.FUZZY_CUTOFF
+        input_length = len(item_name)
+        # ratio() <= 2 * min(len) / (len_a + len_b), so only a band of lengths can reach the cutoff.
+        min_length = int(input_length * cutoff / (2 - cutoff)) - 1
+        max_length = int(input_length * (2 - cutoff) / cutoff) + 1
+        candidates = []
+        for length in range(max(min_length, 0), max_length + 1):
+            candidates.extend(self.names_by_length.get(length, ()))
+        # Try names sharing the most trigrams first so the best score is found early and
+        # the quick upper bounds can discard the rest.
+        shared = Counter()
+        for trigram in self.get_trigrams(self.normalize(item_name)):
+            for position in self.trigrams.get(trigram, ()):
+                shared[self.results[position]['name']] += 1
+        candidates.sort(key=lambda name: shared[name], reverse=True)
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(item_name)
+        best = None
+        for name in candidates:
+            matcher.set_seq1(name)
+            floor = cutoff if best is None else max(cutoff, best[0])
+            if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+                continue
+            score = matcher.ratio()
+            if score >= cutoff and (best is None or (score, name) > best):
+                best = (score, name)
+        match = best[1] if best else None
+        self.fuzzy_cache[item_name] = match
+        return match
+
+    def matches(self, item_name):
+        """Yield index entries in the order the exact, normalized and fuzzy passes try them."""
+        for position in self.exact_matches(item_name):
+            yield self.results[position]
+        for position in self.normalized_matches(item_name):
+            yield self.results[position]
+        matched_name = self.fuzzy_match(item_name)
+        if matched_name is not None:
+            for position in self.exact.get(matched_name.lower(), []):
+                if self.results[position]['name'] == matched_name:
+                    yield self.results[position]
+
+class DndApiClient:
+    """
+    Shared GET access to the D&D 5e API.
+
+    Concurrent requests for the same URL are coalesced into a single fetch whose
+    result every caller receives, and successful decoded responses are kept in a
+    small LRU cache so index lists and item details are not fetched or parsed again.
+    Every caller gets its own deep copy of the decoded JSON, so changing a response
+    cannot alter what later callers receive.
+    """
+
+    def __init__(self, cache_size=256, max_workers=10):
+        self.cache_size = cache_size
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._cache = OrderedDict()
+
+    def get_json(self, url):
+        """
+        Fetch and decode a URL, sharing in-flight requests and cached results.
+
+        :param url: Absolute URL to fetch.
+        :return: Decoded JSON (a copy the caller may change), or None if the server did not
+            answer 200 with valid JSON.
+        :raises requests.exceptions.RequestException: On network errors.
+        """
+        with self._lock:
+            if url in self._cache:
+                self._cache.move_to_end(url)
+                return copy.deepcopy(self._cache[url])
+            future = self._in_flight.get(url)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._in_flight[url] = future
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            data = self._fetch(url)
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[url]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[url]
+            if data is not None:
+                self._cache[url] = data
+                self._cache.move_to_end(url)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        future.set_result(data)
+        return copy.deepcopy(data)
+
+    def submit(self, url):
+        """Fetch a URL on the client's worker pool; returns a Future of get_json(url)."""
+        return self.executor.submit(self.get_json, url)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _fetch(self, url):
+        response = requests.get(url)
+        if response.status_code != 200:
+            logging.error(f"Failed to fetch from {url}: Status code {response.status_code}")
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            logging.error(f"Invalid JSON response from {url}")
+            return None
+
+class ShopSearchIndex:
+    """
+    Sorted suffix array over the names of the API index entries available in the Shop.
+
+    Every substring of a name is a prefix of one of its suffixes, so a binary search
+    for the search term finds exactly the entries whose name contains it.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        suffixes = []
+        for position, entry in enumerate(entries):
+            name = entry['name'].lower()
+            for start in range(len(name)):
+                suffixes.append((name[start:], position))
+        suffixes.sort()
+        self.suffixes = [suffix for suffix, _ in suffixes]
+        self.positions = [position for _, position in suffixes]
+
+    def search(self, search_term):
+        """Entries whose name contains search_term (case-insensitive), in index order."""
+        search_term = search_term.lower()
+        found = set()
+        start = bisect.bisect_left(self.suffixes, search_term)
+        for i in range(start, len(self.suffixes)):
+            if not self.suffixes[i].startswith(search_term):
+                break
+            found.add(self.positions[i])
+        return [self.entries[position] for position in sorted(found)]
+
+class ShopDetailSignals(QtCore.QObject):
+    """Carries item detail fetches completed on worker threads back to the GUI thread."""
+    loaded = QtCore.pyqtSignal(str, object)
+
+INVENTORY_CATEGORIES = ['Weapons', 'Armor', 'Miscellaneous Items', 'Gems', 'Art Objects', 'Magic Items']
+
+# Table columns per inventory category as (header, InventoryRecord attribute)
+INVENTORY_COLUMNS = {
+    'Weapons': [('Name', 'name'), ('Value (gp)', 'value'), ('Weight (lbs)', 'weight'),
+                ('Bought from Shop', 'bought_from_shop'), ('Description', 'description')],
+    'Armor': [('Name', 'name'), ('Value (gp)', 'value'), ('Weight (lbs)', 'weight'),
+              ('Bought from Shop', 'bought_from_shop'), ('Description', 'description')],
+    'Miscellaneous Items': [('Name', 'name'), ('Value (gp)', 'value'), ('Weight (lbs)', 'weight'),
+                            ('Bought from Shop', 'bought_from_shop'), ('Description', 'description')],
+    'Gems': [('Type', 'name'), ('Quantity', 'quantity'), ('Total Value (gp)', 'value'),
+             ('Weight (lbs)', 'weight'), ('Bought from Shop', 'bought_from_shop')],
+    'Art Objects': [('Name', 'name'), ('Value (gp)', 'value'), ('Weight (lbs)', 'weight'),
+                    ('Description', 'description'), ('Bought from Shop', 'bought_from_shop')],
+    'Magic Items': [('Name', 'name'), ('Rarity', 'rarity'), ('Requires Attunement', 'requires_attunement'),
+                    ('Value (gp)', 'value'), ('Weight (lbs)', 'weight'), ('Description', 'description'),
+                    ('Bought from Shop', 'bought_from_shop')]
+}
+
+RARITY_ORDER = {rarity: rank for rank, rarity in
+                enumerate(['Common', 'Uncommon', 'Rare', 'Very Rare', 'Legendary', 'Artifact'])}
+
+def to_decimal(value, default=Decimal('0')):
+    """Convert a saved or entered amount to Decimal, falling back to default if it is not a number."""
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return default
+
+def journal_value(value):
+    """A record field as stored in the action journal; amounts are kept as strings."""
+    return str(value) if isinstance(value, Decimal) else value
+
+class InventoryRecord:
+    """
+    One inventory row. value and weight are totals for the whole stack of quantity items.
+    """
+    __slots__ = ('item_id', 'category', 'name', 'value', 'weight', 'quantity',
+                 'bought_from_shop', 'description', 'rarity', 'requires_attunement', 'sort_keys')
+
+    def __init__(self, category, name, value, weight, quantity=1, bought_from_shop=False,
+                 description='', rarity='', requires_attunement=False):
+        self.item_id = None
+        self.category = category
+        self.name = name
+        self.value = value
+        self.weight = weight
+        self.quantity = quantity
+        self.bought_from_shop = bought_from_shop
+        self.description = description
+        self.rarity = rarity
+        self.requires_attunement = requires_attunement
+        self.sort_keys = None
+
+    def refresh_sort_keys(self):
+        """Precompute the typed sort keys; the store calls this whenever the record is written."""
+        self.sort_keys = {
+            'name': self.name.casefold(),
+            'value': float(self.value),
+            'weight': float(self.weight),
+            'quantity': self.quantity,
+            'bought_from_shop': int(self.bought_from_shop),
+            'rarity': RARITY_ORDER.get(self.rarity, len(RARITY_ORDER)),
+            'requires_attunement': int(self.requires_attunement)
+        }
+
+    def sort_key(self, field):
+        key = self.sort_keys.get(field)
+        return key if key is not None else str(getattr(self, field)).casefold()
+
+    def to_state(self):
+        """JSON-ready copy of the record, including its id (used by the action journal)."""
+        return {
+            'item_id': self.item_id,
+            'category': self.category,
+            'name': self.name,
+            'value': str(self.value),
+            'weight': str(self.weight),
+            'quantity': self.quantity,
+            'bought_from_shop': self.bought_from_shop,
+            'description': self.description,
+            'rarity': self.rarity,
+            'requires_attunement': self.requires_attunement
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        record = cls(state['category'], state['name'], Decimal(state['value']), Decimal(state['weight']),
+                     quantity=state['quantity'], bought_from_shop=state['bought_from_shop'],
+                     description=state['description'], rarity=state['rarity'],
+                     requires_attunement=state['requires_attunement'])
+        record.item_id = state['item_id']
+        return record
+
+    def unit_value(self):
+        return self.value / self.quantity if self.quantity else Decimal('0')
+
+    def unit_weight(self):
+        return self.weight / self.quantity if self.quantity else Decimal('0')
+
+class InventorySearchIndex:
+    """
+    Word index over the names and descriptions of every inventory record, kept up to date
+    by the InventoryStore. A query word matches any indexed word it is a prefix of; the
+    distinct words are kept sorted, so the words for a prefix are one binary-search range.
+
+    Records are grouped by their set of words, and the words point at groups rather than at
+    single records, so many stacks of the same item cost one entry per word between them.
+    """
+    WORD_PATTERN = re.compile(r'[^\W_]+')
+
+    def __init__(self):
+        self.postings = {}
+        self.words = []
+        self.groups = {}
+        self.record_words = {}
+
+    @classmethod
+    def tokenize(cls, text):
+        return set(cls.WORD_PATTERN.findall(text.casefold()))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def record_text_words(name, description):
+        return frozenset(InventorySearchIndex.tokenize(f"{name} {description}"))
+
+    def add(self, record):
+        words = self.record_text_words(record.name, record.description)
+        self.record_words[record.item_id] = words
+        members = self.groups.get(words)
+        if members is None:
+            members = self.groups[words] = set()
+            for word in words:
+                groups = self.postings.get(word)
+                if groups is None:
+                    groups = self.postings[word] = set()
+                    bisect.insort(self.words, word)
+                groups.add(words)
+        members.add(record.item_id)
+
+    def remove(self, record):
+        words = self.record_words.pop(record.item_id, None)
+        if words is None:
+            return
+        members = self.groups[words]
+        members.discard(record.item_id)
+        if members:
+            return
+        del self.groups[words]
+        for word in words:
+            groups = self.postings[word]
+            groups.discard(words)
+            if not groups:
+                del self.postings[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+
+    def words_starting_with(self, prefix):
+        start = bisect.bisect_left(self.words, prefix)
+        end = bisect.bisect_right(self.words, prefix + '\U0010ffff', start)
+        return self.words[start:end]
+
+    def query_words(self, query):
+        """For each word of query, the set of indexed words it is a prefix of; rarest first."""
+        word_sets = [set(self.words_starting_with(term)) for term in self.tokenize(query)]
+        word_sets.sort(key=self.group_count)
+        return word_sets
+
+    def group_count(self, words):
+        return sum(len(self.postings[word]) for word in words)
+
+    def search(self, word_sets):
+        """Word groups (keys of self.groups) matching every entry of query_words(query)."""
+        candidates = set().union(*(self.postings[word] for word in word_sets[0]))
+        for query_words in word_sets[1:]:
+            candidates = {group for group in candidates if not group.isdisjoint(query_words)}
+        return candidates
+
+class InventoryStore:
+    """
+    Holds every inventory record, grouped by category, and keeps the attached table models in step.
+
+    All changes to the inventory go through this class so the views never have to be re-read.
+    Value and weight totals per category are kept up to date as records change, so reading
+    them does not depend on the size of the inventory. Records are also indexed by
+    (name, bought from shop) for constant-time lookups and merges; row positions are
+    cached per category and rebuilt lazily after a removal shifts the rows.
+
+    A category can be kept sorted by one of the records' precomputed sort keys. Sorting
+    reorders the stored rows themselves (and so the order a profile is saved in); writes that
+    leave a row out of place re-sort it, which is close to linear for an almost sorted list.
+
+    While change_log is a list, every add, removal and update is appended to it as a
+    JSON-ready change that apply_change() can revert or re-apply (see ActionJournal).
+    Changes made while it is None only set unrecorded_changes.
+    """
+    # Above this many word groups for its rarest word, search() scans rows instead of collecting matches
+    SEARCH_COLLECT_LIMIT = 5000
+
+    def __init__(self):
+        self.records = {category: [] for category in INVENTORY_CATEGORIES}
+        self.records_by_id = {}
+        self.views = {category: [] for category in INVENTORY_CATEGORIES}
+        self.total_values = {category: Decimal('0') for category in INVENTORY_CATEGORIES}
+        self.total_weights = {category: Decimal('0') for category in INVENTORY_CATEGORIES}
+        self.name_index = {category: {} for category in INVENTORY_CATEGORIES}
+        self.row_positions = {category: {} for category in INVENTORY_CATEGORIES}
+        self.sort_orders = {category: None for category in INVENTORY_CATEGORIES}
+        self.search_index = InventorySearchIndex()
+        self.change_log = None
+        self.unrecorded_changes = False
+        self.next_id = 1
+
+    def attach(self, view):
+        self.views[view.category].append(view)
+
+    def detach(self, view):
+        if view in self.views[view.category]:
+            self.views[view.category].remove(view)
+
+    def get(self, item_id):
+        return self.records_by_id.get(item_id)
+
+    def all_records(self):
+        for category in INVENTORY_CATEGORIES:
+            yield from self.records[category]
+
+    def totals(self):
+        """(total value, total weight) of all records."""
+        return sum(self.total_values.values(), Decimal('0')), sum(self.total_weights.values(), Decimal('0'))
+
+    def recompute_totals(self):
+        """Recalculate the totals from every record; used to check the running totals."""
+        total_value = Decimal('0')
+        total_weight = Decimal('0')
+        for record in self.all_records():
+            total_value += record.value
+            total_weight += record.weight
+        return total_value, total_weight
+
+    def find(self, category, name, bought_from_shop=None):
+        """First record in category with this name (and bought-from-shop flag, if given)."""
+        index = self.name_index[category]
+        if bought_from_shop is not None:
+            matches = index.get((name, bought_from_shop))
+            return matches[0] if matches else None
+        candidates = [matches[0] for matches in (index.get((name, False)), index.get((name, True))) if matches]
+        return min(candidates, key=self.row_of) if candidates else None
+
+    def search(self, query, limit=None):
+        """
+        Records whose names or descriptions match query (see InventorySearchIndex).
+
+        :return: (records in category and row order, at most limit of them; total number of
+                 matches, or None if there are more than limit and they were not all counted)
+        """
+        index = self.search_index
+        word_sets = index.query_words(query)
+        if not word_sets:
+            return [], 0
+        if limit is not None and index.group_count(word_sets[0]) > self.SEARCH_COLLECT_LIMIT:
+            # Too common to collect every match: walk the rows in order and stop once limit is reached
+            found = []
+            for record in self.all_records():
+                words = index.record_words[record.item_id]
+                if all(not words.isdisjoint(query_words) for query_words in word_sets):
+                    if len(found) == limit:
+                        return found, None
+                    found.append(record)
+            return found, len(found)
+        groups = index.search(word_sets)
+        records = [self.records_by_id[item_id] for group in groups for item_id in index.groups[group]]
+        order = {category: position for position, category in enumerate(INVENTORY_CATEGORIES)}
+        sort_key = lambda record: (order[record.category], self.row_of(record))
+        if limit is not None and len(records) > limit:
+            return heapq.nsmallest(limit, records, key=sort_key), len(records)
+        return sorted(records, key=sort_key), len(records)
+
+    def row_of(self, record):
+        """Current row of a record in its category."""
+        positions = self.row_positions[record.category]
+        if positions is None:
+            positions = {item.item_id: row for row, item in enumerate(self.records[record.category])}
+            self.row_positions[record.category] = positions
+        return positions[record.item_id]
+
+    def index_record(self, record):
+        self.name_index[record.category].setdefault((record.name, record.bought_from_shop), []).append(record)
+
+    def unindex_record(self, record):
+        key = (record.name, record.bought_from_shop)
+        matches = self.name_index[record.category][key]
+        matches.remove(record)
+        if not matches:
+            del self.name_index[record.category][key]
+
+    def add(self, record):
+        rows = self.records[record.category]
+        row = len(rows)
+        self.assign_id(record)
+        record.refresh_sort_keys()
+        for view in self.views[record.category]:
+            view.begin_insert(row, row)
+        rows.append(record)
+        self.index_record(record)
+        self.search_index.add(record)
+        if self.row_positions[record.category] is not None:
+            self.row_positions[record.category][record.item_id] = row
+        self.total_values[record.category] += record.value
+        self.total_weights[record.category] += record.weight
+        for view in self.views[record.category]:
+            view.end_insert()
+        self.log_change(['add', row, record.to_state()])
+        self.keep_sorted(record.category, [row])
+        return record
+
+    def insert(self, record, row):
+        """Put a record that already has an id back at a row, e.g. when a removal is undone."""
+        rows = self.records[record.category]
+        row = min(row, len(rows))
+        record.refresh_sort_keys()
+        for view in self.views[record.category]:
+            view.begin_insert(row, row)
+        rows.insert(row, record)
+        self.records_by_id[record.item_id] = record
+        self.next_id = max(self.next_id, record.item_id + 1)
+        self.row_positions[record.category] = None
+        matches = self.name_index[record.category].setdefault((record.name, record.bought_from_shop), [])
+        matches.append(record)
+        matches.sort(key=self.row_of)
+        self.search_index.add(record)
+        self.total_values[record.category] += record.value
+        self.total_weights[record.category] += record.weight
+        for view in self.views[record.category]:
+            view.end_insert()
+        self.log_change(['add', row, record.to_state()])
+        self.keep_sorted(record.category, [row])
+
+    def remove(self, record):
+        rows = self.records[record.category]
+        row = self.row_of(record)
+        self.log_change(['remove', row, record.to_state()])
+        for view in self.views[record.category]:
+            view.begin_remove(row, row)
+        del rows[row]
+        del self.records_by_id[record.item_id]
+        self.unindex_record(record)
+        self.search_index.remove(record)
+        if row == len(rows):
+            del self.row_positions[record.category][record.item_id]
+        else:
+            self.row_positions[record.category] = None
+        self.total_values[record.category] -= record.value
+        self.total_weights[record.category] -= record.weight
+        for view in self.views[record.category]:
+            view.end_remove()
+
+    def update(self, record, **changes):
+        """Change fields of a record in place, e.g. update(record, quantity=2, value=..., weight=...)."""
+        self.total_values[record.category] -= record.value
+        self.total_weights[record.category] -= record.weight
+        reindex = (changes.get('name', record.name) != record.name or
+                   changes.get('bought_from_shop', record.bought_from_shop) != record.bought_from_shop)
+        if reindex:
+            self.unindex_record(record)
+        if self.change_log is not None:
+            before = {field: journal_value(getattr(record, field)) for field in changes}
+            after = {field: journal_value(value) for field, value in changes.items()}
+            self.change_log.append(['update', record.item_id, before, after])
+        else:
+            self.unrecorded_changes = True
+        for field, value in changes.items():
+            setattr(record, field, value)
+        record.refresh_sort_keys()
+        if 'name' in changes or 'description' in changes:
+            self.search_index.remove(record)
+            self.search_index.add(record)
+        self.total_values[record.category] += record.value
+        self.total_weights[record.category] += record.weight
+        row = self.row_of(record)
+        if reindex:
+            # Keep each index entry in row order so find() returns the first row
+            matches = self.name_index[record.category].setdefault((record.name, record.bought_from_shop), [])
+            position = bisect.bisect_left([self.row_of(match) for match in matches], row)
+            matches.insert(position, record)
+        for view in self.views[record.category]:
+            view.record_changed(row)
+        self.keep_sorted(record.category, [row])
+
+    def remove_units(self, units):
+        """
+        Remove items from several records in one transaction.
+
+        :param units: Iterable of (record, count). Whole records are removed when count covers
+                      their quantity; otherwise the stack is reduced by count items.
+        """
+        removed = {}
+        changed_rows = {}
+        changed = []
+        for record, count in units:
+            if count >= record.quantity:
+                removed.setdefault(record.category, []).append(record)
+                continue
+            value = record.unit_value() * count
+            weight = record.unit_weight() * count
+            self.log_change(['update', record.item_id,
+                             {'quantity': record.quantity, 'value': str(record.value), 'weight': str(record.weight)},
+                             {'quantity': record.quantity - count, 'value': str(record.value - value),
+                              'weight': str(record.weight - weight)}])
+            record.quantity -= count
+            record.value -= value
+            record.weight -= weight
+            record.refresh_sort_keys()
+            self.total_values[record.category] -= value
+            self.total_weights[record.category] -= weight
+            changed_rows.setdefault(record.category, []).append(self.row_of(record))
+            changed.append(record)
+        for category, rows in changed_rows.items():
+            for view in self.views[category]:
+                view.records_changed(min(rows), max(rows))
+
+        for category, records in removed.items():
+            rows = self.records[category]
+            positions = sorted(self.row_of(record) for record in records)
+            # Logged bottom-up, so undoing them in reverse puts each record back at its old row
+            for record in sorted(records, key=self.row_of, reverse=True):
+                self.log_change(['remove', self.row_of(record), record.to_state()])
+            first, last = positions[0], positions[-1]
+            contiguous = last - first + 1 == len(positions)
+            for view in self.views[category]:
+                if contiguous:
+                    view.begin_remove(first, last)
+                else:
+                    view.begin_reset()
+            if contiguous:
+                del rows[first:last + 1]
+            else:
+                removed_ids = {record.item_id for record in records}
+                self.records[category] = [record for record in rows if record.item_id not in removed_ids]
+            for record in records:
+                del self.records_by_id[record.item_id]
+                self.unindex_record(record)
+                self.search_index.remove(record)
+                self.total_values[category] -= record.value
+                self.total_weights[category] -= record.weight
+            self.row_positions[category] = None
+            for view in self.views[category]:
+                if contiguous:
+                    view.end_remove()
+                else:
+                    view.end_reset()
+
+        for record in changed:
+            self.keep_sorted(record.category, [self.row_of(record)])
+
+    def replace(self, category, records):
+        """
+        Replace all records of a category, e.g. when a profile is loaded. Records that
+        already have an id (restored from the action journal) keep it.
+        """
+        self.unrecorded_changes = True
+        for view in self.views[category]:
+            view.begin_reset()
+        for record in self.records[category]:
+            del self.records_by_id[record.item_id]
+            self.search_index.remove(record)
+        self.name_index[category] = {}
+        self.row_positions[category] = None
+        records = list(records)
+        for record in records:
+            record.refresh_sort_keys()
+        if self.sort_orders[category] is not None:
+            field, descending = self.sort_orders[category]
+            records.sort(key=lambda record: record.sort_key(field), reverse=descending)
+        for record in records:
+            if record.item_id is None:
+                self.assign_id(record)
+            else:
+                self.records_by_id[record.item_id] = record
+                self.next_id = max(self.next_id, record.item_id + 1)
+            self.index_record(record)
+            self.search_index.add(record)
+        self.records[category] = records
+        self.total_values[category] = sum((record.value for record in self.records[category]), Decimal('0'))
+        self.total_weights[category] = sum((record.weight for record in self.records[category]), Decimal('0'))
+        for view in self.views[category]:
+            view.end_reset()
+
+    def commit_batch(self, batch):
+        """
+        Apply an InventoryBatch: one row insertion per category for the new records and one
+        change notification per category for the stacks that were merged into.
+        """
+        for category, records in batch.new_records.items():
+            if not records:
+                continue
+            rows = self.records[category]
+            first = len(rows)
+            for view in self.views[category]:
+                view.begin_insert(first, first + len(records) - 1)
+            positions = self.row_positions[category]
+            for row, record in enumerate(records, first):
+                self.assign_id(record)
+                self.index_record(record)
+                self.search_index.add(record)
+                record.refresh_sort_keys()
+                if positions is not None:
+                    positions[record.item_id] = row
+                self.total_values[category] += record.value
+                self.total_weights[category] += record.weight
+            rows.extend(records)
+            for view in self.views[category]:
+                view.end_insert()
+            for row, record in enumerate(records, first):
+                self.log_change(['add', row, record.to_state()])
+            self.keep_sorted(category, range(first, first + len(records)))
+
+        changed_rows = {}
+        for record, quantity, value, weight in batch.merges.values():
+            self.log_change(['update', record.item_id,
+                             {'quantity': record.quantity, 'value': str(record.value), 'weight': str(record.weight)},
+                             {'quantity': record.quantity + quantity, 'value': str(record.value + value),
+                              'weight': str(record.weight + weight)}])
+            record.quantity += quantity
+            record.value += value
+            record.weight += weight
+            record.refresh_sort_keys()
+            self.total_values[record.category] += value
+            self.total_weights[record.category] += weight
+            changed_rows.setdefault(record.category, []).append(self.row_of(record))
+        for category, rows in changed_rows.items():
+            for view in self.views[category]:
+                view.records_changed(min(rows), max(rows))
+        for record, _, _, _ in batch.merges.values():
+            self.keep_sorted(record.category, [self.row_of(record)])
+
+    def log_change(self, change):
+        if self.change_log is not None:
+            self.change_log.append(change)
+        else:
+            self.unrecorded_changes = True
+
+    def can_apply_change(self, change, undo=False):
+        """Whether apply_change() can run: the records it touches (still) exist and no stack goes below one."""
+        kind = change[0]
+        if kind == 'update':
+            record = self.records_by_id.get(change[1])
+            if record is None:
+                return False
+            source, target = (change[3], change[2]) if undo else (change[2], change[3])
+            return 'quantity' not in target or record.quantity + target['quantity'] - source['quantity'] >= 1
+        if (kind == 'add') != undo:
+            return change[2]['item_id'] not in self.records_by_id
+        return change[2]['item_id'] in self.records_by_id
+
+    def apply_change(self, change, undo=False):
+        """
+        Re-apply a change from change_log, or revert it with undo=True. Quantity, value and
+        weight are applied as differences, so changes made since then are kept.
+        """
+        kind = change[0]
+        if kind == 'update':
+            record = self.records_by_id[change[1]]
+            source, target = (change[3], change[2]) if undo else (change[2], change[3])
+            updates = {}
+            for field, value in target.items():
+                if field in ('value', 'weight'):
+                    updates[field] = getattr(record, field) + Decimal(value) - Decimal(source[field])
+                elif field == 'quantity':
+                    updates[field] = record.quantity + value - source[field]
+                else:
+                    updates[field] = value
+            self.update(record, **updates)
+        elif (kind == 'add') != undo:
+            self.insert(InventoryRecord.from_state(change[2]), change[1])
+        else:
+            self.remove(self.records_by_id[change[2]['item_id']])
+
+    def sort(self, category, field, descending=False):
+        """Order the rows of a category by a record sort key and keep them in that order."""
+        self.sort_orders[category] = (field, descending)
+        self.resort(category)
+
+    def resort(self, category):
+        field, descending = self.sort_orders[category]
+        for view in self.views[category]:
+            view.begin_layout()
+        self.records[category].sort(key=lambda record: record.sort_key(field), reverse=descending)
+        self.row_positions[category] = None
+        for matches in self.name_index[category].values():
+            if len(matches) > 1:
+                matches.sort(key=self.row_of)
+        for view in self.views[category]:
+            view.end_layout()
+
+    def keep_sorted(self, category, rows):
+        """Re-sort a sorted category if any of the given rows no longer fits between its neighbours."""
+        if self.sort_orders[category] is None:
+            return
+        field, descending = self.sort_orders[category]
+        records = self.records[category]
+        for row in rows:
+            neighbours = [records[i].sort_key(field) for i in (row - 1, row, row + 1) if 0 <= i < len(records)]
+            if neighbours != sorted(neighbours, reverse=descending):
+                self.resort(category)
+                return
+
+    def assign_id(self, record):
+        record.item_id = self.next_id
+        self.next_id += 1
+        self.records_by_id[record.item_id] = record
+
+class InventoryBatch:
+    """
+    Additions staged against an InventoryStore. Nothing changes in the store until
+    commit(), so totals can be checked (e.g. against carrying capacity) first.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.new_records = {category: [] for category in INVENTORY_CATEGORIES}
+        self.merges = {}
+        self.staged_stacks = {}
+        self.total_value = Decimal('0')
+        self.total_weight = Decimal('0')
+
+    def add(self, record, merge=False):
+        """
+        Stage a record. With merge=True it is added to an existing stack with the same
+        name and bought-from-shop flag (in the store or staged earlier), if there is one.
+        """
+        self.total_value += record.value
+        self.total_weight += record.weight
+        if merge:
+            key = (record.category, record.name, record.bought_from_shop)
+            existing = self.store.find(record.category, record.name, record.bought_from_shop)
+            if existing is not None:
+                merged = self.merges.setdefault(existing.item_id, [existing, 0, Decimal('0'), Decimal('0')])
+                merged[1] += record.quantity
+                merged[2] += record.value
+                merged[3] += record.weight
+                return
+            staged = self.staged_stacks.get(key)
+            if staged is not None:
+                staged.quantity += record.quantity
+                staged.value += record.value
+                staged.weight += record.weight
+                return
+            self.staged_stacks[key] = record
+        self.new_records[record.category].append(record)
+
+    def commit(self):
+        self.store.commit_batch(self)
+
+class ActionJournal:
+    """
+    Append-only log of undoable actions (adding, buying, selling and removing items, adding
+    treasure, consolidating coins, distributing loot).
+
+    Each entry holds the changes its action made, so undo reverts them and redo re-applies
+    them without replaying any other history. Entries, undos and redos are appended to
+    journal.jsonl as they happen, so a crash loses at most the action in progress. Changes
+    made outside actions, such as coins typed in, go in as 'change' lines in the same form:
+    recovery re-applies them but they never enter the undo history. Every
+    JOURNAL_SNAPSHOT_INTERVAL lines the whole state and the undo history are written to
+    journal_snapshot.json and the journal file starts over, so recovery replays at most one
+    interval. Lines carry increasing sequence numbers and recovery skips those already in
+    the snapshot.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'journal.jsonl')
+        self.snapshot_path = os.path.join(directory, 'journal_snapshot.json')
+        self.entries = []
+        self.position = 0
+        self.seq = 0
+        self.lines_since_snapshot = 0
+        self.file = None
+
+    def has_session(self):
+        """Whether a previous session left its journal behind, i.e. did not close normally."""
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.path)
+
+    def next_undo(self):
+        return self.entries[self.position - 1] if self.position > 0 else None
+
+    def next_redo(self):
+        return self.entries[self.position] if self.position < len(self.entries) else None
+
+    def record(self, entry):
+        """Append an entry for a new action; anything that could have been redone is dropped."""
+        del self.entries[self.position:]
+        self.entries.append(entry)
+        self.position += 1
+        self.write({'type': 'action', 'entry': entry})
+
+    def change(self, entry):
+        """Append changes made outside an undoable action."""
+        self.write({'type': 'change', 'entry': entry})
+
+    def undo(self):
+        self.position -= 1
+        self.write({'type': 'undo'})
+
+    def redo(self):
+        self.position += 1
+        self.write({'type': 'redo'})
+
+    def clear(self):
+        self.entries = []
+        self.position = 0
+
+    def needs_snapshot(self):
+        return self.lines_since_snapshot >= JOURNAL_SNAPSHOT_INTERVAL
+
+    def write(self, line):
+        self.seq += 1
+        self.lines_since_snapshot += 1
+        if self.file is None:
+            return
+        line['seq'] = self.seq
+        try:
+            self.file.write(json.dumps(line, default=str) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError as e:
+            logging.error(f"Could not write to the action journal: {e}")
+            self.file = None
+
+    def write_snapshot(self, state):
+        """Save state with the recent undo history, then start an empty journal file."""
+        start = max(0, self.position - JOURNAL_UNDO_LIMIT)
+        self.entries = self.entries[start:]
+        self.position -= start
+        self.lines_since_snapshot = 0
+        snapshot = {'seq': self.seq, 'state': state, 'entries': self.entries, 'position': self.position}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self.snapshot_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                # json.dumps encodes in C; json.dump would stream through the Python encoder
+                f.write(json.dumps(snapshot, default=str))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+            if self.file is not None:
+                self.file.close()
+            self.file = open(self.path, 'w')
+        except OSError as e:
+            logging.error(f"Could not write the action journal snapshot: {e}")
+            self.file = None
+
+    def recover(self):
+        """
+        Read back the journal of a previous session.
+
+        :return: (state from the snapshot or None, journal lines written after it, in order)
+        """
+        state = None
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+            state = snapshot['state']
+            self.entries = snapshot['entries']
+            self.position = snapshot['position']
+            self.seq = snapshot['seq']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Could not read the action journal snapshot: {e}")
+        lines = []
+        try:
+            with open(self.path, 'r') as f:
+                for raw_line in f:
+                    try:
+                        line = json.loads(raw_line)
+                    except ValueError:
+                        # The last write was cut off
+                        break
+                    if line.get('seq', 0) > self.seq:
+                        lines.append(line)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Could not read the action journal: {e}")
+        return state, lines
+
+    def replay(self, line):
+        """
+        Update the history for one recovered line.
+
+        :return: (entry whose changes must be applied, True to revert them) or (None, False)
+        """
+        self.seq = line['seq']
+        if line['type'] == 'change':
+            return line['entry'], False
+        if line['type'] == 'action':
+            del self.entries[self.position:]
+            self.entries.append(line['entry'])
+            self.position += 1
+            return line['entry'], False
+        if line['type'] == 'undo' and self.position > 0:
+            self.position -= 1
+            return self.entries[self.position], True
+        if line['type'] == 'redo' and self.position < len(self.entries):
+            self.position += 1
+            return self.entries[self.position - 1], False
+        return None, False
+
+    def close(self, discard=False):
+        """Close the journal file; with discard=True the journal is deleted (normal exit)."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if discard:
+            for path in (self.path, self.snapshot_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.error(f"Could not remove {path}: {e}")
+
+def read_json_lines(path, offset):
+    """
+    Read the complete JSON lines of path from a byte offset.
+
+    :return: (decoded lines, byte offset just past the last complete line)
+    """
+    lines = []
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    break
+                try:
+                    lines.append(json.loads(raw_line))
+                except ValueError:
+                    break
+                offset += len(raw_line)
+    except FileNotFoundError:
+        pass
+    return lines, offset
+
+class CurrencyLedger:
+    """
+    Append-only history of changes to the coin purse, kept across sessions.
+
+    currency_ledger.jsonl gets one compact line per change: [seq, time, session, source,
+    {coin: delta}]. When a session starts, when it ends and every LEDGER_CHECKPOINT_INTERVAL
+    lines in between, a checkpoint is appended to currency_ledger_checkpoints.jsonl with the
+    balance, the session's net change per source and the byte offset of the next ledger line.
+    Checkpoints are few and kept in memory, so the balance at any moment or a session report
+    reads at most one interval of the ledger.
+    """
+    # Sources that carry the purse over from elsewhere rather than earn or spend anything
+    BALANCE_TRANSFERS = ('session_start', 'session_restore', 'profile_load', 'coin_system')
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'currency_ledger.jsonl')
+        self.checkpoint_path = os.path.join(directory, 'currency_ledger_checkpoints.jsonl')
+        self.checkpoints = []
+        self.checkpoint_times = []
+        self.session = None
+        self.session_start = None
+        self.seq = 0
+        self.balance = {}
+        self.sources = {}
+        self.entry_count = 0
+        self.lines_since_checkpoint = 0
+        self.file = None
+        self.checkpoint_file = None
+
+    def open(self):
+        """Load the checkpoints, catch up on the lines written after the last one and start a new session."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.checkpoints, checkpoint_end = read_json_lines(self.checkpoint_path, 0)
+            self.checkpoint_times = [checkpoint['time'] for checkpoint in self.checkpoints]
+            offset = 0
+            if self.checkpoints:
+                last = self.checkpoints[-1]
+                self.seq = last['seq']
+                self.balance = {coin: Decimal(amount) for coin, amount in last['balance'].items()}
+                offset = last['offset']
+            lines, end = read_json_lines(self.path, offset)
+            for line in lines:
+                self.seq = line[0]
+                for coin, delta in line[4].items():
+                    self.balance[coin] = self.balance.get(coin, Decimal('0')) + Decimal(delta)
+            self.file = open(self.path, 'ab')
+            # Drop a line cut off by a crash so the next one starts cleanly
+            self.file.truncate(end)
+            self.file.seek(0, os.SEEK_END)
+            self.checkpoint_file = open(self.checkpoint_path, 'ab')
+            self.checkpoint_file.truncate(checkpoint_end)
+            self.checkpoint_file.seek(0, os.SEEK_END)
+        except OSError as e:
+            logging.error(f"Could not open the currency ledger: {e}")
+            self.file = None
+        self.session_start = time.time()
+        name = datetime.datetime.fromtimestamp(self.session_start).strftime('%Y-%m-%d %H:%M:%S')
+        self.session = name
+        sessions = set(self.session_names())
+        suffix = 1
+        while self.session in sessions:
+            suffix += 1
+            self.session = f"{name} ({suffix})"
+        self.write_checkpoint()
+
+    def record(self, source, deltas):
+        """Append a change to the purse. deltas maps coin to the (non-zero) change in its count."""
+        self.seq += 1
+        self.entry_count += 1
+        totals = self.sources.setdefault(source, {})
+        for coin, delta in deltas.items():
+            self.balance[coin] = self.balance.get(coin, Decimal('0')) + delta
+            totals[coin] = totals.get(coin, Decimal('0')) + delta
+        line = [self.seq, round(time.time(), 3), self.session, source, {coin: str(delta) for coin, delta in deltas.items()}]
+        self.append(self.file, line)
+        self.lines_since_checkpoint += 1
+        if self.lines_since_checkpoint >= LEDGER_CHECKPOINT_INTERVAL:
+            self.write_checkpoint()
+
+    def append(self, f, line):
+        if f is None:
+            return
+        try:
+            f.write((json.dumps(line, separators=(',', ':')) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        except OSError as e:
+            logging.error(f"Could not write to the currency ledger: {e}")
+            self.file = self.checkpoint_file = None
+
+    def write_checkpoint(self):
+        checkpoint = {
+            'seq': self.seq,
+            'time': round(time.time(), 3),
+            'offset': self.file.tell() if self.file is not None else 0,
+            'session': self.session,
+            'session_start': self.session_start,
+            'entries': self.entry_count,
+            'balance': {coin: str(amount) for coin, amount in self.balance.items()},
+            'sources': {source: {coin: str(amount) for coin, amount in totals.items()} for source, totals in self.sources.items()}
+        }
+        self.append(self.checkpoint_file, checkpoint)
+        self.checkpoints.append(checkpoint)
+        self.checkpoint_times.append(checkpoint['time'])
+        self.lines_since_checkpoint = 0
+
+    def balance_at(self, timestamp):
+        """Coin counts in the purse at a moment, from the checkpoint before it and the lines after that."""
+        index = bisect.bisect_right(self.checkpoint_times, timestamp) - 1
+        if index < 0:
+            return {}
+        checkpoint = self.checkpoints[index]
+        balance = {coin: Decimal(amount) for coin, amount in checkpoint['balance'].items()}
+        if self.file is not None:
+            self.file.flush()
+        for line in read_json_lines(self.path, checkpoint['offset'])[0]:
+            if line[1] > timestamp:
+                break
+            for coin, delta in line[4].items():
+                balance[coin] = balance.get(coin, Decimal('0')) + Decimal(delta)
+        return balance
+
+    def session_names(self):
+        return list(dict.fromkeys(checkpoint['session'] for checkpoint in self.checkpoints))
+
+    def session_report(self, session):
+        """
+        Summarise one session from its last checkpoint and the lines written after it.
+
+        :return: dict with 'start', 'end', 'entries', 'opening' and 'closing' balances and
+                 'sources' mapping each source to its net change per coin; None if unknown.
+        """
+        matching = [checkpoint for checkpoint in self.checkpoints if checkpoint['session'] == session]
+        if not matching:
+            return None
+        first, last = matching[0], matching[-1]
+        closing = {coin: Decimal(amount) for coin, amount in last['balance'].items()}
+        sources = {
+            source: {coin: Decimal(amount) for coin, amount in totals.items()}
+            for source, totals in last['sources'].items()
+        }
+        entries = last['entries']
+        end = last['time']
+        if self.file is not None:
+            self.file.flush()
+        for line in read_json_lines(self.path, last['offset'])[0]:
+            if line[2] != session:
+                break
+            entries += 1
+            end = line[1]
+            totals = sources.setdefault(line[3], {})
+            for coin, delta in line[4].items():
+                closing[coin] = closing.get(coin, Decimal('0')) + Decimal(delta)
+                totals[coin] = totals.get(coin, Decimal('0')) + Decimal(delta)
+        return {
+            'start': first['session_start'],
+            'end': end,
+            'entries': entries,
+            'opening': {coin: Decimal(amount) for coin, amount in first['balance'].items()},
+            'closing': closing,
+            'sources': sources
+        }
+
+    def close(self):
+        if self.file is None or self.checkpoint_file is None:
+            return
+        self.write_checkpoint()
+        for f in (self.file, self.checkpoint_file):
+            if f is not None:
+                f.close()
+        self.file = self.checkpoint_file = None
+
+class PartyRoster:
+    """
+    The party members and what each of them has received from loot distributions, kept across sessions.
+
+    party_ledger.jsonl gets one line per distribution, or per undo or redo of one: [seq, time,
+    source, sign, {member: {'coins': {coin: count}, 'items': [names], 'value': gp}}], where sign
+    is -1 for an undo. party_roster.json holds the member names, each member's running totals
+    and the ledger offset they cover; it is rewritten after every line, so what anyone has
+    received so far is read from memory and only a member's history reads the ledger.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'party_ledger.jsonl')
+        self.roster_path = os.path.join(directory, 'party_roster.json')
+        self.members = []
+        self.totals = {}
+        self.seq = 0
+        self.file = None
+
+    @staticmethod
+    def empty_totals():
+        return {'coins': {}, 'items': 0, 'value': Decimal('0'), 'distributions': 0}
+
+    def open(self):
+        """Load the roster and add any ledger lines written after it was last saved."""
+        offset = 0
+        try:
+            with open(self.roster_path) as f:
+                roster = json.load(f)
+            # Read everything before keeping any of it, so a damaged file leaves nothing half loaded
+            members = [str(name) for name in roster['members']]
+            seq = int(roster['seq'])
+            roster_offset = int(roster['offset'])
+            totals = {
+                str(name): {
+                    'coins': {str(coin): Decimal(amount) for coin, amount in member_totals['coins'].items()},
+                    'items': int(member_totals['items']),
+                    'value': Decimal(member_totals['value']),
+                    'distributions': int(member_totals['distributions'])
+                }
+                for name, member_totals in roster['totals'].items()
+            }
+            self.members, self.seq, offset, self.totals = members, seq, roster_offset, totals
+        except FileNotFoundError:
+            pass
+        except (OSError, ArithmeticError, ValueError, KeyError, TypeError, AttributeError) as e:
+            # The ledger has everything; rebuild the members and totals from its start
+            logging.error(f"Could not read the party roster, rebuilding it from the ledger: {e}")
+        lines, end = read_json_lines(self.path, offset)
+        for line in lines:
+            if line[0] > self.seq:
+                self.apply(line)
+        if lines and not self.members:
+            self.members = list(lines[-1][4])
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.file = open(self.path, 'ab')
+            # Drop a line cut off by a crash so the next one starts cleanly
+            self.file.truncate(end)
+            self.file.seek(0, os.SEEK_END)
+        except OSError as e:
+            logging.error(f"Could not open the party ledger: {e}")
+            self.file = None
+        if lines:
+            self.save()
+
+    def apply(self, line):
+        seq, _, _, sign, shares = line
+        self.seq = seq
+        for name, share in shares.items():
+            totals = self.totals.setdefault(name, self.empty_totals())
+            for coin, amount in share['coins'].items():
+                totals['coins'][coin] = totals['coins'].get(coin, Decimal('0')) + sign * Decimal(amount)
+            totals['items'] += sign * len(share['items'])
+            totals['value'] += sign * Decimal(share['value'])
+            totals['distributions'] += sign
+
+    def set_members(self, names):
+        if list(names) != self.members:
+            self.members = list(names)
+            self.save()
+
+    def record(self, source, distributions, sign=1):
+        """
+        Add a distribution to the members' ledgers and running totals.
+
+        :param distributions: {member: {'Coins': {coin: count}, 'Items': [names], 'Total Value': gp}}
+        :param sign: -1 to take back a distribution that was undone.
+        """
+        shares = {
+            name: {
+                'coins': {coin: str(amount) for coin, amount in share['Coins'].items() if Decimal(amount)},
+                'items': list(share['Items']),
+                'value': str(share['Total Value'])
+            }
+            for name, share in distributions.items()
+        }
+        line = [self.seq + 1, round(time.time(), 3), source, sign, shares]
+        if self.file is not None:
+            try:
+                self.file.write((json.dumps(line, separators=(',', ':')) + '\n').encode('utf-8'))
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            except OSError as e:
+                logging.error(f"Could not write to the party ledger: {e}")
+                self.file = None
+        self.apply(line)
+        self.save()
+
+    def save(self):
+        roster = {
+            'members': self.members,
+            'seq': self.seq,
+            'offset': self.file.tell() if self.file is not None else 0,
+            'totals': {
+                name: {
+                    'coins': {coin: str(amount) for coin, amount in totals['coins'].items()},
+                    'items': totals['items'],
+                    'value': str(totals['value']),
+                    'distributions': totals['distributions']
+                }
+                for name, totals in self.totals.items()
+            }
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self.roster_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                f.write(json.dumps(roster))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.roster_path)
+        except OSError as e:
+            logging.error(f"Could not save the party roster: {e}")
+
+    def standings(self):
+        """:return: [(member, totals)] for the current members, in roster order."""
+        return [(name, self.totals.get(name) or self.empty_totals()) for name in self.members]
+
+    def history(self, name):
+        """:return: [(time, source, sign, share)] of every ledger line that gave name something."""
+        if self.file is not None:
+            self.file.flush()
+        return [
+            (line[1], line[2], line[3], line[4][name])
+            for line in read_json_lines(self.path, 0)[0] if name in line[4]
+        ]
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class InventoryTableModel(QtCore.QAbstractTableModel):
+    """Read-only table view of one inventory category in an InventoryStore."""
+
+    def __init__(self, store, category, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.category = category
+        self.columns = INVENTORY_COLUMNS[category]
+        store.attach(self)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.store.records[self.category])
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        record = self.store.records[self.category][index.row()]
+        field = self.columns[index.column()][1]
+        value = getattr(record, field)
+        if isinstance(value, bool):
+            return 'Yes' if value else 'No'
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return str(section + 1)
+
+    def record_at(self, row):
+        return self.store.records[self.category][row]
+
+    def column_for(self, field):
+        for column, (_, column_field) in enumerate(self.columns):
+            if column_field == field:
+                return column
+        return 0
+
+    def begin_insert(self, first, last):
+        self.beginInsertRows(QtCore.QModelIndex(), first, last)
+
+    def end_insert(self):
+        self.endInsertRows()
+
+    def begin_remove(self, first, last):
+        self.beginRemoveRows(QtCore.QModelIndex(), first, last)
+
+    def end_remove(self):
+        self.endRemoveRows()
+
+    def begin_reset(self):
+        self.beginResetModel()
+
+    def end_reset(self):
+        self.endResetModel()
+
+    def begin_layout(self):
+        self.layoutAboutToBeChanged.emit()
+        self.moved_indexes = self.persistentIndexList()
+        self.moved_records = [self.record_at(index.row()) for index in self.moved_indexes]
+
+    def end_layout(self):
+        new_indexes = [self.index(self.store.row_of(record), index.column())
+                       for index, record in zip(self.moved_indexes, self.moved_records)]
+        self.changePersistentIndexList(self.moved_indexes, new_indexes)
+        self.moved_indexes = self.moved_records = None
+        self.layoutChanged.emit()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Sort the rows in the store on the records' precomputed sort keys; the filter proxy only filters."""
+        field = self.columns[column][1]
+        if field is not None:
+            self.store.sort(self.category, field, order == Qt.DescendingOrder)
+
+    def record_changed(self, row):
+        self.records_changed(row, row)
+
+    def records_changed(self, first, last):
+        self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.columns) - 1))
+
+class SellTableModel(InventoryTableModel):
+    """
+    The Shop's sell list: one row per inventory record of the chosen category, with the
+    per-item price and an editable number of items to sell from the stack.
+
+    While inactive (Shop tab not shown) the model is empty and detached from the store,
+    so inventory changes cost it nothing.
+    """
+
+    SELL_COLUMNS = ['Name', 'Category', 'Value (gp)', 'Weight (lbs)', 'Bought from Shop', 'Quantity', 'Sell Qty']
+    SELL_QUANTITY_COLUMN = 6
+
+    def __init__(self, store, category, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.store = store
+        self.category = category
+        self.columns = [(header, None) for header in self.SELL_COLUMNS]
+        self.active = False
+        self.sell_quantities = {}
+
+    def set_active(self, active):
+        if active == self.active:
+            return
+        self.beginResetModel()
+        self.active = active
+        if active:
+            self.store.attach(self)
+        else:
+            self.store.detach(self)
+            self.sell_quantities = {}
+        self.endResetModel()
+
+    def set_category(self, category):
+        if category == self.category:
+            return
+        self.beginResetModel()
+        if self.active:
+            self.store.detach(self)
+        self.category = category
+        self.sell_quantities = {}
+        if self.active:
+            self.store.attach(self)
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid() or not self.active:
+            return 0
+        return len(self.store.records[self.category])
+
+    def sell_quantity(self, record):
+        return max(1, min(self.sell_quantities.get(record.item_id, 1), record.quantity))
+
+    def unit_price(self, record):
+        if record.quantity == 1:
+            return record.value
+        return record.unit_value().quantize(Decimal('0.01'))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.record_at(index.row())
+        column = index.column()
+        if column == self.SELL_QUANTITY_COLUMN and role in (Qt.DisplayRole, Qt.EditRole):
+            return self.sell_quantity(record)
+        if role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        if column == 0:
+            return record.name
+        if column == 1:
+            return record.category
+        if column == 2:
+            return str(self.unit_price(record))
+        if column == 3:
+            if record.quantity == 1:
+                return str(record.weight)
+            return str(record.unit_weight().quantize(Decimal('0.0001')))
+        if column == 4:
+            return 'Yes' if record.bought_from_shop else 'No'
+        if column == 5:
+            return str(record.quantity)
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() == self.SELL_QUANTITY_COLUMN and self.record_at(index.row()).quantity > 1:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or index.column() != self.SELL_QUANTITY_COLUMN:
+            return False
+        record = self.record_at(index.row())
+        try:
+            quantity = int(value)
+        except (TypeError, ValueError):
+            return False
+        self.sell_quantities[record.item_id] = max(1, min(quantity, record.quantity))
+        self.dataChanged.emit(index, index)
+        return True
+
 class DnDWealthManager(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
@@ -120,7 +2273,11 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         QtWidgets.QApplication.setWindowIcon(app_icon)
         self.setWindowIcon(app_icon)
 
-        self.currency_vars = {currency.value: Decimal('0') for currency in Currency}
+        self.coin_systems = load_coin_systems(coin_system_definitions)
+        self.coin_system = self.coin_systems[DEFAULT_COIN_SYSTEM]
+        # Costs from the D&D API are in standard coins whatever system is in use
+        self.api_cost_rates = self.coin_systems['Standard'].rates
+        self.currency_vars = {currency.value: Decimal('0') for currency in self.coin_system}
         self.misc_items = []
         self.gem_inventory = []
         self.art_inventory = [] 
@@ -131,13 +2288,10 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.dice_rolls = []
         self.generation_counter = 0
         
-        self.conversion_rates = {
-            'cp': {'sp': 0.1, 'ep': 0.02, 'gp': 0.01, 'pp': 0.001},
-            'sp': {'cp': 10, 'ep': 0.2, 'gp': 0.1, 'pp': 0.01},
-            'ep': {'cp': 50, 'sp': 5, 'gp': 0.5, 'pp': 0.05},
-            'gp': {'cp': 100, 'sp': 10, 'ep': 2, 'pp': 0.1},
-            'pp': {'cp': 1000, 'sp': 100, 'ep': 20, 'gp': 10}
-        }
+        self.conversion_rates = self.coin_system.conversion_rates
+        self.currency_rates = self.coin_system.rates
+        self.coin_solver = self.coin_system.solver
+        self.item_allocator = ItemAllocator()
    
         self.magic_item_rarity_distribution = {
             'Common': 50,
@@ -167,7 +2321,8 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             'base-item-tables.json',
             required_keys=[f"Magic Item Table {chr(i)}" for i in range(65, 74)]  
         )
-        self.base_items = self.load_json('base-items.json')  
+        self.base_items = self.load_json('base-items.json')
+        self.magic_item_prices = self.build_magic_item_prices()  
         self.gems_data = self.load_json(
             'gems.json',
             required_keys=[
@@ -338,6 +2493,15 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                 }
             }
         }
+        self.inventory_store = InventoryStore()
+        self.api_client = DndApiClient()
+        self.api_name_indexes = {}
+        self.shop_item_details = {}
+        self.shop_pending_details = set()
+        # Item url of a purchase waiting for its details to load
+        self.shop_pending_buy = None
+        self.shop_result_rows = {}
+        self.shop_search_index = None
         self.party_loot = {
         'Coins': {},
         'Gems': [],
@@ -347,6 +2511,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
 
         self.create_widgets()
         self.create_menu_bar()
+        self.setup_action_journal()
 
     def create_widgets(self):
         """Set up the main UI components."""
@@ -368,10 +2533,11 @@ class DnDWealthManager(QtWidgets.QMainWindow):
     def on_tab_changed(self, index):
         """Handle actions when a different tab is selected."""
         selected_tab = self.tabs.tabText(index)
+        self.update_sell_table()
         if selected_tab == "Shop":
-            logging.info("Shop tab selected. Refreshing sell table and updating currency holdings.")
-            self.update_sell_table()
+            logging.info("Shop tab selected. Updating currency holdings.")
             self.currency_holdings_label.setText(self.get_currency_holdings_text())  
+            self.prefetch_shop_index()
         
     def create_shop_tab(self):
         """Create the Shop tab where users can buy and sell items."""
@@ -408,6 +2574,12 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         search_button = QtWidgets.QPushButton("Search")
         search_layout.addWidget(search_button)
         search_button.clicked.connect(self.search_shop_items)
+
+        self.shop_search_timer = QTimer(self)
+        self.shop_search_timer.setSingleShot(True)
+        self.shop_search_timer.setInterval(SHOP_SEARCH_DEBOUNCE_MS)
+        self.shop_search_timer.timeout.connect(self.search_shop_items_incrementally)
+        self.shop_search_input.textChanged.connect(self.shop_search_timer.start)
         
         self.shop_table = QtWidgets.QTableView()
         self.shop_model = QtGui.QStandardItemModel(0, 4)
@@ -415,6 +2587,11 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.shop_table.setModel(self.shop_model)
         self.shop_table.setSortingEnabled(False)
         layout.addWidget(self.shop_table)
+
+        self.shop_detail_signals = ShopDetailSignals(self)
+        self.shop_detail_signals.loaded.connect(self.on_shop_item_details_loaded)
+        self.shop_table.verticalScrollBar().valueChanged.connect(self.request_visible_shop_details)
+        self.shop_table.verticalScrollBar().rangeChanged.connect(self.request_visible_shop_details)
         
         buy_button = QtWidgets.QPushButton("Buy Selected Item")
         layout.addWidget(buy_button)
@@ -437,8 +2614,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.sell_category_combo.currentIndexChanged.connect(self.update_sell_table)
         
         self.sell_table = QtWidgets.QTableView()
-        self.sell_model = QtGui.QStandardItemModel(0, 5)  
-        self.sell_model.setHorizontalHeaderLabels(['Name', 'Category', 'Value (gp)', 'Weight (lbs)', 'Bought from Shop'])
+        self.sell_model = SellTableModel(self.inventory_store, self.sell_category_combo.currentText())
         self.sell_table.setModel(self.sell_model)
         self.sell_table.setSortingEnabled(False)
         layout.addWidget(self.sell_table)
@@ -476,16 +2652,13 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                 self.item_description.setText("Item URL is missing.")
                 return
 
-            item_response = requests.get(f"https://www.dnd5eapi.co{item_url}")
-            if item_response.status_code == 200:
-                try:
-                    item_data = item_response.json()
-                    description = '\n'.join(item_data.get('desc', ['No description available.']))
-                    self.item_description.setText(f"Name: {name}\nCategory: {category}\n\nDescription:\n{description}")
-                except json.JSONDecodeError:
-                    self.item_description.setText("Invalid JSON response from the API.")
+            details = self.shop_item_details.get(item_url)
+            if details is not None:
+                self.item_description.setText(f"Name: {name}\nCategory: {category}\n\nDescription:\n{details['Description']}")
             else:
-                self.item_description.setText("Unable to fetch item description.")
+                # Rows picked by keyboard or straight after a search may not have been fetched yet
+                self.request_shop_details(item_url)
+                self.item_description.setText("Loading item description...")
         else:
             self.item_description.clear()
         
@@ -496,7 +2669,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         
     def get_currency_holdings_text(self):
         holdings = []
-        for currency in Currency:
+        for currency in self.coin_system:
             amount = self.currency_vars[currency.value]
             holdings.append(f"{amount} {currency.name}")
         return ", ".join(holdings)    
@@ -512,80 +2685,20 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         logging.info(f"Shop sell rate updated to {rate}%")
         
     def search_shop_items(self):
+        self.shop_search_timer.stop()
         search_term = self.shop_search_input.text().strip().lower()
         if not search_term:
             QtWidgets.QMessageBox.warning(self, "Warning", "Please enter a search term.")
             return
 
-        self.shop_model.setRowCount(0)
-        urls = [
-            "https://www.dnd5eapi.co/api/equipment",
-            "https://www.dnd5eapi.co/api/magic-items"
-        ]
-
         try:
-            results = []
-            for url in urls:
-                response = requests.get(url)
-                if response.status_code != 200:
-                    continue
-                data = response.json()
-                results.extend(data.get('results', []))
-
-            filtered_items = [item for item in results if search_term in item['name'].lower()]
-
+            filtered_items = self.get_shop_search_index().search(search_term)
             if not filtered_items:
+                self.shop_model.setRowCount(0)
+                self.shop_result_rows = {}
                 QtWidgets.QMessageBox.information(self, "No Results", f"No items found for '{search_term}'.")
                 return
-
-            item_urls = [f"https://www.dnd5eapi.co{item['url']}" for item in filtered_items]
-
-            def fetch_item_data(url):
-                try:
-                    item_response = requests.get(url)
-                    if item_response.status_code != 200:
-                        return None
-                    return item_response.json()
-                except requests.exceptions.RequestException as e:
-                    logging.error(f"Error fetching {url}: {e}")
-                    return None
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-                item_data_list = list(executor.map(fetch_item_data, item_urls))
-
-            for item_data in item_data_list:
-                if item_data is None:
-                    continue
-                name = item_data.get('name', 'Unknown')
-                category = self.get_item_category(item_data)
-                cost_gp = self.extract_cost_in_gp(item_data.get('cost', {}))
-                weight = item_data.get('weight', 0)
-
-                if cost_gp == Decimal('0'):
-                    rarity_info = item_data.get('rarity', {})
-                    rarity_name = rarity_info.get('name', '').lower()
-                    if rarity_name in self.rarity_price_mapping:
-                        price_range = self.rarity_price_mapping[rarity_name]
-                        if price_range[0] == price_range[1]:
-
-                            cost_gp = Decimal(price_range[0])
-                        else:
-
-                            cost_gp = Decimal(random.randint(price_range[0], price_range[1]))
-                    else:
-
-                        cost_gp = Decimal('0')
-
-                name_item = QtGui.QStandardItem(name)
-                name_item.setData(item_data.get('url', ''), QtCore.Qt.UserRole)
-
-                row = [
-                    name_item,
-                    QtGui.QStandardItem(category),
-                    QtGui.QStandardItem(str(cost_gp)),
-                    QtGui.QStandardItem(str(weight))
-                ]
-                self.shop_model.appendRow(row)
+            self.show_shop_results(filtered_items)
 
         except requests.exceptions.RequestException as e:
             logging.error(f"Network error occurred: {e}")
@@ -593,7 +2706,164 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         except Exception as e:
             logging.error(f"Unexpected error occurred: {e}")
             QtWidgets.QMessageBox.critical(self, "Error", f"An unexpected error occurred: {e}")
+
+    def search_shop_items_incrementally(self):
+        """Show local matches for the current search text; runs when the debounce timer fires."""
+        search_term = self.shop_search_input.text().strip().lower()
+        if not search_term:
+            self.shop_model.setRowCount(0)
+            self.shop_result_rows = {}
+            return
+        try:
+            filtered_items = self.get_shop_search_index().search(search_term)
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Network error occurred: {e}")
+            return
+        self.show_shop_results(filtered_items)
+
+    def get_shop_search_index(self):
+        """Return the search index over the equipment and magic item lists, loading them if needed."""
+        if self.shop_search_index is None:
+            entries = []
+            complete = True
+            for url in self.get_shop_index_urls():
+                name_index = self.get_api_name_index(url)
+                if name_index is None:
+                    complete = False
+                    continue
+                entries.extend(name_index.results)
+            search_index = ShopSearchIndex(entries)
+            if not complete:
+                return search_index
+            self.shop_search_index = search_index
+        return self.shop_search_index
+
+    def get_shop_index_urls(self):
+        return [
+            f"{DND_API_BASE_URL}/api/equipment",
+            f"{DND_API_BASE_URL}/api/magic-items"
+        ]
+
+    def prefetch_shop_index(self):
+        """Start loading the index lists in the background so the first search is instant."""
+        if self.shop_search_index is None:
+            for url in self.get_shop_index_urls():
+                self.api_client.submit(url)
+
+    def show_shop_results(self, entries):
+        """Fill the shop table from index entries; details are filled in once fetched."""
+        self.shop_model.setRowCount(0)
+        self.shop_result_rows = {}
+        for entry in entries:
+            item_url = entry.get('url', '')
+            details = self.shop_item_details.get(item_url)
+
+            name_item = QtGui.QStandardItem(entry['name'])
+            name_item.setData(item_url, QtCore.Qt.UserRole)
+
+            row = [
+                name_item,
+                QtGui.QStandardItem(details['Category'] if details else ''),
+                QtGui.QStandardItem(str(details['Cost']) if details else ''),
+                QtGui.QStandardItem(str(details['Weight']) if details else '')
+            ]
+            self.shop_result_rows.setdefault(item_url, []).append(self.shop_model.rowCount())
+            self.shop_model.appendRow(row)
+        self.shop_table.scrollToTop()
+        QTimer.singleShot(0, self.request_visible_shop_details)
+
+    def request_visible_shop_details(self):
+        """Fetch details for the shop rows currently visible in the table."""
+        row_count = self.shop_model.rowCount()
+        first_row = self.shop_table.rowAt(0)
+        if row_count == 0 or first_row < 0:
+            return
+        last_row = self.shop_table.rowAt(self.shop_table.viewport().height() - 1)
+        if last_row < 0:
+            last_row = row_count - 1
+        for row in range(first_row, last_row + 1):
+            self.request_shop_details(self.shop_model.item(row, 0).data(QtCore.Qt.UserRole))
+
+    def request_shop_details(self, item_url):
+        """Fetch the details of one shop item in the background, unless they are loaded or on their way."""
+        if not item_url or item_url in self.shop_item_details or item_url in self.shop_pending_details:
+            return
+        self.shop_pending_details.add(item_url)
+        future = self.api_client.submit(f"{DND_API_BASE_URL}{item_url}")
+        future.add_done_callback(lambda f, item_url=item_url: self.shop_detail_signals.loaded.emit(item_url, f))
+
+    def on_shop_item_details_loaded(self, item_url, future):
+        self.shop_pending_details.discard(item_url)
+        pending_buy = self.shop_pending_buy == item_url
+        if pending_buy:
+            self.shop_pending_buy = None
+        try:
+            item_data = future.result()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error fetching {item_url}: {e}")
+            item_data = None
+        if item_data is None:
+            if pending_buy:
+                QtWidgets.QMessageBox.warning(self, "Warning", "Could not load the item's details, so it cannot be bought right now.")
+            return
+        details = self.parse_shop_item_details(item_data)
+        self.shop_item_details[item_url] = details
+        for row in self.shop_result_rows.get(item_url, []):
+            self.shop_model.item(row, 1).setText(details['Category'])
+            self.shop_model.item(row, 2).setText(str(details['Cost']))
+            self.shop_model.item(row, 3).setText(str(details['Weight']))
+        selected = self.shop_table.selectionModel().selectedRows()
+        if selected and selected[0].row() in self.shop_result_rows.get(item_url, []):
+            self.display_item_description(None, None)
+            if pending_buy:
+                self.buy_shop_item()
             
+    def parse_shop_item_details(self, item_data):
+        """
+        Extract what the Shop needs from an API item detail response.
+
+        Items without a listed cost are priced from their rarity. The result is kept
+        in shop_item_details so selecting or buying the item needs no further request.
+
+        :param item_data: Decoded item detail JSON.
+        :return: Dict with Name, Category, Cost, Weight, Rarity and Description.
+        """
+        cost_gp = self.extract_cost_in_gp(item_data.get('cost', {}))
+        rarity_name = item_data.get('rarity', {}).get('name', '')
+
+        if cost_gp == Decimal('0'):
+            price_range = self.rarity_price_mapping.get(rarity_name.lower())
+            if price_range:
+                if price_range[0] == price_range[1]:
+                    cost_gp = Decimal(price_range[0])
+                else:
+                    cost_gp = Decimal(random.randint(price_range[0], price_range[1]))
+
+        return {
+            'Name': item_data.get('name', 'Unknown'),
+            'Category': self.get_item_category(item_data),
+            'Cost': cost_gp,
+            'Weight': Decimal(str(item_data.get('weight', 0))),
+            'Rarity': rarity_name,
+            'Description': '\n'.join(item_data.get('desc', ['No description available.']))
+        }
+
+    def get_api_name_index(self, search_url):
+        """
+        Return the cached name index for an API index list, loading it on first use.
+
+        :param search_url: URL of the index list (equipment or magic items).
+        :return: ApiNameIndex, or None if the list could not be fetched.
+        """
+        name_index = self.api_name_indexes.get(search_url)
+        if name_index is None:
+            data = self.api_client.get_json(search_url)
+            if data is None:
+                return None
+            name_index = ApiNameIndex(data.get('results', []))
+            self.api_name_indexes[search_url] = name_index
+        return name_index
+
     def fetch_description_from_api(self, item_name, category):
         """
         Fetch the description of an item from the D&D 5e API with enhanced matching.
@@ -605,56 +2875,24 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         try:
             # Define API endpoints based on category
             if category.lower() in ['weapons', 'armor', 'miscellaneous items']:
-                search_url = "https://www.dnd5eapi.co/api/equipment"
+                search_url = f"{DND_API_BASE_URL}/api/equipment"
             elif category.lower() == 'magic items':
-                search_url = "https://www.dnd5eapi.co/api/magic-items"
+                search_url = f"{DND_API_BASE_URL}/api/magic-items"
             else:
                 # Categories like 'art objects' or 'gems' do not require descriptions
                 return ""
             
-            response = requests.get(search_url)
-            if response.status_code != 200:
-                logging.error(f"Failed to fetch from {search_url}: Status code {response.status_code}")
+            name_index = self.get_api_name_index(search_url)
+            if name_index is None:
                 return "No description available."
-            
-            data = response.json()
-            results = data.get('results', [])
-            
-            # 1. Exact Match (Case-Insensitive)
-            for item in results:
-                if item['name'].lower() == item_name.lower():
-                    item_url = f"https://www.dnd5eapi.co{item['url']}"
-                    item_response = requests.get(item_url)
-                    if item_response.status_code == 200:
-                        item_data = item_response.json()
-                        description = '\n'.join(item_data.get('desc', ["No description available."]))
-                        return description
-            
-            # 2. Normalized Match (Remove punctuation and compare)
-            normalized_input = re.sub(r'[^\w\s]', '', item_name).lower()
-            for item in results:
-                normalized_item_name = re.sub(r'[^\w\s]', '', item['name']).lower()
-                if normalized_item_name in normalized_input or normalized_input in normalized_item_name:
-                    item_url = f"https://www.dnd5eapi.co{item['url']}"
-                    item_response = requests.get(item_url)
-                    if item_response.status_code == 200:
-                        item_data = item_response.json()
-                        description = '\n'.join(item_data.get('desc', ["No description available."]))
-                        return description
-            
-            # 3. Fuzzy Matching using difflib
-            item_names = [item['name'] for item in results]
-            close_matches = get_close_matches(item_name, item_names, n=1, cutoff=0.8)
-            if close_matches:
-                matched_item = close_matches[0]
-                for item in results:
-                    if item['name'] == matched_item:
-                        item_url = f"https://www.dnd5eapi.co{item['url']}"
-                        item_response = requests.get(item_url)
-                        if item_response.status_code == 200:
-                            item_data = item_response.json()
-                            description = '\n'.join(item_data.get('desc', ["No description available."]))
-                            return description
+
+            # Exact, normalized and fuzzy candidates, in that order
+            for item in name_index.matches(item_name):
+                item_url = f"{DND_API_BASE_URL}{item['url']}"
+                item_data = self.api_client.get_json(item_url)
+                if item_data is not None:
+                    description = '\n'.join(item_data.get('desc', ["No description available."]))
+                    return description
             
             # If all matching strategies fail
             logging.warning(f"No description found for item '{item_name}' in category '{category}'.")
@@ -688,14 +2926,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
     def convert_cost_to_gp(self, quantity, unit):
         unit = unit.lower()
         quantity = Decimal(quantity)
-        conversion_rates = {
-            'cp': Decimal('0.01'),
-            'sp': Decimal('0.1'),
-            'ep': Decimal('0.5'),
-            'gp': Decimal('1'),
-            'pp': Decimal('10')
-        }
-        rate = conversion_rates.get(unit, Decimal('1'))
+        rate = self.api_cost_rates.decimal_rate(unit, 'gp') or Decimal('1')
         return (quantity * rate).quantize(Decimal('0.01'))
   
     def buy_shop_item(self):
@@ -705,15 +2936,21 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             return
         index = selected[0]
         name = self.shop_model.item(index.row(), 0).text()
-        category = self.shop_model.item(index.row(), 1).text()
-        cost_gp_text = self.shop_model.item(index.row(), 2).text()
-        weight_text = self.shop_model.item(index.row(), 3).text()
-        
-        try:
-            weight = Decimal(weight_text)
-        except InvalidOperation:
-            weight = Decimal('0')
-        
+        item_url = self.shop_model.item(index.row(), 0).data(QtCore.Qt.UserRole)
+        if not item_url:
+            QtWidgets.QMessageBox.warning(self, "Warning", f"The item '{name}' has no details to buy it by.")
+            return
+        details = self.shop_item_details.get(item_url)
+        if details is None:
+            # Finish the purchase once the details arrive, if the item is still selected then
+            self.shop_pending_buy = item_url
+            self.request_shop_details(item_url)
+            self.item_description.setText(f"Loading the details for '{name}'; the purchase continues once they arrive.")
+            return
+        category = details['Category']
+        cost_gp_text = str(details['Cost'])
+        weight = details['Weight']
+
         new_total_weight = self.total_weight + weight
         if self.carrying_capacity > 0 and new_total_weight > self.carrying_capacity:
             QtWidgets.QMessageBox.warning(self, "Warning", "Cannot buy item. Carrying capacity exceeded.")
@@ -725,19 +2962,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Warning", f"The item '{name}' does not have a valid cost.")
             return
 
-        item_url = self.shop_model.item(index.row(), 0).data(QtCore.Qt.UserRole)
-        if item_url:
-            item_response = requests.get(f"https://www.dnd5eapi.co{item_url}")
-            if item_response.status_code == 200:
-                try:
-                    item_data = item_response.json()
-                    description = '\n'.join(item_data.get('desc', ['No description available.']))
-                except json.JSONDecodeError:
-                    description = 'No description available.'
-            else:
-                description = 'No description available.'
-        else:
-            description = 'No description available.'
+        description = details['Description']
 
         reply = QtWidgets.QMessageBox.question(
             self, "Confirm Purchase",
@@ -748,16 +2973,23 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         if reply == QtWidgets.QMessageBox.No:
             return
 
-        if not self.deduct_currency(cost_gp):
+        self.begin_journal_action()
+        payment = self.deduct_currency(cost_gp)
+        if not payment:
+            self.cancel_journal_action()
             QtWidgets.QMessageBox.warning(self, "Warning", "You do not have enough funds to buy this item.")
             return
+        paid, change = payment
 
         inventory_type = self.map_category_to_inventory(category)
         self.add_to_inventory_tab(inventory_type, name, cost_gp, weight, bought_from_shop=True, description=description)
 
         self.update_total_wealth_and_weight()
         self.update_inventory_tabs()
-        QtWidgets.QMessageBox.information(self, "Success", f"You have bought {name} for {cost_gp} gp.")
+        change_text = f" and got {self.describe_coins(change)} in change" if any(change.values()) else ""
+        QtWidgets.QMessageBox.information(
+            self, "Success", f"You have bought {name} for {cost_gp} gp, paying {self.describe_coins(paid)}{change_text}."
+        )
 
         action = {
             'action_type': 'buy_item',
@@ -769,7 +3001,8 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                 'description': description  
             }
         }
-        
+        self.record_action(action)
+
     def map_category_to_inventory(self, category):
         equipment_categories = {
             'Weapon': 'Weapons',
@@ -799,102 +3032,133 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.update_total_wealth_and_weight()    
         
     def add_to_inventory_tab(self, inventory_type, name, value, weight, bought_from_shop=False, description=''):
-        if inventory_type == 'Weapons':
-            self.weapons_model.appendRow([
-                QtGui.QStandardItem(name),
-                QtGui.QStandardItem(str(value)),
-                QtGui.QStandardItem(str(weight)),
-                QtGui.QStandardItem('Yes' if bought_from_shop else 'No'),
-                QtGui.QStandardItem(description)
-            ])
-        elif inventory_type == 'Armor':
-            self.armor_model.appendRow([
-                QtGui.QStandardItem(name),
-                QtGui.QStandardItem(str(value)),
-                QtGui.QStandardItem(str(weight)),
-                QtGui.QStandardItem('Yes' if bought_from_shop else 'No'),
-                QtGui.QStandardItem(description)
-            ])
-        elif inventory_type == 'Miscellaneous Items':
-            for row in range(self.misc_model.rowCount()):
-                if (self.misc_model.item(row, 0).text() == name and
-                    self.misc_model.item(row, 3).text() == ('Yes' if bought_from_shop else 'No')):
-                    break
-            else:
-                self.misc_model.appendRow([
-                    QtGui.QStandardItem(name),
-                    QtGui.QStandardItem(str(value)),
-                    QtGui.QStandardItem(str(weight)),
-                    QtGui.QStandardItem('Yes' if bought_from_shop else 'No'),
-                    QtGui.QStandardItem(description)  
-                ])
-        elif inventory_type == 'Gems':
-            for row in range(self.gem_model.rowCount()):
-                if (self.gem_model.item(row, 0).text() == name and
-                    self.gem_model.item(row, 4).text() == ('Yes' if bought_from_shop else 'No')):
-                    current_qty = int(self.gem_model.item(row, 1).text())
-                    current_total = Decimal(self.gem_model.item(row, 2).text())
-                    self.gem_model.setItem(row, 1, QtGui.QStandardItem(str(current_qty + 1)))
-                    self.gem_model.setItem(row, 2, QtGui.QStandardItem(str(current_total + value)))
-                    return
-            self.gem_model.appendRow([
-                QtGui.QStandardItem(name),
-                QtGui.QStandardItem("1"),
-                QtGui.QStandardItem(str(value)),
-                QtGui.QStandardItem(str(weight)),
-                QtGui.QStandardItem('Yes' if bought_from_shop else 'No')
-            ])
-        elif inventory_type == 'Art Objects':
-            self.art_model.appendRow([
-                QtGui.QStandardItem(name),
-                QtGui.QStandardItem(str(value)),
-                QtGui.QStandardItem(str(weight)),
-                QtGui.QStandardItem(description),  
-                QtGui.QStandardItem('Yes' if bought_from_shop else 'No') 
-            ])
-        elif inventory_type == 'Magic Items':
-            self.magic_model.appendRow([
-                QtGui.QStandardItem(name),
-                QtGui.QStandardItem('Unknown'),  
-                QtGui.QStandardItem('No'),  
-                QtGui.QStandardItem(str(value)),
-                QtGui.QStandardItem(str(weight)),
-                QtGui.QStandardItem(description), 
-                QtGui.QStandardItem('Yes' if bought_from_shop else 'No') 
-            ])
-        
+        value = to_decimal(value)
+        weight = to_decimal(weight)
+        if inventory_type == 'Gems':
+            self.add_gems_to_inventory(name, 1, value, weight, bought_from_shop)
+            return
+        record = InventoryRecord(inventory_type, name, value, weight,
+                                 bought_from_shop=bought_from_shop, description=description)
+        if inventory_type == 'Magic Items':
+            record.rarity = 'Unknown'
+        self.inventory_store.add(record)
+
+    def add_inventory_item(self, record):
+        """Add an item entered by hand, as an undoable action."""
+        self.begin_journal_action()
+        self.inventory_store.add(record)
+        self.record_action({'action_type': 'add_item', 'data': {'category': record.category, 'name': record.name}})
+
+    def add_gems_to_inventory(self, name, quantity, total_value, total_weight, bought_from_shop=False):
+        """Add gems to the matching stack, or start a new stack if there is none."""
+        record = self.inventory_store.find('Gems', name, bought_from_shop)
+        if record is None:
+            self.inventory_store.add(InventoryRecord(
+                'Gems', name, total_value, total_weight, quantity=quantity, bought_from_shop=bought_from_shop
+            ))
+        else:
+            self.inventory_store.update(
+                record,
+                quantity=record.quantity + quantity,
+                value=record.value + total_value,
+                weight=record.weight + total_weight
+            )
+
+    def remove_single_item(self, record):
+        """Remove one item: a single unit from a stack, otherwise the whole record."""
+        if record.quantity > 1:
+            self.inventory_store.update(
+                record,
+                quantity=record.quantity - 1,
+                value=record.value - record.unit_value(),
+                weight=record.weight - record.unit_weight()
+            )
+        else:
+            self.inventory_store.remove(record)
+
+    def get_selected_records(self, table):
+        """Records behind the selected rows of an inventory table, mapped through its filter proxy."""
+        proxy_model = table.model()
+        source_model = proxy_model.sourceModel()
+        rows = sorted({proxy_model.mapToSource(index).row() for index in table.selectionModel().selectedRows()})
+        return [source_model.record_at(row) for row in rows]
+
     def get_total_currency_in_gp(self):
         total = Decimal('0')
-        for currency in Currency:
+        for currency in self.coin_system:
             amount = self.currency_vars[currency.value]
             gp_value = amount * self.get_currency_value_in_gp(currency)
             total += gp_value
         return total
 
     def deduct_currency(self, amount_gp):
-        total_currency_in_gp = self.get_total_currency_in_gp()
-        if total_currency_in_gp < amount_gp:
-            return False
+        """
+        Pay amount_gp from the coin purse under the selected payment policy, taking change back.
+
+        :return: ({coin: paid}, {coin: change}), or None if the purse holds too little.
+        """
+        holdings = {coin: int(amount) for coin, amount in self.currency_vars.items()}
+        price = Fraction(amount_gp) * self.currency_rates.base_values[self.coin_system.price_coin]
+        payment = self.coin_solver.solve(holdings, price, self.payment_policy_combo.currentText())
+        if payment is None:
+            return None
+        paid, change = payment
+        for currency in self.coin_system:
+            delta = change[currency.value] - paid[currency.value]
+            if delta:
+                self.currency_vars[currency.value] += delta
+                self.currency_inputs[currency.value].setValue(int(self.currency_vars[currency.value]))
+        self.currency_holdings_label.setText(self.get_currency_holdings_text())
+        return payment
+
+    def describe_coins(self, coins):
+        return ", ".join(f"{coins[currency.value]} {currency.name}" for currency in self.coin_system if coins[currency.value]) or "nothing"
+
+    def plan_coin_consolidation(self, holdings):
+        """
+        Work out the exchange that leaves holdings in the fewest coins, at the current rates and exchange fee.
 
-        remaining = amount_gp
-        currency_order = sorted(
-            Currency,
-            key=lambda c: self.get_currency_value_in_gp(c),
-            reverse=True
+        :return: (handed in, received, fee in gp, coins afterwards) or None if the purse would not get lighter.
+        """
+        fee_rate = Fraction(str(self.exchange_fee_input.value())) / 100
+        handed, received, fee = self.coin_solver.consolidate(holdings, fee_rate)
+        after = {coin: holdings[coin] - handed[coin] + received[coin] for coin in holdings}
+        if sum(after.values()) >= sum(holdings.values()):
+            return None
+        fee_gp = Fraction(fee, self.coin_solver.scale) / self.currency_rates.base_values[self.coin_system.price_coin]
+        return handed, received, Decimal(fee_gp.numerator) / Decimal(fee_gp.denominator), after
+
+    def consolidate_coins(self):
+        holdings = {coin: int(amount) for coin, amount in self.currency_vars.items()}
+        plan = self.plan_coin_consolidation(holdings)
+        if plan is None:
+            QtWidgets.QMessageBox.information(self, "Consolidate Coins", "Your coins are already as light as they can be.")
+            return
+        handed, received, fee_gp, after = plan
+        weight_before = Decimal(sum(holdings.values())) / COINS_PER_POUND
+        weight_after = Decimal(sum(after.values())) / COINS_PER_POUND
+        fee_text = f"\nExchange fee: {fee_gp.quantize(Decimal('0.01'))} gp" if fee_gp else ""
+        reply = QtWidgets.QMessageBox.question(
+            self, "Consolidate Coins",
+            f"Hand in: {self.describe_coins(handed)}\nReceive: {self.describe_coins(received)}{fee_text}\n\n"
+            f"Coin weight: {weight_before.quantize(Decimal('0.01'))} lbs -> {weight_after.quantize(Decimal('0.01'))} lbs "
+            f"(saves {(weight_before - weight_after).quantize(Decimal('0.01'))} lbs)\n\nExchange the coins?",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+            QtWidgets.QMessageBox.No
         )
-        for currency in currency_order:
-            currency_value = self.get_currency_value_in_gp(currency)
-            available_amount = self.currency_vars[currency.value]
-            amount_needed = (remaining // currency_value).to_integral_value(rounding=ROUND_DOWN)
-            if amount_needed > available_amount:
-                amount_needed = available_amount
-            self.currency_vars[currency.value] -= amount_needed
-            remaining -= amount_needed * currency_value
-            self.currency_inputs[currency.value].setValue(int(self.currency_vars[currency.value]))
-            if remaining <= 0:
-                break
-        self.currency_holdings_label.setText(self.get_currency_holdings_text()) 
-        return True
+        if reply == QtWidgets.QMessageBox.No:
+            return
+
+        self.begin_journal_action()
+        self.set_coin_holdings(after)
+        self.update_total_wealth_and_weight()
+        self.record_action({'action_type': 'consolidate_coins', 'data': {'fee': str(fee_gp)}})
+
+    def set_coin_holdings(self, holdings):
+        for coin, amount in holdings.items():
+            self.currency_vars[coin] = Decimal(amount)
+            self.currency_inputs[coin].setValue(int(amount))
+        self.currency_holdings_label.setText(self.get_currency_holdings_text())
 
     def create_menu_bar(self):
         """Set up the menu bar with File, Edit, and Help menus."""
@@ -915,12 +3179,366 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
 
+        edit_menu = menu_bar.addMenu('Edit')
+
+        self.undo_action = QtWidgets.QAction('Undo', self)
+        self.undo_action.setShortcut(QtGui.QKeySequence.Undo)
+        edit_menu.addAction(self.undo_action)
+        self.undo_action.triggered.connect(self.undo_last_action)
+
+        self.redo_action = QtWidgets.QAction('Redo', self)
+        self.redo_action.setShortcut(QtGui.QKeySequence.Redo)
+        edit_menu.addAction(self.redo_action)
+        self.redo_action.triggered.connect(self.redo_last_action)
+
         help_menu = menu_bar.addMenu('Help')
 
         about_action = QtWidgets.QAction('About', self)
         help_menu.addAction(about_action)
         about_action.triggered.connect(self.show_about_dialog)
 
+    def setup_action_journal(self):
+        """Open the action journal, offering to restore the previous session if it did not close normally."""
+        directory = JOURNAL_DIR or QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.AppDataLocation)
+        if not directory:
+            directory = os.path.join(os.path.expanduser('~'), '.dnd_wealth_manager')
+        self.journal = ActionJournal(directory)
+        # Every item change is logged; journal_pending_changes() writes out those made outside actions
+        self.inventory_store.change_log = []
+        self.setup_currency_ledger(directory)
+        self.setup_party_roster(directory)
+        if self.journal.has_session():
+            reply = QtWidgets.QMessageBox.question(
+                self, "Restore Session",
+                "The previous session did not close normally. Restore its inventory, coins and undo history?",
+                QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+                QtWidgets.QMessageBox.Yes
+            )
+            if reply == QtWidgets.QMessageBox.Yes:
+                self.recover_action_journal()
+                self.record_currency_change('session_restore')
+        self.write_journal_snapshot()
+        self.update_undo_actions()
+
+    def recover_action_journal(self):
+        state, lines = self.journal.recover()
+        if state is not None:
+            self.restore_journal_state(state)
+        for line in lines:
+            entry, undo = self.journal.replay(line)
+            if entry is None:
+                continue
+            if self.can_apply_journal_entry(entry, undo):
+                self.apply_journal_entry(entry, undo)
+            else:
+                logging.warning(f"Skipped action journal line {line['seq']} while restoring the session")
+        self.update_total_wealth_and_weight()
+        logging.info(f"Restored the previous session from {self.journal.directory}")
+
+    def setup_currency_ledger(self, directory):
+        """Open the currency ledger; the purse starts each session empty, so any balance left in it is closed out."""
+        self.ledger = CurrencyLedger(directory)
+        self.ledger.open()
+        self.manual_currency_deltas = {}
+        self.manual_currency_timer = QTimer(self)
+        self.manual_currency_timer.setSingleShot(True)
+        self.manual_currency_timer.setInterval(1000)
+        self.manual_currency_timer.timeout.connect(lambda: self.record_currency_change('manual'))
+        self.record_currency_change('session_start')
+        self.ledger_session_combo.addItems(reversed(self.ledger.session_names()))
+        self.ledger_balance_time.setDateTime(QtCore.QDateTime.currentDateTime())
+
+    def setup_party_roster(self, directory):
+        """Open the party roster and fill in the member names from the last session."""
+        self.party_roster = PartyRoster(directory)
+        self.party_roster.open()
+        names = self.party_roster.members[:self.member_count_input.maximum()]
+        if names:
+            self.member_count_input.setValue(len(names))
+            self.update_member_inputs()
+            for member_input, name in zip(self.member_inputs, names):
+                member_input.setText(name)
+        self.update_party_standings()
+
+    def update_party_standings(self):
+        standings = self.party_roster.standings()
+        self.party_standings_table.setRowCount(len(standings))
+        for row, (name, totals) in enumerate(standings):
+            coins = ", ".join(f"{amount} {coin.upper()}" for coin, amount in totals['coins'].items() if amount)
+            value = totals['value']
+            cells = [name, coins, str(totals['items']), f"{value.quantize(Decimal('0.01'))}", str(totals['distributions'])]
+            for column, text in enumerate(cells):
+                self.party_standings_table.setItem(row, column, QtWidgets.QTableWidgetItem(text))
+
+    def show_member_history(self):
+        row = self.party_standings_table.currentRow()
+        if row < 0:
+            QtWidgets.QMessageBox.warning(self, "Warning", "Select a party member first.")
+            return
+        name = self.party_standings_table.item(row, 0).text()
+        self.distribution_results.clear()
+        self.distribution_results.append(f"=== {name}: Loot Received ===")
+        for timestamp, source, sign, share in self.party_roster.history(name):
+            when = datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            prefix = "-" if sign < 0 else ""
+            coins = ", ".join(f"{prefix}{amount} {coin.upper()}" for coin, amount in share['coins'].items())
+            parts = [part for part in (coins, ", ".join(share['items'])) if part]
+            self.distribution_results.append(f"{when} {source.replace('_', ' ')}: {'; '.join(parts) or 'nothing'} ({prefix}{share['value']} gp)")
+
+    def record_currency_change(self, source):
+        """Append the purse changes since the last ledger entry, tagged with their source.
+
+        Edits typed into the holdings spin boxes are collected separately and go in first as 'manual'.
+        """
+        if self.manual_currency_deltas:
+            self.manual_currency_timer.stop()
+            deltas = {coin: delta for coin, delta in self.manual_currency_deltas.items() if delta}
+            self.manual_currency_deltas = {}
+            if deltas:
+                self.ledger.record('manual', deltas)
+        # Coins of a previous coin system count as gone
+        deltas = {
+            coin: self.currency_vars.get(coin, Decimal('0')) - self.ledger.balance.get(coin, Decimal('0'))
+            for coin in dict.fromkeys(list(self.currency_vars) + list(self.ledger.balance))
+            if self.currency_vars.get(coin, Decimal('0')) != self.ledger.balance.get(coin, Decimal('0'))
+        }
+        if deltas:
+            self.ledger.record(source, deltas)
+
+    def show_ledger_balance(self):
+        timestamp = self.ledger_balance_time.dateTime().toMSecsSinceEpoch() / 1000
+        self.ledger_balance_label.setText(self.ledger_balance_text(self.ledger.balance_at(timestamp)))
+
+    def show_ledger_session_report(self):
+        session = self.ledger_session_combo.currentText()
+        report = self.ledger.session_report(session) if session else None
+        if report is None:
+            self.ledger_report.setPlainText("")
+            return
+
+        def gp_value(coins):
+            return sum((
+                Decimal(amount) * self.get_currency_value_in_gp(self.coin_system.coin(coin))
+                for coin, amount in coins.items() if coin in self.coin_system
+            ), Decimal('0'))
+
+        def coins_text(coins):
+            return ", ".join(f"{amount:+} {coin.upper()}" for coin, amount in coins.items() if amount) or "no change"
+
+        end = datetime.datetime.fromtimestamp(report['end']).strftime('%Y-%m-%d %H:%M:%S')
+        lines = [
+            f"Session {session} to {end}, {report['entries']} changes",
+            f"Opening: {self.ledger_balance_text(report['opening'])} ({gp_value(report['opening']):.2f} gp)",
+            f"Closing: {self.ledger_balance_text(report['closing'])} ({gp_value(report['closing']):.2f} gp)",
+            ""
+        ]
+        income = spending = Decimal('0')
+        for source, coins in sorted(report['sources'].items(), key=lambda item: -gp_value(item[1])):
+            net = gp_value(coins)
+            if source in CurrencyLedger.BALANCE_TRANSFERS:
+                pass
+            elif net > 0:
+                income += net
+            elif net < 0:
+                spending -= net
+            lines.append(f"{source.replace('_', ' ')}: {coins_text(coins)} ({net:+.2f} gp)")
+        lines += ["", f"Income: {income:.2f} gp", f"Spending: {spending:.2f} gp"]
+        self.ledger_report.setPlainText("\n".join(lines))
+
+    def ledger_balance_text(self, coins):
+        return ", ".join(f"{coins.get(currency.value, 0)} {currency.name}" for currency in self.coin_system)
+
+    def get_journal_state(self):
+        return {
+            'inventory': [record.to_state() for record in self.inventory_store.all_records()],
+            'coin_system': self.coin_system.name,
+            'currency': {coin: str(amount) for coin, amount in self.currency_vars.items()},
+            'party_loot': self.party_loot
+        }
+
+    def restore_journal_state(self, state):
+        records = {category: [] for category in INVENTORY_CATEGORIES}
+        for record_state in state['inventory']:
+            records[record_state['category']].append(InventoryRecord.from_state(record_state))
+        # Empty every category first so restored ids cannot collide with current ones
+        for category in INVENTORY_CATEGORIES:
+            self.inventory_store.replace(category, [])
+        for category, category_records in records.items():
+            self.inventory_store.replace(category, category_records)
+        if state.get('coin_system') in self.coin_systems:
+            self.set_coin_system(state['coin_system'])
+        for coin, amount in state['currency'].items():
+            if coin in self.currency_vars:
+                self.currency_vars[coin] = Decimal(amount)
+                self.currency_inputs[coin].setValue(int(self.currency_vars[coin]))
+        self.currency_holdings_label.setText(self.get_currency_holdings_text())
+        self.party_loot = state['party_loot']
+
+    def get_party_loot_signature(self):
+        """
+        Cheap check for party loot changes: adding treasure and distributing loot replace the
+        whole dict and nothing else changes it, so its identity and sizes are enough.
+        """
+        loot = self.party_loot
+        return (id(loot), json.dumps(loot['Coins'], default=str, sort_keys=True),
+                len(loot['Gems']), len(loot['Art Objects']), len(loot['Magic Items']))
+
+    def mark_journal_state(self):
+        """Remember the coins and party loot the journal has seen, to notice changes made outside it."""
+        self.journal_currency = dict(self.currency_vars)
+        self.journal_party_loot = self.get_party_loot_signature()
+
+    def write_journal_snapshot(self):
+        self.journal.write_snapshot(self.get_journal_state())
+        self.inventory_store.unrecorded_changes = False
+        self.inventory_store.change_log = []
+        self.mark_journal_state()
+
+    def journal_pending_changes(self):
+        """
+        Journal anything changed outside undoable actions (coins typed in, for one), so a
+        recovered session has it. Item changes and coins go in as one 'change' line; only
+        replaced categories (a loaded profile) or party loot changed in place need a snapshot.
+        """
+        store = self.inventory_store
+        if store.unrecorded_changes or self.get_party_loot_signature() != self.journal_party_loot:
+            self.write_journal_snapshot()
+            return
+        currency = {
+            coin: str(amount - self.journal_currency.get(coin, Decimal('0')))
+            for coin, amount in self.currency_vars.items()
+            if amount != self.journal_currency.get(coin, Decimal('0'))
+        }
+        if store.change_log or currency:
+            self.journal.change({'changes': store.change_log, 'currency': currency, 'party_loot': None})
+            store.change_log = []
+            self.after_journal_change()
+
+    def begin_journal_action(self):
+        """Start recording the changes of an undoable action; finish with record_action()."""
+        self.journal_pending_changes()
+        self.journal_currency_before = dict(self.currency_vars)
+        self.journal_party_loot_before = (self.party_loot, self.get_party_loot_signature())
+
+    def cancel_journal_action(self):
+        """Stop recording an action started with begin_journal_action() that made no changes after all."""
+        self.inventory_store.change_log = []
+        self.journal_currency_before = None
+        self.journal_party_loot_before = None
+
+    def record_action(self, action):
+        """Add the action and the changes recorded since begin_journal_action() to the journal."""
+        self.record_currency_change(action['action_type'])
+        store = self.inventory_store
+        changes = store.change_log
+        store.change_log = []
+        currency = {
+            coin: str(amount - self.journal_currency_before[coin])
+            for coin, amount in self.currency_vars.items()
+            if amount != self.journal_currency_before[coin]
+        }
+        party_loot_before, signature_before = self.journal_party_loot_before
+        self.journal_party_loot_before = None
+        party_loot = None
+        if self.get_party_loot_signature() != signature_before:
+            party_loot = [json.loads(json.dumps(loot, default=str)) for loot in (party_loot_before, self.party_loot)]
+        if not changes and not currency and party_loot is None:
+            return
+        self.journal.record({
+            'action_type': action['action_type'],
+            'data': json.loads(json.dumps(action['data'], default=str)),
+            'changes': changes,
+            'currency': currency,
+            'party_loot': party_loot
+        })
+        self.after_journal_change()
+
+    def can_apply_journal_entry(self, entry, undo):
+        sign = -1 if undo else 1
+        if any(self.currency_vars[coin] + sign * Decimal(delta) < 0 for coin, delta in entry['currency'].items()):
+            return False
+        return all(self.inventory_store.can_apply_change(change, undo) for change in entry['changes'])
+
+    def apply_journal_entry(self, entry, undo):
+        """Revert (undo=True) or re-apply the changes of a journal entry."""
+        store = self.inventory_store
+        for change in (reversed(entry['changes']) if undo else entry['changes']):
+            store.apply_change(change, undo)
+        # The entry itself is the journal's record of these changes
+        store.change_log = []
+        sign = -1 if undo else 1
+        for coin, delta in entry['currency'].items():
+            self.currency_vars[coin] += sign * Decimal(delta)
+            self.currency_inputs[coin].setValue(int(self.currency_vars[coin]))
+        self.currency_holdings_label.setText(self.get_currency_holdings_text())
+        if entry['party_loot'] is not None:
+            self.party_loot = copy.deepcopy(entry['party_loot'][0 if undo else 1])
+        self.update_total_wealth_and_weight()
+
+    def after_journal_change(self):
+        if self.journal.needs_snapshot():
+            self.write_journal_snapshot()
+        else:
+            self.mark_journal_state()
+        self.update_undo_actions()
+
+    def describe_journal_entry(self, entry):
+        return entry['action_type'].replace('_', ' ').capitalize()
+
+    def undo_last_action(self):
+        entry = self.journal.next_undo()
+        if entry is None:
+            return
+        self.journal_pending_changes()
+        if not self.can_apply_journal_entry(entry, undo=True):
+            QtWidgets.QMessageBox.warning(
+                self, "Warning",
+                f"Cannot undo '{self.describe_journal_entry(entry)}': the items or coins it changed have changed since."
+            )
+            return
+        self.apply_journal_entry(entry, undo=True)
+        self.record_currency_change(f"undo_{entry['action_type']}")
+        if entry['action_type'] == 'distribute_loot':
+            self.party_roster.record('undo_distribute_loot', entry['data']['distributions'], sign=-1)
+            self.update_party_standings()
+        self.journal.undo()
+        self.after_journal_change()
+
+    def redo_last_action(self):
+        entry = self.journal.next_redo()
+        if entry is None:
+            return
+        self.journal_pending_changes()
+        if not self.can_apply_journal_entry(entry, undo=False):
+            QtWidgets.QMessageBox.warning(
+                self, "Warning",
+                f"Cannot redo '{self.describe_journal_entry(entry)}': the items or coins it changed have changed since."
+            )
+            return
+        self.apply_journal_entry(entry, undo=False)
+        self.record_currency_change(f"redo_{entry['action_type']}")
+        if entry['action_type'] == 'distribute_loot':
+            self.party_roster.record('redo_distribute_loot', entry['data']['distributions'])
+            self.update_party_standings()
+        self.journal.redo()
+        self.after_journal_change()
+
+    def update_undo_actions(self):
+        undo_entry = self.journal.next_undo()
+        redo_entry = self.journal.next_redo()
+        self.undo_action.setEnabled(undo_entry is not None)
+        self.redo_action.setEnabled(redo_entry is not None)
+        self.undo_action.setText(f"Undo {self.describe_journal_entry(undo_entry)}" if undo_entry else "Undo")
+        self.redo_action.setText(f"Redo {self.describe_journal_entry(redo_entry)}" if redo_entry else "Redo")
+
+    def closeEvent(self, event):
+        # A normal exit needs no recovery; the journal only outlives sessions that crash
+        self.journal.close(discard=True)
+        self.record_currency_change('manual')
+        self.ledger.close()
+        self.party_roster.close()
+        super().closeEvent(event)
+
     def create_currency_tab(self):
         """Create the Currency management tab."""
         self.currency_tab = QtWidgets.QWidget()
@@ -933,30 +3551,83 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         holdings_group.setLayout(holdings_layout)
         main_layout.addWidget(holdings_group)
 
+        self.currency_inputs_layout = QtWidgets.QVBoxLayout()
+        holdings_layout.addLayout(self.currency_inputs_layout)
+
+        consolidate_button = QtWidgets.QPushButton("Consolidate Coins")
+        consolidate_button.setToolTip("Exchange coins for the fewest, lightest coins of the same value.")
+        consolidate_button.clicked.connect(self.consolidate_coins)
+        holdings_layout.addWidget(consolidate_button)
+
+        converter_group = QtWidgets.QGroupBox("Currency Converter")
+        converter_layout = QtWidgets.QHBoxLayout()
+        converter_group.setLayout(converter_layout)
+        main_layout.addWidget(converter_group)
+
+        self.converter_layout = converter_layout
+        self.build_currency_widgets()
+
+        ledger_group = QtWidgets.QGroupBox("Currency Ledger")
+        ledger_layout = QtWidgets.QVBoxLayout()
+        ledger_group.setLayout(ledger_layout)
+        main_layout.addWidget(ledger_group)
+
+        balance_layout = QtWidgets.QHBoxLayout()
+        balance_layout.addWidget(QtWidgets.QLabel("Holdings at:"))
+        self.ledger_balance_time = QtWidgets.QDateTimeEdit()
+        self.ledger_balance_time.setCalendarPopup(True)
+        self.ledger_balance_time.setDisplayFormat("yyyy-MM-dd HH:mm:ss")
+        self.ledger_balance_time.dateTimeChanged.connect(self.show_ledger_balance)
+        balance_layout.addWidget(self.ledger_balance_time)
+        self.ledger_balance_label = QtWidgets.QLabel()
+        balance_layout.addWidget(self.ledger_balance_label, 1)
+        ledger_layout.addLayout(balance_layout)
+
+        session_layout = QtWidgets.QHBoxLayout()
+        session_layout.addWidget(QtWidgets.QLabel("Session:"))
+        self.ledger_session_combo = QtWidgets.QComboBox()
+        session_layout.addWidget(self.ledger_session_combo, 1)
+        report_button = QtWidgets.QPushButton("Session Report")
+        report_button.clicked.connect(self.show_ledger_session_report)
+        session_layout.addWidget(report_button)
+        ledger_layout.addLayout(session_layout)
+
+        self.ledger_report = QtWidgets.QTextEdit()
+        self.ledger_report.setReadOnly(True)
+        ledger_layout.addWidget(self.ledger_report)
+            
+    def build_currency_widgets(self):
+        """(Re)create the holdings and converter inputs for the coins of the current coin system."""
+        for layout in (self.currency_inputs_layout, self.converter_layout):
+            while layout.count():
+                widget = layout.takeAt(0).widget()
+                widget.setParent(None)
+                widget.deleteLater()
+
         self.currency_inputs = {}
-        for currency in Currency:
-            row_layout = QtWidgets.QHBoxLayout()
+        for currency in self.coin_system:
+            row = QtWidgets.QWidget()
+            row_layout = QtWidgets.QHBoxLayout(row)
+            row_layout.setContentsMargins(0, 0, 0, 0)
             label = QtWidgets.QLabel(currency.name)
             spin_box = QtWidgets.QSpinBox()
             spin_box.setRange(0, 999999999)
+            spin_box.setValue(int(self.currency_vars.get(currency.value, 0)))
             self.currency_inputs[currency.value] = spin_box
             row_layout.addWidget(label)
             row_layout.addWidget(spin_box)
-            holdings_layout.addLayout(row_layout)
+            self.currency_inputs_layout.addWidget(row)
 
-        for currency in Currency:
+        for currency in self.coin_system:
             spin_box = self.currency_inputs[currency.value]
             spin_box.valueChanged.connect(lambda value, currency=currency: self.update_currency(currency, value))
 
-        converter_group = QtWidgets.QGroupBox("Currency Converter")
-        converter_layout = QtWidgets.QHBoxLayout()
-        converter_group.setLayout(converter_layout)
-        main_layout.addWidget(converter_group)
-
         self.converter_inputs = {}
         self.converter_results = {}
-        for currency in Currency:
-            v_layout = QtWidgets.QVBoxLayout()
+        for currency in self.coin_system:
+            column = QtWidgets.QWidget()
+            v_layout = QtWidgets.QVBoxLayout(column)
+            v_layout.setContentsMargins(0, 0, 0, 0)
             label = QtWidgets.QLabel(currency.name)
             v_layout.addWidget(label)
 
@@ -970,17 +3641,21 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             v_layout.addWidget(result_label)
             self.converter_results[currency.value] = result_label
 
-            converter_layout.addLayout(v_layout)
-
-        for result_label in self.converter_results.values():
-            result_label.setText("")
+            self.converter_layout.addWidget(column)
 
         for currency_value, spin_box in self.converter_inputs.items():
             spin_box.valueChanged.connect(lambda value, currency=currency_value: self.convert_currency(currency))
-            
+
     def update_currency(self, currency, value):
+        # Changes made in code set currency_vars first; anything else was typed in
+        delta = Decimal(value) - self.currency_vars[currency.value]
+        if delta:
+            self.manual_currency_deltas[currency.value] = self.manual_currency_deltas.get(currency.value, Decimal('0')) + delta
+            self.manual_currency_timer.start()
         self.currency_vars[currency.value] = Decimal(value)
         logging.info(f"Currency updated: {currency.name} = {value}")
+        if delta:
+            self.journal_pending_changes()
         self.update_total_wealth_and_weight()
         self.currency_holdings_label.setText(self.get_currency_holdings_text())        
 
@@ -991,6 +3666,21 @@ class DnDWealthManager(QtWidgets.QMainWindow):
 
         layout = QtWidgets.QVBoxLayout(self.inventory_tab)
 
+        self.inventory_search_input = QtWidgets.QLineEdit()
+        self.inventory_search_input.setPlaceholderText("Search all inventory (names and descriptions)")
+        layout.addWidget(self.inventory_search_input)
+        self.inventory_search_input.textChanged.connect(self.search_inventory)
+
+        self.inventory_search_status = QtWidgets.QLabel()
+        self.inventory_search_results = QtWidgets.QListWidget()
+        self.inventory_search_results.setMaximumHeight(150)
+        layout.addWidget(self.inventory_search_status)
+        layout.addWidget(self.inventory_search_results)
+        self.inventory_search_status.hide()
+        self.inventory_search_results.hide()
+        self.inventory_search_results.itemClicked.connect(self.show_inventory_search_result)
+        self.inventory_search_results.itemActivated.connect(self.show_inventory_search_result)
+
         self.inventory_tabs = QtWidgets.QTabWidget()
         layout.addWidget(self.inventory_tabs)
 
@@ -1001,6 +3691,16 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.create_art_tab()
         self.create_magic_tab()
 
+        # Sub-tab, table and filter box of each category, for jumping to search results
+        self.inventory_views = {
+            'Weapons': (self.weapons_tab, self.weapons_table, self.weapons_search_input),
+            'Armor': (self.armor_tab, self.armor_table, self.armor_search_input),
+            'Miscellaneous Items': (self.misc_tab, self.misc_table, self.misc_search_input),
+            'Gems': (self.gems_tab, self.gem_table, self.gem_search_input),
+            'Art Objects': (self.art_tab, self.art_table, self.art_search_input),
+            'Magic Items': (self.magic_tab, self.magic_table, self.magic_search_input)
+        }
+
         total_layout = QtWidgets.QHBoxLayout()
         self.total_wealth_label = QtWidgets.QLabel("Total Wealth: 0 gp")
         self.total_weight_label = QtWidgets.QLabel("Total Weight: 0 lbs")
@@ -1008,6 +3708,50 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         total_layout.addWidget(self.total_weight_label)
         layout.addLayout(total_layout)
         
+    def search_inventory(self):
+        """List the records in every category whose names or descriptions match the search box."""
+        query = self.inventory_search_input.text()
+        self.inventory_search_results.clear()
+        if not query.strip():
+            self.inventory_search_status.hide()
+            self.inventory_search_results.hide()
+            return
+        records, total = self.inventory_store.search(query, INVENTORY_SEARCH_RESULT_LIMIT)
+        for record in records:
+            label = f"{record.name} ({record.category})"
+            if record.quantity > 1:
+                label = f"{record.quantity} x {label}"
+            item = QtWidgets.QListWidgetItem(label)
+            item.setData(Qt.UserRole, record.item_id)
+            self.inventory_search_results.addItem(item)
+        if total is None:
+            self.inventory_search_status.setText(f"More than {len(records)} matches (showing the first {len(records)})")
+        elif total > len(records):
+            self.inventory_search_status.setText(f"{total} matches (showing the first {len(records)})")
+        else:
+            self.inventory_search_status.setText(f"{total} match{'es' if total != 1 else ''}")
+        self.inventory_search_status.show()
+        self.inventory_search_results.show()
+
+    def show_inventory_search_result(self, item):
+        """Switch to the sub-tab holding a search result and select its row."""
+        record = self.inventory_store.get(item.data(Qt.UserRole))
+        if record is None:
+            # Sold or removed since the search ran
+            self.search_inventory()
+            return
+        tab, table, search_input = self.inventory_views[record.category]
+        self.inventory_tabs.setCurrentWidget(tab)
+        proxy_model = table.model()
+        source_index = proxy_model.sourceModel().index(self.inventory_store.row_of(record), 0)
+        index = proxy_model.mapFromSource(source_index)
+        if not index.isValid():
+            # Hidden by the sub-tab's own filter
+            search_input.clear()
+            index = proxy_model.mapFromSource(source_index)
+        table.selectRow(index.row())
+        table.scrollTo(index)
+
     def create_weapons_tab(self):
         """Create the Weapons sub-tab."""
         self.weapons_tab = QtWidgets.QWidget()
@@ -1056,8 +3800,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         search_layout.addWidget(self.weapons_sort_combo)
 
         self.weapons_table = QtWidgets.QTableView()
-        self.weapons_model = QtGui.QStandardItemModel(0, 5)
-        self.weapons_model.setHorizontalHeaderLabels(['Name', 'Value (gp)', 'Weight (lbs)', 'Bought from Shop', 'Description'])
+        self.weapons_model = InventoryTableModel(self.inventory_store, 'Weapons')
 
         self.weapons_proxy_model = QtCore.QSortFilterProxyModel()
         self.weapons_proxy_model.setSourceModel(self.weapons_model)
@@ -1105,13 +3848,9 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         if not description:
             description = self.fetch_description_from_api(name, 'weapons')
 
-        self.weapons_model.appendRow([
-            QtGui.QStandardItem(name),
-            QtGui.QStandardItem(str(value)),
-            QtGui.QStandardItem(str(weight)),
-            QtGui.QStandardItem('No'),  # Bought from Shop
-            QtGui.QStandardItem(description if description else '')  # Description
-        ])
+        self.add_inventory_item(InventoryRecord(
+            'Weapons', name, to_decimal(value), to_decimal(weight), description=description or ''
+        ))
 
         # Clear input fields
         self.weapon_name_input.clear()
@@ -1123,11 +3862,9 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.update_total_wealth_and_weight()
             
     def display_weapon_description(self, selected, deselected):
-        indexes = self.weapons_table.selectionModel().selectedRows()
-        if indexes:
-            index = indexes[0]
-            description = self.weapons_model.item(index.row(), 4).text()
-            self.weapon_description.setText(description)
+        records = self.get_selected_records(self.weapons_table)
+        if records:
+            self.weapon_description.setText(records[0].description)
         else:
             self.weapon_description.clear()
 
@@ -1141,24 +3878,30 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             column = 2
         else:
             column = 0
-        self.weapons_table.sortByColumn(column, QtCore.Qt.AscendingOrder)
+        self.weapons_model.sort(column, QtCore.Qt.AscendingOrder)
 
     def remove_weapons_item(self):
-        selected = self.weapons_table.selectionModel().selectedRows()
-        for index in sorted(selected, reverse=True):
+        records = self.get_selected_records(self.weapons_table)
+        if not records:
+            return
+        self.begin_journal_action()
+        removed_rows = []
+        for record in records:
             row_data = {
-                'name': self.weapons_model.item(index.row(), 0).text(),
-                'value': float(self.weapons_model.item(index.row(), 1).text()),
-                'weight': float(self.weapons_model.item(index.row(), 2).text())
-            }
-            self.weapons_model.removeRow(index.row())
-            action = {
-                'action_type': 'remove_weapons_item',
-                'data': row_data
+                'name': record.name,
+                'value': float(record.value),
+                'weight': float(record.weight)
             }
+            self.inventory_store.remove(record)
+            removed_rows.append(row_data)
+        action = {
+            'action_type': 'remove_weapons_item',
+            'data': removed_rows
+        }
+        self.record_action(action)
             
         self.update_total_wealth_and_weight()   
-        
+
     def create_armor_tab(self):
         """Create the Armor sub-tab."""
         self.armor_tab = QtWidgets.QWidget()
@@ -1207,8 +3950,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         search_layout.addWidget(self.armor_sort_combo)
 
         self.armor_table = QtWidgets.QTableView()
-        self.armor_model = QtGui.QStandardItemModel(0, 5)
-        self.armor_model.setHorizontalHeaderLabels(['Name', 'Value (gp)', 'Weight (lbs)', 'Bought from Shop', 'Description'])
+        self.armor_model = InventoryTableModel(self.inventory_store, 'Armor')
 
         self.armor_proxy_model = QtCore.QSortFilterProxyModel()
         self.armor_proxy_model.setSourceModel(self.armor_model)
@@ -1251,13 +3993,9 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Warning", "Cannot add item. Carrying capacity exceeded.")
             return
 
-        self.armor_model.appendRow([
-            QtGui.QStandardItem(name),
-            QtGui.QStandardItem(str(value)),
-            QtGui.QStandardItem(str(weight)),
-            QtGui.QStandardItem('No'),
-            QtGui.QStandardItem(description)
-        ])
+        self.add_inventory_item(InventoryRecord(
+            'Armor', name, to_decimal(value), to_decimal(weight), description=description
+        ))
         self.armor_name_input.clear()
         self.armor_value_input.setValue(0)
         self.armor_weight_input.setValue(0)
@@ -1265,11 +4003,9 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.update_total_wealth_and_weight()  
         
     def display_armor_description(self, selected, deselected):
-        indexes = self.armor_table.selectionModel().selectedRows()
-        if indexes:
-            index = indexes[0]
-            description = self.armor_model.item(index.row(), 4).text()
-            self.armor_description.setText(description)
+        records = self.get_selected_records(self.armor_table)
+        if records:
+            self.armor_description.setText(records[0].description)
         else:
             self.armor_description.clear()
 
@@ -1283,21 +4019,27 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             column = 2
         else:
             column = 0
-        self.armor_table.sortByColumn(column, QtCore.Qt.AscendingOrder)
+        self.armor_model.sort(column, QtCore.Qt.AscendingOrder)
 
     def remove_armor_item(self):
-        selected = self.armor_table.selectionModel().selectedRows()
-        for index in sorted(selected, reverse=True):
+        records = self.get_selected_records(self.armor_table)
+        if not records:
+            return
+        self.begin_journal_action()
+        removed_rows = []
+        for record in records:
             row_data = {
-                'name': self.armor_model.item(index.row(), 0).text(),
-                'value': float(self.armor_model.item(index.row(), 1).text()),
-                'weight': float(self.armor_model.item(index.row(), 2).text())
-            }
-            self.armor_model.removeRow(index.row())
-            action = {
-                'action_type': 'remove_armor_item',
-                'data': row_data
+                'name': record.name,
+                'value': float(record.value),
+                'weight': float(record.weight)
             }
+            self.inventory_store.remove(record)
+            removed_rows.append(row_data)
+        action = {
+            'action_type': 'remove_armor_item',
+            'data': removed_rows
+        }
+        self.record_action(action)
         self.update_total_wealth_and_weight()   
 
     def create_misc_tab(self):
@@ -1358,8 +4100,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
 
         # Table View
         self.misc_table = QtWidgets.QTableView()
-        self.misc_model = QtGui.QStandardItemModel(0, 5)  # Increased to 5 columns
-        self.misc_model.setHorizontalHeaderLabels(['Name', 'Value (gp)', 'Weight (lbs)', 'Bought from Shop', 'Description'])  # Added 'Description'
+        self.misc_model = InventoryTableModel(self.inventory_store, 'Miscellaneous Items')
 
         self.misc_proxy_model = QtCore.QSortFilterProxyModel()
         self.misc_proxy_model.setSourceModel(self.misc_model)
@@ -1386,15 +4127,12 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.misc_table.selectionModel().selectionChanged.connect(self.display_misc_description)
         
     def display_misc_description(self, selected, deselected):
-        indexes = self.misc_table.selectionModel().selectedRows()
-        if indexes:
-            index = indexes[0]
-            description_item = self.misc_model.item(index.row(), 4)  # Column 4 is Description
-            description = description_item.text() if description_item else ''
-            self.misc_description.setText(description)
+        records = self.get_selected_records(self.misc_table)
+        if records:
+            self.misc_description.setText(records[0].description)
         else:
             self.misc_description.clear() 
-            
+
     def sort_misc_items(self):
         sort_key = self.misc_sort_combo.currentText()
         if sort_key == 'Name':
@@ -1405,7 +4143,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             column = 2
         else:
             column = 0
-        self.misc_table.sortByColumn(column, QtCore.Qt.AscendingOrder)    
+        self.misc_model.sort(column, QtCore.Qt.AscendingOrder)    
 
     def create_gems_tab(self):
         """Create the Gems sub-tab."""
@@ -1454,12 +4192,11 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         search_layout.addWidget(self.gem_sort_combo)
 
         self.gem_table = QtWidgets.QTableView()
-        self.gem_model = QtGui.QStandardItemModel(0, 5)  
-        self.gem_model.setHorizontalHeaderLabels(['Type', 'Quantity', 'Total Value (gp)', 'Weight (lbs)', 'Bought from Shop']) 
+        self.gem_model = InventoryTableModel(self.inventory_store, 'Gems')
 
         self.gem_proxy_model = QtCore.QSortFilterProxyModel()
         self.gem_proxy_model.setSourceModel(self.gem_model)
-        self.gem_proxy_model.setFilterKeyColumn(0)  
+        self.gem_proxy_model.setFilterKeyColumn(0)
         self.gem_table.setModel(self.gem_proxy_model)
         self.gem_table.setSortingEnabled(False)
 
@@ -1482,7 +4219,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             column = 3
         else:
             column = 0
-        self.gem_table.sortByColumn(column, QtCore.Qt.AscendingOrder)    
+        self.gem_model.sort(column, QtCore.Qt.AscendingOrder)    
 
     def create_art_tab(self):
         """Create the Art Objects sub-tab."""
@@ -1528,8 +4265,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         search_layout.addWidget(self.art_sort_combo)
 
         self.art_table = QtWidgets.QTableView()
-        self.art_model = QtGui.QStandardItemModel(0, 5)  # Increased column count to 5
-        self.art_model.setHorizontalHeaderLabels(['Name', 'Value (gp)', 'Weight (lbs)', 'Description', 'Bought from Shop'])  # Added 'Description'
+        self.art_model = InventoryTableModel(self.inventory_store, 'Art Objects')
 
         self.art_proxy_model = QtCore.QSortFilterProxyModel()
         self.art_proxy_model.setSourceModel(self.art_model)
@@ -1553,14 +4289,12 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         layout.addWidget(self.art_description)
         
     def display_art_description(self, selected, deselected):
-        indexes = self.art_table.selectionModel().selectedRows()
-        if indexes:
-            index = indexes[0]
-            description = self.art_model.item(index.row(), 3).text()
-            self.art_description.setText(description)
+        records = self.get_selected_records(self.art_table)
+        if records:
+            self.art_description.setText(records[0].description)
         else:
             self.art_description.clear()
-        
+
     def sort_art_items(self):
         sort_key = self.art_sort_combo.currentText()
         if sort_key == 'Name':
@@ -1571,7 +4305,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             column = 2
         else:
             column = 0
-        self.art_table.sortByColumn(column, QtCore.Qt.AscendingOrder)    
+        self.art_model.sort(column, QtCore.Qt.AscendingOrder)    
 
     def create_magic_tab(self):
         """Create the Magic Items sub-tab."""
@@ -1629,8 +4363,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         search_layout.addWidget(self.magic_sort_combo)
 
         self.magic_table = QtWidgets.QTableView()
-        self.magic_model = QtGui.QStandardItemModel(0, 6)  # Increased column count to 6
-        self.magic_model.setHorizontalHeaderLabels(['Name', 'Rarity', 'Requires Attunement', 'Value (gp)', 'Weight (lbs)', 'Description', 'Bought from Shop'])  # Added 'Description'
+        self.magic_model = InventoryTableModel(self.inventory_store, 'Magic Items')
 
         self.magic_proxy_model = QtCore.QSortFilterProxyModel()
         self.magic_proxy_model.setSourceModel(self.magic_model)
@@ -1654,12 +4387,9 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         layout.addWidget(self.magic_description)
         
     def display_magic_description(self, selected, deselected):
-        indexes = self.magic_table.selectionModel().selectedRows()
-        if indexes:
-            index = indexes[0]
-            description_item = self.magic_model.item(index.row(), 5)  # Column 5 is Description
-            description = description_item.text() if description_item else ''
-            self.magic_description.setText(description)
+        records = self.get_selected_records(self.magic_table)
+        if records:
+            self.magic_description.setText(records[0].description)
         else:
             self.magic_description.clear()
 
@@ -1675,84 +4405,27 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             column = 4
         else:
             column = 0
-        self.magic_table.sortByColumn(column, QtCore.Qt.AscendingOrder)
+        self.magic_model.sort(column, QtCore.Qt.AscendingOrder)
 
     def remove_item_from_inventory_by_name(self, category, name, bought_from_shop):
-        if category == 'Weapons':
-            for row in range(self.weapons_model.rowCount()):
-                if (self.weapons_model.item(row, 0).text() == name and
-                    self.weapons_model.item(row, 3).text() == ('Yes' if bought_from_shop else 'No')):
-                    self.weapons_model.removeRow(row)
-                    break
-        elif category == 'Armor':
-            for row in range(self.armor_model.rowCount()):
-                if (self.armor_model.item(row, 0).text() == name and
-                    self.armor_model.item(row, 3).text() == ('Yes' if bought_from_shop else 'No')):
-                    self.armor_model.removeRow(row)
-                    break
-        elif category == 'Miscellaneous Items':
-            for row in range(self.misc_model.rowCount()):
-                if (self.misc_model.item(row, 0).text() == name and
-                    self.misc_model.item(row, 3).text() == ('Yes' if bought_from_shop else 'No')):
-                    self.misc_model.removeRow(row)
-                    break
-        elif category == 'Gems':
-            for row in range(self.gem_model.rowCount()):
-                if (self.gem_model.item(row, 0).text() == name and
-                    self.gem_model.item(row, 4).text() == ('Yes' if bought_from_shop else 'No')):
-                    quantity = int(self.gem_model.item(row, 1).text())
-                    if quantity > 1:
-                        current_total = Decimal(self.gem_model.item(row, 2).text())
-                        value_per_item = current_total / quantity
-                        new_total = current_total - value_per_item
-                        self.gem_model.setItem(row, 1, QtGui.QStandardItem(str(quantity - 1)))
-                        self.gem_model.setItem(row, 2, QtGui.QStandardItem(str(new_total)))
-                    else:
-                        self.gem_model.removeRow(row)
-                    break
-        elif category == 'Art Objects':
-            for row in range(self.art_model.rowCount()):
-                if self.art_model.item(row, 0).text() == name and self.art_model.item(row, 3).text() == ('Yes' if bought_from_shop else 'No'):
-                    self.art_model.removeRow(row)
-                    break
-        elif category == 'Magic Items':
-            for row in range(self.magic_model.rowCount()):
-                if self.magic_model.item(row, 0).text() == name and self.magic_model.item(row, 5).text() == ('Yes' if bought_from_shop else 'No'):
-                    self.magic_model.removeRow(row)
-                    break
+        record = self.inventory_store.find(category, name, bought_from_shop)
+        if record is not None:
+            self.remove_single_item(record)
 
     def add_item_back_to_inventory(self, category, name, sell_price):
-        if category == 'Miscellaneous Items':
-            self.misc_model.appendRow([
-                QtGui.QStandardItem(name),
-                QtGui.QStandardItem(str(sell_price)),
-                QtGui.QStandardItem("0"), 
-                QtGui.QStandardItem('Yes')
-            ])
-        elif category == 'Gems':
-            self.gem_model.appendRow([
-                QtGui.QStandardItem(name),
-                QtGui.QStandardItem("1"),
-                QtGui.QStandardItem(str(sell_price)),
-                QtGui.QStandardItem("0.01"),
-                QtGui.QStandardItem('Yes')
-            ])
-        elif category == 'Art Objects':
-            self.art_model.appendRow([
-                QtGui.QStandardItem(name),
-                QtGui.QStandardItem(str(sell_price)),
-                QtGui.QStandardItem("1"),  
-                QtGui.QStandardItem('Yes')
-            ])
-        elif category == 'Magic Items':
-            self.magic_model.appendRow([
-                QtGui.QStandardItem(name),
-                QtGui.QStandardItem('Unknown'),  
-                QtGui.QStandardItem('Yes'),
-                QtGui.QStandardItem(str(sell_price)),
-                QtGui.QStandardItem("0"),  
-                QtGui.QStandardItem('Yes')
-            ])
+        default_weights = {
+            'Miscellaneous Items': Decimal('0'),
+            'Gems': Decimal('0.01'),
+            'Art Objects': Decimal('1'),
+            'Magic Items': Decimal('0')
+        }
+        if category not in default_weights:
+            return
+        record = InventoryRecord(category, name, to_decimal(sell_price), default_weights[category], bought_from_shop=True)
+        if category == 'Magic Items':
+            record.rarity = 'Unknown'
+            record.requires_attunement = True
+        self.inventory_store.add(record)
 
     def create_treasure_tab(self):
         """Create the Treasure Generator tab."""
@@ -1846,6 +4519,25 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         ])
         method_layout.addWidget(self.distribution_method_combo)
 
+        allocation_label = QtWidgets.QLabel("Item Allocation:")
+        method_layout.addWidget(allocation_label)
+
+        self.item_allocation_combo = QtWidgets.QComboBox()
+        self.item_allocation_combo.addItems(ItemAllocator.METHODS)
+        self.item_allocation_combo.setToolTip("How gems, art objects and magic items are shared out to even up the members' totals.")
+        method_layout.addWidget(self.item_allocation_combo)
+
+        self.allocation_time_budget_input = QtWidgets.QDoubleSpinBox()
+        self.allocation_time_budget_input.setRange(0.1, 600)
+        self.allocation_time_budget_input.setSingleStep(0.5)
+        self.allocation_time_budget_input.setSuffix(" s")
+        self.allocation_time_budget_input.setValue(EXACT_ALLOCATION_TIME_BUDGET)
+        self.allocation_time_budget_input.setToolTip("How long the exact allocation may search before settling for the best split found.")
+        method_layout.addWidget(self.allocation_time_budget_input)
+        self.item_allocation_combo.currentTextChanged.connect(
+            lambda method: self.allocation_time_budget_input.setEnabled(method == ItemAllocator.EXACT))
+        self.allocation_time_budget_input.setEnabled(False)
+
         distribute_button = QtWidgets.QPushButton("Distribute Loot")
         layout.addWidget(distribute_button)
         distribute_button.clicked.connect(self.distribute_loot)
@@ -1854,6 +4546,22 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.distribution_results.setReadOnly(True)
         layout.addWidget(self.distribution_results)
 
+        roster_group = QtWidgets.QGroupBox("Received So Far")
+        roster_layout = QtWidgets.QVBoxLayout()
+        roster_group.setLayout(roster_layout)
+        layout.addWidget(roster_group)
+
+        self.party_standings_table = QtWidgets.QTableWidget(0, 5)
+        self.party_standings_table.setHorizontalHeaderLabels(["Member", "Coins", "Items", "Value (gp)", "Distributions"])
+        self.party_standings_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.party_standings_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.party_standings_table.horizontalHeader().setSectionResizeMode(1, QtWidgets.QHeaderView.Stretch)
+        roster_layout.addWidget(self.party_standings_table)
+
+        history_button = QtWidgets.QPushButton("Show Member History")
+        history_button.clicked.connect(self.show_member_history)
+        roster_layout.addWidget(history_button)
+
         self.update_member_inputs()
 
     def update_member_inputs(self):
@@ -1891,9 +4599,32 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         save_location_layout.addWidget(browse_button)
         layout.addRow("Default Save Location:", save_location_layout)
 
+        self.coin_system_combo = QtWidgets.QComboBox()
+        for name, coin_system in self.coin_systems.items():
+            self.coin_system_combo.addItem(name)
+            self.coin_system_combo.setItemData(self.coin_system_combo.count() - 1, coin_system.description, Qt.ToolTipRole)
+        self.coin_system_combo.setCurrentText(self.coin_system.name)
+        self.coin_system_combo.currentTextChanged.connect(self.change_coin_system)
+        layout.addRow("Coin System:", self.coin_system_combo)
+
         self.currency_customization_button = QtWidgets.QPushButton("Customize Currency Rates")
         self.currency_customization_button.clicked.connect(self.customize_currency_rates)  
         layout.addRow("Currency Customization:", self.currency_customization_button)
+
+        self.payment_policy_combo = QtWidgets.QComboBox()
+        self.payment_policy_combo.addItems(CoinPaymentSolver.POLICIES)
+        self.payment_policy_combo.setToolTip("Which coins to hand over when buying; change is given back in the fewest coins.")
+        layout.addRow("Payment Policy:", self.payment_policy_combo)
+
+        self.exchange_fee_input = QtWidgets.QDoubleSpinBox()
+        self.exchange_fee_input.setRange(0, 100)
+        self.exchange_fee_input.setDecimals(2)
+        self.exchange_fee_input.setSuffix(" %")
+        self.exchange_fee_input.setToolTip("Share of the exchanged value a money changer keeps when coins are consolidated.")
+        layout.addRow("Exchange Fee:", self.exchange_fee_input)
+
+        self.auto_consolidate_checkbox = QtWidgets.QCheckBox("Consolidate coins when treasure is added")
+        layout.addRow("Coin Consolidation:", self.auto_consolidate_checkbox)
         
     def update_carrying_capacity(self, value):
         self.carrying_capacity = Decimal(value)    
@@ -1907,26 +4638,115 @@ class DnDWealthManager(QtWidgets.QMainWindow):
     def customize_currency_rates(self):
         dialog = CurrencyCustomizationDialog(self)
         if dialog.exec_():
-            self.conversion_rates = dialog.get_conversion_rates()
-            for currency in Currency:
+            conversion_rates = dialog.get_conversion_rates()
+            try:
+                currency_rates = CurrencyRateTable(conversion_rates, self.coin_system.codes(), self.coin_system.base)
+                coin_solver = CoinPaymentSolver(currency_rates.base_values)
+            except ValueError as e:
+                logging.warning(f"Rejected currency rates: {e}")
+                QtWidgets.QMessageBox.warning(self, "Rates Rejected", f"{e}\n\nThe previous rates are still in use.")
+                return
+            self.conversion_rates = conversion_rates
+            self.currency_rates = currency_rates
+            self.coin_solver = coin_solver
+            for currency in self.coin_system:
                 self.convert_currency(currency.value)
+            self.update_total_wealth_and_weight()
 
     def get_currency_value_in_gp(self, currency):
-        if currency == Currency.GP:
-            return Decimal('1')
+        """Value of one coin in gp of list price, i.e. in the coin system's price coin."""
+        return self.currency_rates.decimal_rates[(currency.value, self.coin_system.price_coin)]
+
+    def change_coin_system(self, name):
+        """Switch to another coin system, exchanging the purse for the fewest coins of the same value."""
+        if name == self.coin_system.name or name not in self.coin_systems:
+            return
+        coin_system = self.coin_systems[name]
+        total_gp = self.get_total_currency_in_gp()
+        coins, exchanged_gp = self.coins_for_value(Fraction(total_gp), coin_system)
+        has_history = self.journal.next_undo() is not None or self.journal.next_redo() is not None
+        if total_gp or has_history:
+            lines = []
+            if total_gp:
+                described = ", ".join(f"{coins[coin.value]} {coin.name}" for coin in coin_system if coins[coin.value]) or "nothing"
+                lines.append(f"Your coins, worth {total_gp} gp, will be exchanged for {described} of the {name} system, "
+                             f"worth {exchanged_gp} gp.")
+                if exchanged_gp < total_gp:
+                    lines.append(f"{total_gp - exchanged_gp} gp is lost, as it is less than the smallest {name} coin.")
+            if has_history:
+                lines.append("Switching clears the undo history.")
+            reply = QtWidgets.QMessageBox.question(
+                self, "Change Coin System",
+                "\n".join(lines + ["Continue?"]),
+                QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+                QtWidgets.QMessageBox.No
+            )
+            if reply == QtWidgets.QMessageBox.No:
+                self.coin_system_combo.blockSignals(True)
+                self.coin_system_combo.setCurrentText(self.coin_system.name)
+                self.coin_system_combo.blockSignals(False)
+                return
+        self.set_coin_system(name)
+        self.set_coin_holdings(coins)
+        self.update_total_wealth_and_weight()
+        self.record_currency_change('coin_system')
+        # Undo history holds coin changes in the previous system's coins
+        self.journal.clear()
+        self.write_journal_snapshot()
+        self.update_undo_actions()
+
+    def set_coin_system(self, name):
+        """Make name the current coin system with its default rates and an empty purse."""
+        self.coin_system = self.coin_systems[name]
+        self.conversion_rates = self.coin_system.conversion_rates
+        self.currency_rates = self.coin_system.rates
+        self.coin_solver = self.coin_system.solver
+        self.currency_vars = {currency.value: Decimal('0') for currency in self.coin_system}
+        self.build_currency_widgets()
+        self.coin_system_combo.blockSignals(True)
+        self.coin_system_combo.setCurrentText(name)
+        self.coin_system_combo.blockSignals(False)
+        self.currency_holdings_label.setText(self.get_currency_holdings_text())
+
+    def coins_for_value(self, amount_gp, coin_system=None):
+        """
+        Fewest coins of a coin system worth amount_gp, rounded down to its smallest coin.
+
+        :param amount_gp: Fraction in gp of list price.
+        :param coin_system: Defaults to the current coin system.
+        :return: ({coin: count}, Decimal gp the coins are worth, which may be below amount_gp)
+        """
+        if coin_system is None or coin_system is self.coin_system:
+            coin_system, solver = self.coin_system, self.coin_solver
         else:
-            rate = self.get_conversion_rate(currency.value, 'gp')
-            if rate:
-                return Decimal(rate)
+            solver = coin_system.solver
+        price_coin_units = coin_system.rates.base_values[coin_system.price_coin] * solver.scale
+        units = math.floor(amount_gp * price_coin_units)
+        value = Fraction(units) / price_coin_units
+        return dict(zip(solver.coins, solver.fewest_coins(units))), Decimal(value.numerator) / Decimal(value.denominator)
+
+    def coins_in_system(self, coins):
+        """
+        Map coin counts onto the current coin system. Coins it does not have (treasure tables
+        give standard coins) are exchanged by value at the standard rates.
+
+        :return: ({coin: count} in the current system, [codes that are not coins at all])
+        """
+        result = {coin: 0 for coin in self.coin_system.codes()}
+        exchanged_gp = Fraction(0)
+        unknown = []
+        for coin, amount in coins.items():
+            coin = coin.lower()
+            if coin in self.coin_system:
+                result[coin] += int(amount)
+            elif self.api_cost_rates.rate(coin, 'gp') is not None:
+                exchanged_gp += int(amount) * self.api_cost_rates.rate(coin, 'gp')
             else:
-                conversion_rates_to_gp = {
-                    'cp': Decimal('0.01'),
-                    'sp': Decimal('0.1'),
-                    'ep': Decimal('0.5'),
-                    'gp': Decimal('1'),
-                    'pp': Decimal('10'),
-                }
-                return conversion_rates_to_gp.get(currency.value, Decimal('0'))
+                unknown.append(coin)
+        if exchanged_gp:
+            for coin, amount in self.coins_for_value(exchanged_gp)[0].items():
+                result[coin] += amount
+        return result, unknown
 
     def create_help_tab(self):
         """Create the Help tab."""
@@ -2188,8 +5008,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                         continue
                     item_id = self.weighted_choice(table_items, f"Magic Item Table {table_letter.upper()}")
                     item = self.base_items.get(item_id, {}).get('id', item_id)
-                    item = self.generate_special_magic_items(item)
-                    generated_magic_items.append(item)
+                    generated_magic_items.append(self.magic_item_record(item, self.generate_special_magic_items(item)))
             single_roll_match = re.findall(r'(?:Roll\s+)?once\s*on\s*Magic Item Table\s*([A-I])', instruction, re.IGNORECASE)
             for table_letter in single_roll_match:
                 table_letter = table_letter.upper()
@@ -2202,13 +5021,17 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                 item_id = self.weighted_choice(table, f"Magic Item Table {table_letter}")
                 logging.debug(f"Selected Magic Item: {item_id} from Table {table_letter.upper()}")
                 item = self.base_items.get(item_id, {}).get('id', item_id)
-                item = self.generate_special_magic_items(item)
-                generated_magic_items.append(item)
+                generated_magic_items.append(self.magic_item_record(item, self.generate_special_magic_items(item)))
             if not mi_matches and not single_roll_match:
                 QtWidgets.QMessageBox.warning(self, "Warning", f"Unrecognized magic item instruction: '{instruction}'")
                 logging.warning(f"Unrecognized magic item instruction: '{instruction}'")
         return generated_magic_items
 
+    def parse_d100_range(self, range_key):
+        """Bounds of a d100 table key such as '01-30' or '100'; '00' stands for 100."""
+        bounds = [100 if part == '00' else int(part) for part in range_key.split('-')]
+        return bounds[0], bounds[-1]
+
     def generate_complete_treasure(self, treasure_type, cr_level):
         treasure = {
             'Coins': {},
@@ -2224,9 +5047,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                 return
             d100_roll = self.roll_dice(1, 100, note='Treasure Table Roll')
             for range_key, rewards in table['d100'].items():
-                if '00' in range_key:
-                    range_key = range_key.replace('00', '100')
-                start, end = map(int, range_key.split('-'))
+                start, end = self.parse_d100_range(range_key)
                 if start <= d100_roll <= end:
                     for coin_type, expr in rewards.items():
                         if expr and expr not in ['–', '-', '']:
@@ -2273,9 +5094,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                                     treasure['Art Objects'].extend(arts_generated)
             d100_roll = self.roll_dice(1, 100)
             for range_key, rewards in table['d100'].items():
-                if '00' in range_key:
-                    range_key = range_key.replace('00', '100')
-                start, end = map(int, range_key.split('-'))
+                start, end = self.parse_d100_range(range_key)
                 if start <= d100_roll <= end:
                     gems_art = rewards.get('Gems/Art')
                     magic_items = rewards.get('Magic Items')
@@ -2311,6 +5130,33 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                     break
         return treasure
 
+    def build_magic_item_prices(self):
+        """Price of every item in base-items.json: its own value if it has one, else the value of its rarity."""
+        rarity_values = {rarity.lower(): value for rarity, value in self.rarity_values.items()}
+        return {
+            item_id: to_decimal(details['value']) if details.get('value') else
+            rarity_values.get(str(details.get('rarity', '')).lower(), Decimal('0'))
+            for item_id, details in self.base_items.items()
+        }
+
+    def magic_item_record(self, item_id, name=None):
+        """
+        Record for a generated magic item, priced from the cached price table.
+
+        :param item_id: Key of the item in base-items.json.
+        :param name: Name to show, when generating the item added details to it.
+        :return: Dict with Name, Id, Type, Rarity, Value and Weight.
+        """
+        details = self.base_items.get(item_id, {})
+        return {
+            'Name': name or item_id,
+            'Id': item_id,
+            'Type': details.get('type', 'Unknown'),
+            'Rarity': details.get('rarity', 'Unknown'),
+            'Value': self.magic_item_prices.get(item_id, Decimal('0')),
+            'Weight': to_decimal(details.get('weight', 0))
+        }
+
     def generate_special_magic_items(self, item_name):
         if 'figurine of wondrous power' in item_name.lower():
             figurine_types = [
@@ -2453,11 +5299,14 @@ class DnDWealthManager(QtWidgets.QMainWindow):
     def select_magic_items(self, magic_items):
         selected = []
         for item in magic_items:
-            details = self.base_items.get(item)
+            # Party loot saved before magic items were records holds bare names
+            if isinstance(item, str):
+                item = self.magic_item_record(item)
+            details = self.base_items.get(item['Id'])
             if not details:
-                selected.append(f"{item} (Details not found)")
+                selected.append(f"{item['Name']} (Details not found)")
                 continue
-            item_description = f"{details.get('id', item)} (Type: {details.get('type', 'Unknown')}, Rarity: {details.get('rarity', 'Unknown')})"
+            item_description = f"{item['Name']} (Type: {item['Type']}, Rarity: {item['Rarity']}, Value: {item['Value']} gp)"
             additional_details = details.get('additional_info')
             if additional_details:
                 item_description += f", {additional_details}"
@@ -2510,126 +5359,88 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Warning", "No treasure to add. Please generate treasure first.")
             return
 
-        # Calculate weights
-        coin_weight = Decimal('0')
-        for coin, amount in self.treasure['Coins'].items():
-            coin_weight += Decimal(amount) / Decimal('50') 
-
-        gem_weight = sum(Decimal(gem['Weight']) for gem in self.treasure['Gems'])
-
-        art_weight = sum(Decimal(art['Weight']) for art in self.treasure['Art Objects'])
+        treasure_coins, unknown_coins = self.coins_in_system(self.treasure['Coins'])
+        for coin in unknown_coins:
+            QtWidgets.QMessageBox.warning(self, "Warning", f"Unknown coin type: {coin}")
 
-        magic_weight = Decimal('0')
+        # Calculate weights
+        coins_after = {coin: int(amount) + treasure_coins[coin] for coin, amount in self.currency_vars.items()}
+        if self.auto_consolidate_checkbox.isChecked():
+            plan = self.plan_coin_consolidation(coins_after)
+            if plan is not None:
+                coins_after = plan[3]
+        coin_weight = Decimal(sum(coins_after.values()) - sum(int(amount) for amount in self.currency_vars.values())) / COINS_PER_POUND
+
+        # Stage everything first so nothing is added if the treasure is too heavy
+        batch = InventoryBatch(self.inventory_store)
+        needs_description = []
         for mi in self.treasure['Magic Items']:
-            details = self.base_items.get(mi)
-            if not details:
-                item_name = mi
-                rarity = "Unknown"
-                requires_attunement = "No"
-                value = "0"
-                weight = "0"
-                description = ""
-            else:
-                item_name = details.get('id', mi)
-                rarity = details.get('rarity', 'Unknown')
-                requires_attunement = "Yes" if details.get('requires_attunement', False) else "No"
-                value = str(details.get('value', 0))
-                weight = str(details.get('weight', 0))
-                description = details.get('description', "")
-            
-            # Fetch description if not provided and category is applicable
+            if isinstance(mi, str):
+                mi = self.magic_item_record(mi)
+            details = self.base_items.get(mi['Id'], {})
+            rarity = mi['Rarity']
+            description = details.get('description', "")
+
+            record = InventoryRecord(
+                'Magic Items', mi['Name'], to_decimal(mi['Value']), to_decimal(mi['Weight']), description=description,
+                rarity=rarity, requires_attunement=bool(details.get('requires_attunement', False))
+            )
+            batch.add(record)
             if not description and rarity.lower() in ['common', 'uncommon', 'rare', 'very rare', 'legendary']:
-                description = self.fetch_description_from_api(item_name, 'magic items')
-            
-            self.magic_model.appendRow([
-                QtGui.QStandardItem(item_name),
-                QtGui.QStandardItem(rarity),
-                QtGui.QStandardItem(requires_attunement),
-                QtGui.QStandardItem(str(value)),
-                QtGui.QStandardItem(str(weight)),
-                QtGui.QStandardItem(description),  # Description column
-                QtGui.QStandardItem('No')  # Bought from Shop column
-            ])
-
-        # Add Coins
-        for coin, amount in self.treasure['Coins'].items():
-            coin_lower = coin.lower()
-            if coin_lower in self.currency_vars:
-                self.currency_vars[coin_lower] += Decimal(amount)
-                self.currency_inputs[coin_lower].setValue(int(self.currency_vars[coin_lower]))
-            else:
-                QtWidgets.QMessageBox.warning(self, "Warning", f"Unknown coin type: {coin}")
+                needs_description.append((record, mi['Id']))
 
-        # Add Gems
         for gem in self.treasure['Gems']:
-            gem_name = gem['Name']
-            gem_value = gem['Value']
-            gem_weight = gem['Weight']
-            found = False
-            for row in range(self.gem_model.rowCount()):
-                if self.gem_model.item(row, 0).text() == gem_name:
-                    quantity_item = self.gem_model.item(row, 1)
-                    quantity = int(quantity_item.text()) + 1
-                    quantity_item.setText(str(quantity))
-                    total_value_item = self.gem_model.item(row, 2)
-                    total_value = Decimal(total_value_item.text()) + Decimal(gem_value)
-                    total_value_item.setText(str(total_value))
-                    found = True
-                    break
-            if not found:
-                row = [
-                    QtGui.QStandardItem(gem_name),
-                    QtGui.QStandardItem("1"),
-                    QtGui.QStandardItem(str(gem_value)),
-                    QtGui.QStandardItem(str(gem_weight)),
-                    QtGui.QStandardItem('No')  # Bought from Shop column
-                ]
-                self.gem_model.appendRow(row)
+            batch.add(InventoryRecord('Gems', gem['Name'], to_decimal(gem['Value']), to_decimal(gem['Weight'])), merge=True)
 
-        # Add Art Objects
         for art in self.treasure['Art Objects']:
-            art_name = art['Name']
-            art_value = art['Value']
-            art_weight = art['Weight']
-            description = art.get('Description', '')  # Use a default if Description is missing
-            found = False
-            for row in range(self.art_model.rowCount()):
-                if self.art_model.item(row, 0).text() == art_name:
-                    value_item = self.art_model.item(row, 1)
-                    total_value = Decimal(value_item.text()) + Decimal(art_value)
-                    value_item.setText(str(total_value))
-                    found = True
-                    break
-            if not found:
-                row = [
-                    QtGui.QStandardItem(art_name),
-                    QtGui.QStandardItem(str(art_value)),
-                    QtGui.QStandardItem(str(art_weight)),
-                    QtGui.QStandardItem(description),        # Description column
-                    QtGui.QStandardItem('No')               # Bought from Shop column
-                ]
-                self.art_model.appendRow(row)
+            batch.add(InventoryRecord(
+                'Art Objects', art['Name'], to_decimal(art['Value']), to_decimal(art['Weight']),
+                description=art.get('Description', '')  # Use a default if Description is missing
+            ), merge=True)
 
-        # Update Total Weight and Capacity Check
-        total_weight_to_add = coin_weight + gem_weight + art_weight + magic_weight
-        new_total_weight = self.total_weight + total_weight_to_add
+        # Capacity Check
+        new_total_weight = self.total_weight + coin_weight + batch.total_weight
         if self.carrying_capacity > 0 and new_total_weight > self.carrying_capacity:
             QtWidgets.QMessageBox.warning(self, "Warning", "Cannot add treasure. Carrying capacity exceeded.")
             return
 
+        # Fetch missing magic item descriptions in parallel, once per item name
+        names = list(dict.fromkeys(item_id for _, item_id in needs_description))
+        descriptions = dict(zip(names, self.api_client.executor.map(
+            lambda name: self.fetch_description_from_api(name, 'magic items'), names
+        )))
+        for record, item_id in needs_description:
+            record.description = descriptions[item_id]
+
+        self.begin_journal_action()
+        batch.commit()
+
+        # Add Coins, consolidated if that is turned on
+        self.set_coin_holdings(coins_after)
+        self.record_currency_change('treasure')
+        self.record_action({'action_type': 'add_treasure', 'data': {'coins': self.treasure['Coins']}})
+
         # Update Total Wealth and Weight
         self.update_total_wealth_and_weight()
 
         # Reset Treasure Data
         self.treasure = None
         QtWidgets.QMessageBox.information(self, "Success", "Treasure added to inventory.")
-            
+
     def add_treasure_to_party(self, treasure):
+        # A new dict, so the journal entry keeps the loot as it was before
+        loot = self.party_loot
+        coins = dict(loot['Coins'])
         for coin, amount in treasure['Coins'].items():
-            self.party_loot['Coins'][coin.lower()] = self.party_loot['Coins'].get(coin.lower(), 0) + amount
-        self.party_loot['Gems'].extend(treasure['Gems'])
-        self.party_loot['Art Objects'].extend(treasure['Art Objects'])
-        self.party_loot['Magic Items'].extend(treasure['Magic Items'])
+            coins[coin.lower()] = coins.get(coin.lower(), 0) + amount
+        self.begin_journal_action()
+        self.party_loot = {
+            'Coins': coins,
+            'Gems': loot['Gems'] + treasure['Gems'],
+            'Art Objects': loot['Art Objects'] + treasure['Art Objects'],
+            'Magic Items': loot['Magic Items'] + treasure['Magic Items']
+        }
+        self.record_action({'action_type': 'add_party_treasure', 'data': {'coins': treasure['Coins']}})
 
         self.distribution_results.append("=== New Treasure Added to Party Loot ===")
         if treasure['Coins']:
@@ -2679,13 +5490,9 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             description = self.fetch_description_from_api(name, 'miscellaneous items')
 
         # Add the new item with description
-        self.misc_model.appendRow([
-            QtGui.QStandardItem(name),
-            QtGui.QStandardItem(str(value)),
-            QtGui.QStandardItem(str(weight)),
-            QtGui.QStandardItem('No'),  # Bought from Shop
-            QtGui.QStandardItem(description)  # Description
-        ])
+        self.add_inventory_item(InventoryRecord(
+            'Miscellaneous Items', name, to_decimal(value), to_decimal(weight), description=description or ''
+        ))
 
         # Clear input fields
         self.misc_name_input.clear()
@@ -2697,146 +5504,48 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.update_total_wealth_and_weight()
         
     def update_sell_table(self):
+        """Point the sell list at the chosen category and show it only while the Shop tab is open."""
         category = self.sell_category_combo.currentText()
-        self.sell_model.setRowCount(0)
-        def get_item_text(model, row, column, default=''):
-            item = model.item(row, column)
-            return item.text() if item else default
-        
-        if category == 'Weapons':
-            for row in range(self.weapons_model.rowCount()):
-                name = get_item_text(self.weapons_model, row, 0)
-                value = get_item_text(self.weapons_model, row, 1)
-                weight = get_item_text(self.weapons_model, row, 2)
-                bought_from_shop = get_item_text(self.weapons_model, row, 3)
-                row_items = [
-                    QtGui.QStandardItem(name),
-                    QtGui.QStandardItem('Weapons'),
-                    QtGui.QStandardItem(value),
-                    QtGui.QStandardItem(weight),
-                    QtGui.QStandardItem(bought_from_shop)
-                ]
-                self.sell_model.appendRow(row_items)
-        
-        elif category == 'Armor':
-            for row in range(self.armor_model.rowCount()):
-                name = get_item_text(self.armor_model, row, 0)
-                value = get_item_text(self.armor_model, row, 1)
-                weight = get_item_text(self.armor_model, row, 2)
-                bought_from_shop = get_item_text(self.armor_model, row, 3)
-                row_items = [
-                    QtGui.QStandardItem(name),
-                    QtGui.QStandardItem('Armor'),
-                    QtGui.QStandardItem(value),
-                    QtGui.QStandardItem(weight),
-                    QtGui.QStandardItem(bought_from_shop)
-                ]
-                self.sell_model.appendRow(row_items)
-        
-        elif category == 'Miscellaneous Items':
-            for row in range(self.misc_model.rowCount()):
-                name = get_item_text(self.misc_model, row, 0)
-                value = get_item_text(self.misc_model, row, 1)
-                weight = get_item_text(self.misc_model, row, 2)
-                bought_from_shop = get_item_text(self.misc_model, row, 3)
-                row_items = [
-                    QtGui.QStandardItem(name),
-                    QtGui.QStandardItem('Miscellaneous Items'),
-                    QtGui.QStandardItem(value),
-                    QtGui.QStandardItem(weight),
-                    QtGui.QStandardItem(bought_from_shop)
-                ]
-                self.sell_model.appendRow(row_items)
-        
-        elif category == 'Gems':
-            for row in range(self.gem_model.rowCount()):
-                name = get_item_text(self.gem_model, row, 0)
-                quantity = get_item_text(self.gem_model, row, 1, '1')
-                total_value = get_item_text(self.gem_model, row, 2, '0')
-                weight = get_item_text(self.gem_model, row, 3, '0.01')
-                bought_from_shop = get_item_text(self.gem_model, row, 4)
-                try:
-                    quantity_int = int(quantity)
-                    total_value_dec = Decimal(total_value)
-                    weight_dec = Decimal(weight)
-                    value_per_item = (total_value_dec / quantity_int).quantize(Decimal('0.01')) if quantity_int else Decimal('0')
-                    weight_per_item = (weight_dec / quantity_int).quantize(Decimal('0.0001')) if quantity_int else Decimal('0')
-                except (InvalidOperation, ZeroDivisionError):
-                    value_per_item = Decimal('0')
-                    weight_per_item = Decimal('0')
-                for _ in range(quantity_int):
-                    row_items = [
-                        QtGui.QStandardItem(name),
-                        QtGui.QStandardItem('Gems'),
-                        QtGui.QStandardItem(str(value_per_item)),
-                        QtGui.QStandardItem(str(weight_per_item)),
-                        QtGui.QStandardItem(bought_from_shop)
-                    ]
-                    self.sell_model.appendRow(row_items)
-        
-        elif category == 'Art Objects':
-            for row in range(self.art_model.rowCount()):
-                name = get_item_text(self.art_model, row, 0)
-                value = get_item_text(self.art_model, row, 1)
-                weight = get_item_text(self.art_model, row, 2)
-                bought_from_shop = get_item_text(self.art_model, row, 3)
-                row_items = [
-                    QtGui.QStandardItem(name),
-                    QtGui.QStandardItem('Art Objects'),
-                    QtGui.QStandardItem(value),
-                    QtGui.QStandardItem(weight),
-                    QtGui.QStandardItem(bought_from_shop)
-                ]
-                self.sell_model.appendRow(row_items)
-        
-        elif category == 'Magic Items':
-            for row in range(self.magic_model.rowCount()):
-                name = get_item_text(self.magic_model, row, 0)
-                value = get_item_text(self.magic_model, row, 3)
-                weight = get_item_text(self.magic_model, row, 4)
-                bought_from_shop = get_item_text(self.magic_model, row, 5)
-                row_items = [
-                    QtGui.QStandardItem(name),
-                    QtGui.QStandardItem('Magic Items'),
-                    QtGui.QStandardItem(value),
-                    QtGui.QStandardItem(weight),
-                    QtGui.QStandardItem(bought_from_shop)
-                ]
-                self.sell_model.appendRow(row_items)
-        
-        logging.info(f"Sell table updated for category: {category}")
-        
+        self.sell_model.set_category(category)
+        self.sell_model.set_active(self.tabs.currentWidget() is self.shop_tab)
+
     def sell_inventory_item(self):
         selected = self.sell_table.selectionModel().selectedRows()
         if not selected:
             QtWidgets.QMessageBox.warning(self, "Warning", "Please select item(s) to sell.")
             return
 
+        # Resolve the selection to item ids before anything changes the rows
+        shop_rate = Decimal(self.shop_rate_slider.value()) / Decimal('100')
         total_sell_price = Decimal('0')
-        items_to_remove = []
+        items_to_sell = {}
+        not_sellable = []
 
         for index in selected:
-            name = self.sell_model.item(index.row(), 0).text()
-            category = self.sell_model.item(index.row(), 1).text()
-            value = Decimal(self.sell_model.item(index.row(), 2).text())
-            weight = Decimal(self.sell_model.item(index.row(), 3).text())
-            bought_from_shop = self.sell_model.item(index.row(), 4).text() == 'Yes'
+            record = self.sell_model.record_at(index.row())
+            quantity = self.sell_model.sell_quantity(record)
+            value = self.sell_model.unit_price(record) * quantity
 
-            if category in ['Gems', 'Art Objects']:
+            if record.category in ['Gems', 'Art Objects']:
                 sell_price = value
-            elif bought_from_shop:
-                shop_rate = Decimal(self.shop_rate_slider.value()) / Decimal('100')
+            elif record.bought_from_shop:
                 sell_price = (value * shop_rate).quantize(Decimal('0.01'))
             else:
-                QtWidgets.QMessageBox.warning(
-                    self,
-                    "Warning",
-                    f"You cannot sell '{name}' because it was not bought from the shop."
-                )
+                not_sellable.append(record.name)
                 continue
 
             total_sell_price += sell_price
-            items_to_remove.append((category, name, bought_from_shop))
+            items_to_sell[record.item_id] = quantity
+
+        if not_sellable:
+            names = "\n".join(not_sellable[:10])
+            if len(not_sellable) > 10:
+                names += f"\n... and {len(not_sellable) - 10} more"
+            QtWidgets.QMessageBox.warning(
+                self,
+                "Warning",
+                f"You cannot sell these items because they were not bought from the shop:\n{names}"
+            )
 
         if total_sell_price == 0:
             return
@@ -2851,11 +5560,18 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         if reply == QtWidgets.QMessageBox.No:
             return
 
-        self.add_currency(total_sell_price)
+        units = []
+        sold_items = []
+        for item_id, quantity in items_to_sell.items():
+            record = self.inventory_store.get(item_id)
+            if record is None:
+                continue
+            units.append((record, quantity))
+            sold_items.append((record.category, record.name, record.bought_from_shop, quantity))
 
-        for category, name, bought_from_shop in items_to_remove:
-            self.remove_item_from_inventory_by_name(category, name, bought_from_shop)
-            self.update_sell_table()
+        self.begin_journal_action()
+        self.add_currency(total_sell_price)
+        self.inventory_store.remove_units(units)
 
         self.update_total_wealth_and_weight()
         QtWidgets.QMessageBox.information(
@@ -2867,41 +5583,26 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         action = {
             'action_type': 'sell_items',
             'data': {
-                'items': items_to_remove,
+                'items': sold_items,
                 'total_sell_price': str(total_sell_price)
             }
         }
-        
+        self.record_action(action)
+
     def remove_item_from_inventory(self, model, name, is_gem=False):
-        for row in range(model.rowCount()):
-            if model.item(row, 0).text() == name:
-                if is_gem:
-                    quantity = int(model.item(row, 1).text())
-                    if quantity > 1:
-                        model.setItem(row, 1, QtGui.QStandardItem(str(quantity - 1)))
-                        current_total = Decimal(model.item(row, 2).text())
-                        model.setItem(row, 2, QtGui.QStandardItem(str(current_total - (current_total / Decimal(quantity)))))
-                    else:
-                        model.removeRow(row)
-                else:
-                    model.removeRow(row)
-                break
-    
+        record = self.inventory_store.find(model.category, name)
+        if record is None:
+            return
+        if is_gem:
+            self.remove_single_item(record)
+        else:
+            self.inventory_store.remove(record)
+
     def add_currency(self, amount_gp):
-        total_currency_in_gp = self.get_total_currency_in_gp()
-        remaining = amount_gp
-        currency_order = [Currency.PP, Currency.GP, Currency.EP, Currency.SP]
-        for currency in currency_order:
-            currency_value = self.get_currency_value_in_gp(currency)
-            amount_in_currency = (remaining // currency_value).to_integral_value(rounding=ROUND_DOWN)
-            if amount_in_currency > 0:
-                self.currency_vars[currency.value] += amount_in_currency
-                self.currency_inputs[currency.value].setValue(int(self.currency_vars[currency.value]))
-                remaining -= amount_in_currency * currency_value
-        if remaining > 0:
-            cp_amount = (remaining / Decimal('0.01')).to_integral_value(rounding=ROUND_DOWN)
-            self.currency_vars['cp'] += cp_amount
-            self.currency_inputs['cp'].setValue(int(self.currency_vars['cp']))
+        for coin, amount in self.coins_for_value(Fraction(amount_gp))[0].items():
+            if amount > 0:
+                self.currency_vars[coin] += amount
+                self.currency_inputs[coin].setValue(int(self.currency_vars[coin]))
         self.currency_holdings_label.setText(self.get_currency_holdings_text())
     
     def add_gem_item(self):
@@ -2921,14 +5622,9 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             gem_name, gem_value = match.groups()
             gem_value = Decimal(gem_value)
             total_value = gem_value * quantity
-            for _ in range(quantity):
-                self.gem_model.appendRow([
-                    QtGui.QStandardItem(gem_name),
-                    QtGui.QStandardItem("1"),
-                    QtGui.QStandardItem(str(gem_value)),
-                    QtGui.QStandardItem("0.01"),
-                    QtGui.QStandardItem('No')  
-                ])
+            self.begin_journal_action()
+            self.add_gems_to_inventory(gem_name, quantity, total_value, total_weight_to_add)
+            self.record_action({'action_type': 'add_item', 'data': {'category': 'Gems', 'name': gem_name}})
             self.gem_quantity_input.setValue(1)
             self.update_total_wealth_and_weight()
         else:
@@ -2955,13 +5651,9 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Warning", "Cannot add art object. Carrying capacity exceeded.")
             return
 
-        self.art_model.appendRow([
-            QtGui.QStandardItem(name),
-            QtGui.QStandardItem(str(value)),
-            QtGui.QStandardItem(str(weight)),
-            QtGui.QStandardItem(description),  # Description
-            QtGui.QStandardItem('No')          # Bought from Shop
-        ])
+        self.add_inventory_item(InventoryRecord(
+            'Art Objects', name, to_decimal(value), to_decimal(weight), description=description
+        ))
         self.art_name_input.clear()
         self.art_value_input.setValue(0)
         self.art_weight_input.setValue(0)
@@ -2995,15 +5687,10 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         if not description:
             description = self.fetch_description_from_api(name, 'magic items')
 
-        self.magic_model.appendRow([
-            QtGui.QStandardItem(name),
-            QtGui.QStandardItem(rarity),
-            QtGui.QStandardItem("Yes" if requires_attunement else "No"),
-            QtGui.QStandardItem(str(value)),
-            QtGui.QStandardItem(str(weight)),
-            QtGui.QStandardItem(description),  # Description column
-            QtGui.QStandardItem('No')  # Bought from Shop column
-        ])
+        self.add_inventory_item(InventoryRecord(
+            'Magic Items', name, to_decimal(value), to_decimal(weight), description=description or '',
+            rarity=rarity, requires_attunement=requires_attunement
+        ))
 
         # Clear input fields
         self.magic_name_input.clear()
@@ -3022,17 +5709,24 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Warning", "Number of members must be at least 1.")
             return
 
+        loot = self.party_loot
+        if not any(to_decimal(amount) for amount in loot['Coins'].values()) and not (
+                loot['Gems'] or loot['Art Objects'] or loot['Magic Items']):
+            QtWidgets.QMessageBox.warning(self, "Warning", "There is no party loot to distribute.")
+            return
+
         member_names = [input.text().strip() if input.text().strip() else f"Member {i + 1}" for i, input in enumerate(self.member_inputs)]
         distributions = {name: {'Coins': {}, 'Items': [], 'Total Value': Decimal('0')} for name in member_names}
 
         distribution_method = self.distribution_method_combo.currentText()
 
-        total_coins = {coin: Decimal(self.party_loot['Coins'].get(coin, 0)) for coin in self.currency_vars}
+        total_coins = self.coins_in_system(self.party_loot['Coins'])[0]
 
+        lost_gp = 0
         if distribution_method == "Random Extra":
             self.distribute_coins_random_extra(distributions, total_coins, member_names, num_members)
         elif distribution_method == "Split into Smaller Denominations":
-            self.distribute_coins_split_denominations(distributions, total_coins, member_names, num_members)
+            lost_gp = self.distribute_coins_split_denominations(distributions, total_coins, member_names, num_members)
         else:
             QtWidgets.QMessageBox.warning(self, "Warning", "Unknown distribution method selected.")
             return
@@ -3040,6 +5734,15 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.distribute_items(distributions, member_names, num_members)
 
         self.display_distribution_results(distributions, member_names)
+        if lost_gp:
+            self.distribution_results.append(
+                f"\n{float(lost_gp):.4g} gp of the coins could not be split into {self.coin_system.name} coins and is lost."
+            )
+
+        self.begin_journal_action()
+        self.party_roster.set_members(member_names)
+        self.party_roster.record('distribute_loot', distributions)
+        self.update_party_standings()
 
         self.party_loot = {
             'Coins': {},
@@ -3055,6 +5758,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                 'distributions': distributions
             }
         }
+        self.record_action(action)
 
         QtWidgets.QMessageBox.information(self, "Success", "Loot has been successfully distributed to the party members.")    
 
@@ -3062,55 +5766,44 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         for coin, amount in total_coins.items():
             if amount == 0:
                 continue
-            base_amount = amount // num_members
-            remainder = amount % num_members
-            for name in member_names:
-                distributions[name]['Coins'][coin] = distributions[name]['Coins'].get(coin, 0) + base_amount
-                value_in_gp = base_amount * self.get_currency_value_in_gp(Currency(coin))
-                distributions[name]['Total Value'] += value_in_gp
-
-            if remainder > 0:
-                recipients = random.choices(member_names, k=int(remainder))
-                for name in recipients:
-                    distributions[name]['Coins'][coin] += 1
-                    value_in_gp = self.get_currency_value_in_gp(Currency(coin))
-                    distributions[name]['Total Value'] += value_in_gp
+            base_amount, remainder = divmod(int(amount), num_members)
+            coin_value = self.get_currency_value_in_gp(self.coin_system.coin(coin))
+            for name, extra in zip(member_names, multinomial_draw(remainder, num_members)):
+                distributions[name]['Coins'][coin] = distributions[name]['Coins'].get(coin, 0) + base_amount + extra
+                distributions[name]['Total Value'] += (base_amount + extra) * coin_value
 
     def distribute_coins_split_denominations(self, distributions, total_coins, member_names, num_members):
-        denominations = [
-            (Currency.PP, Decimal('10')),  
-            (Currency.GP, Decimal('1')),   
-            (Currency.EP, Decimal('0.5')),
-            (Currency.SP, Decimal('0.1')),
-            (Currency.CP, Decimal('0.01')) 
-        ]
-
-        total_gp = Decimal('0')
-        for coin, amount in total_coins.items():
-            total_gp += amount * self.get_currency_value_in_gp(Currency(coin))
-
-        base_gp = (total_gp / Decimal(num_members)).quantize(Decimal('0.1'), rounding=ROUND_DOWN)
-        remainder_gp = total_gp - (base_gp * Decimal(num_members))
+        """
+        Give every member the same share in the fewest coins, and what does not split evenly in
+        smallest coins to random members.
 
+        :return: Fraction gp that no coins could be found for (only with coins that do not divide each other).
+        """
+        solver = self.coin_solver
+        total_units = sum(int(amount) * int(self.currency_rates.base_values[coin] * solver.scale) for coin, amount in total_coins.items())
+        # Shares are counted in smallest coins, so each one can always be paid out
+        smallest_coin, smallest_units = solver.coins[0], solver.values[0]
+        share_count, remainder_count = divmod(total_units // smallest_units, num_members)
+
+        def give(name, coin, amount):
+            distributions[name]['Coins'][coin] = distributions[name]['Coins'].get(coin, 0) + amount
+            distributions[name]['Total Value'] += Decimal(amount) * self.get_currency_value_in_gp(self.coin_system.coin(coin))
+
+        share = solver.fewest_coins(share_count * smallest_units)
+        # fewest_coins() rounds down when the coins do not divide each other; smallest coins make up the rest
+        shortfall = share_count * smallest_units - sum(count * value for count, value in zip(share, solver.values))
+        share[0] += shortfall // smallest_units
         for name in member_names:
-            remaining_gp = base_gp
-            for currency, rate in denominations:
-                amount = int(remaining_gp // rate)
+            for coin, amount in zip(solver.coins, share):
                 if amount > 0:
-                    distributions[name]['Coins'][currency.value] = distributions[name]['Coins'].get(currency.value, 0) + amount
-                    distributions[name]['Total Value'] += Decimal(amount) * self.get_currency_value_in_gp(currency)
-                    remaining_gp -= Decimal(amount) * rate
-            if remaining_gp >= Decimal('0.01'):
-                cp_amount = int((remaining_gp / Decimal('0.01')).to_integral_value(rounding=ROUND_DOWN))
-                distributions[name]['Coins']['cp'] = distributions[name]['Coins'].get('cp', 0) + cp_amount
-                distributions[name]['Total Value'] += Decimal(cp_amount) * self.get_currency_value_in_gp(Currency('cp'))
-
-        if remainder_gp >= Decimal('0.01'):
-            cp_remainder = int((remainder_gp / Decimal('0.01')).to_integral_value(rounding=ROUND_DOWN))
-            recipients = random.choices(member_names, k=cp_remainder)
-            for name in recipients:
-                distributions[name]['Coins']['cp'] = distributions[name]['Coins'].get('cp', 0) + 1
-                distributions[name]['Total Value'] += Decimal('0.01') 
+                    give(name, coin, amount)
+
+        for name, extra in zip(member_names, multinomial_draw(remainder_count, num_members)):
+            if extra:
+                give(name, smallest_coin, extra)
+
+        lost_units = total_units % smallest_units + num_members * (shortfall % smallest_units)
+        return Fraction(lost_units, solver.scale) / self.currency_rates.base_values[self.coin_system.price_coin]
 
     def distribute_items(self, distributions, member_names, num_members):
         items = []
@@ -3120,23 +5813,18 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             items.append({'Name': art['Name'], 'Value': Decimal(art['Value'])})
         for mi in self.party_loot['Magic Items']:
             if isinstance(mi, str):
-                item_name = mi
-                value = Decimal('0')
-                for row in range(self.magic_model.rowCount()):
-                    if self.magic_model.item(row, 0).text() == item_name:
-                        value = Decimal(self.magic_model.item(row, 3).text())
-                        break
-            else:
-                item_name = mi.get('Name', 'Unknown Item')
-                value = mi.get('Value', Decimal('0'))
-            items.append({'Name': item_name, 'Value': Decimal(value)})
-
-        random.shuffle(items)
-
-        for item in items:
-            name = min(distributions, key=lambda x: distributions[x]['Total Value'])
-            distributions[name]['Items'].append(item['Name'])
-            distributions[name]['Total Value'] += item['Value']
+                mi = self.magic_item_record(mi)
+            items.append({'Name': mi.get('Name', 'Unknown Item'), 'Value': to_decimal(mi.get('Value'))})
+
+        loads = [distributions[name]['Total Value'] for name in member_names]
+        values = [item['Value'] for item in items]
+        self.item_allocator.time_budget = self.allocation_time_budget_input.value()
+        self.item_allocator.last_search = None
+        shares = self.item_allocator.allocate(loads, values, self.item_allocation_combo.currentText())
+        for name, share in zip(member_names, shares):
+            for index in share:
+                distributions[name]['Items'].append(items[index]['Name'])
+                distributions[name]['Total Value'] += items[index]['Value']
             
     def display_distribution_results(self, distributions, member_names):
         self.distribution_results.clear()
@@ -3161,54 +5849,39 @@ class DnDWealthManager(QtWidgets.QMainWindow):
             else:
                 total_value_str = f"{total_value.quantize(Decimal('0.1'))}"
             self.distribution_results.append(f"Total Value: {total_value_str} gp")        
+
+        fairness = ItemAllocator.fairness(distributions[name]['Total Value'] for name in member_names)
+        self.distribution_results.append("\n=== Fairness ===")
+        self.distribution_results.append(f"Fair Share: {fairness['fair_share'].quantize(Decimal('0.01'))} gp")
+        self.distribution_results.append(f"Spread (richest - poorest): {fairness['spread'].quantize(Decimal('0.01'))} gp")
+        self.distribution_results.append(f"Largest Deviation from Fair Share: {fairness['max_deviation'].quantize(Decimal('0.01'))} gp")
+        self.distribution_results.append(f"Gini Coefficient: {fairness['gini'].quantize(Decimal('0.001'))}")
+
+        search = self.item_allocator.last_search
+        if search is not None:
+            self.distribution_results.append(f"Largest Share: {search['largest_share'].quantize(Decimal('0.01'))} gp")
+            if search['optimal']:
+                self.distribution_results.append(f"Proven optimal ({search['nodes']} search steps in {search['elapsed']:.2f} s)")
+            else:
+                self.distribution_results.append(f"Time budget reached after {search['nodes']} search steps; "
+                                                 f"optimality gap at most {search['gap'].quantize(Decimal('0.01'))} gp "
+                                                 f"(no split can go below {search['lower_bound'].quantize(Decimal('0.01'))} gp)")
            
     def update_total_wealth_and_weight(self):
-        total_wealth = Decimal('0')
-        total_weight = Decimal('0')
-        
-        for row in range(self.weapons_model.rowCount()):
-            value = Decimal(self.weapons_model.item(row, 1).text())
-            weight = Decimal(self.weapons_model.item(row, 2).text())
-            total_wealth += value
-            total_weight += weight
-
-        for row in range(self.armor_model.rowCount()):
-            value = Decimal(self.armor_model.item(row, 1).text())
-            weight = Decimal(self.armor_model.item(row, 2).text())
-            total_wealth += value
-            total_weight += weight
-
-        for currency in Currency:
+        total_wealth, total_weight = self.inventory_store.totals()
+
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            recomputed = self.inventory_store.recompute_totals()
+            if abs(recomputed[0] - total_wealth) > Decimal('0.0001') or abs(recomputed[1] - total_weight) > Decimal('0.0001'):
+                logging.error(f"Inventory totals out of sync: running {(total_wealth, total_weight)}, recomputed {recomputed}")
+
+        for currency in self.coin_system:
             amount = self.currency_vars[currency.value]
             gp_value = amount * self.get_currency_value_in_gp(currency)
             total_wealth += gp_value
-            coin_weight = amount / 50
+            coin_weight = amount / COINS_PER_POUND
             total_weight += coin_weight
 
-        for row in range(self.misc_model.rowCount()):
-            value = Decimal(self.misc_model.item(row, 1).text())
-            weight = Decimal(self.misc_model.item(row, 2).text())
-            total_wealth += value
-            total_weight += weight
-
-        for row in range(self.gem_model.rowCount()):
-            total_value = Decimal(self.gem_model.item(row, 2).text())
-            weight = Decimal(self.gem_model.item(row, 3).text())
-            total_wealth += total_value
-            total_weight += weight
-
-        for row in range(self.art_model.rowCount()):
-            value = Decimal(self.art_model.item(row, 1).text())
-            weight = Decimal(self.art_model.item(row, 2).text())
-            total_wealth += value
-            total_weight += weight
-
-        for row in range(self.magic_model.rowCount()):
-            value = Decimal(self.magic_model.item(row, 3).text())
-            weight = Decimal(self.magic_model.item(row, 4).text())
-            total_wealth += value
-            total_weight += weight
-
         total_wealth = total_wealth.quantize(Decimal('0.1')) if total_wealth % 1 else total_wealth.quantize(Decimal('1'))
         total_weight = total_weight.quantize(Decimal('0.1')) if total_weight % 1 else total_weight.quantize(Decimal('1'))
 
@@ -3218,52 +5891,42 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         self.total_wealth_label.setText(f"Total Wealth: {total_wealth_str} gp")
         self.total_weight_label.setText(f"Total Weight: {total_weight_str} lbs")
         self.total_weight = total_weight
-  
+
     def remove_misc_item(self):
-        selected = self.misc_table.selectionModel().selectedRows()
-        for index in sorted(selected, reverse=True):
-            row_data = {
-                'name': self.misc_model.item(index.row(), 0).text(),
-                'value': float(self.misc_model.item(index.row(), 1).text()),
-                'weight': float(self.misc_model.item(index.row(), 2).text())
-            }
-            self.misc_model.removeRow(index.row())
+        self.remove_selected_items(self.misc_table, 'remove_misc_item')
 
     def remove_gem_item(self):
-        selected = self.gem_table.selectionModel().selectedRows()
-        for index in sorted(selected, reverse=True):
-            row_data = {
-                'type': self.gem_model.item(index.row(), 0).text(),
-                'quantity': int(self.gem_model.item(index.row(), 1).text()),
-                'total_value': float(self.gem_model.item(index.row(), 2).text()),
-                'weight': float(self.gem_model.item(index.row(), 3).text())
-            }
-            self.gem_model.removeRow(index.row())
+        self.remove_selected_items(self.gem_table, 'remove_gem_item')
 
     def remove_art_item(self):
-        selected = self.art_table.selectionModel().selectedRows()
-        for index in sorted(selected, reverse=True):
-            row_data = {
-                'name': self.art_model.item(index.row(), 0).text(),
-                'value': float(self.art_model.item(index.row(), 1).text()),
-                'weight': float(self.art_model.item(index.row(), 2).text())
-            }
-
-            self.art_model.removeRow(index.row())
+        self.remove_selected_items(self.art_table, 'remove_art_item')
 
     def remove_magic_item(self):
-        selected = self.magic_table.selectionModel().selectedRows()
-        for index in sorted(selected, reverse=True):
+        self.remove_selected_items(self.magic_table, 'remove_magic_item')
+
+    def remove_selected_items(self, table, action_type):
+        """Remove the rows selected in table as one undoable action."""
+        records = self.get_selected_records(table)
+        if not records:
+            return
+        self.begin_journal_action()
+        removed_rows = []
+        for record in records:
             row_data = {
-                'name': self.magic_model.item(index.row(), 0).text(),
-                'rarity': self.magic_model.item(index.row(), 1).text(),
-                'attunement': self.magic_model.item(index.row(), 2).text(),
-                'value': float(self.magic_model.item(index.row(), 3).text()),
-                'weight': float(self.magic_model.item(index.row(), 4).text())
+                'name': record.name,
+                'value': float(record.value),
+                'weight': float(record.weight)
             }
+            self.inventory_store.remove(record)
+            removed_rows.append(row_data)
+        action = {
+            'action_type': action_type,
+            'data': removed_rows
+        }
+        self.record_action(action)
+
+        self.update_total_wealth_and_weight()
 
-            self.magic_model.removeRow(index.row())
-            
     def save_profile(self):
         options = QtWidgets.QFileDialog.Options()
         default_directory = self.default_save_location.text() or ""
@@ -3272,6 +5935,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
         )
         if filename:
             data = {
+                'coin_system': self.coin_system.name,
                 'currency_vars': {k: str(v) for k, v in self.currency_vars.items()},
                 'misc_items': [],
                 'gems': [],
@@ -3281,81 +5945,65 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                 'armor': []
             }
 
-            # Helper function to safely get text from model items
-            def get_item_text(model, row, column):
-                item = model.item(row, column)
-                if item is None:
-                    logging.warning(f"Missing item at row {row}, column {column} in {model.objectName()}")
-                    return ''
-                return item.text()
+            def yes_no(flag):
+                return 'Yes' if flag else 'No'
 
             # Save Miscellaneous Items with Description
-            for row in range(self.misc_model.rowCount()):
+            for record in self.inventory_store.records['Miscellaneous Items']:
                 item = {
-                    'Name': get_item_text(self.misc_model, row, 0),
-                    'Value': get_item_text(self.misc_model, row, 1),
-                    'Weight': get_item_text(self.misc_model, row, 2),
-                    'BoughtFromShop': get_item_text(self.misc_model, row, 3),
-                    'Description': get_item_text(self.misc_model, row, 4)  # Description
+                    'Name': record.name,
+                    'Value': str(record.value),
+                    'Weight': str(record.weight),
+                    'BoughtFromShop': yes_no(record.bought_from_shop),
+                    'Description': record.description
                 }
                 data['misc_items'].append(item)
 
             # Save Gems
-            for row in range(self.gem_model.rowCount()):
+            for record in self.inventory_store.records['Gems']:
                 gem = {
-                    'Type': get_item_text(self.gem_model, row, 0),
-                    'Quantity': get_item_text(self.gem_model, row, 1),
-                    'Total Value': get_item_text(self.gem_model, row, 2),
-                    'Weight': get_item_text(self.gem_model, row, 3),
-                    'BoughtFromShop': get_item_text(self.gem_model, row, 4)
+                    'Type': record.name,
+                    'Quantity': str(record.quantity),
+                    'Total Value': str(record.value),
+                    'Weight': str(record.weight),
+                    'BoughtFromShop': yes_no(record.bought_from_shop)
                 }
                 data['gems'].append(gem)
 
             # Save Art Objects
-            for row in range(self.art_model.rowCount()):
+            for record in self.inventory_store.records['Art Objects']:
                 art = {
-                    'Name': get_item_text(self.art_model, row, 0),
-                    'Value': get_item_text(self.art_model, row, 1),
-                    'Weight': get_item_text(self.art_model, row, 2),
-                    'Description': get_item_text(self.art_model, row, 3),
-                    'BoughtFromShop': get_item_text(self.art_model, row, 4)
+                    'Name': record.name,
+                    'Value': str(record.value),
+                    'Weight': str(record.weight),
+                    'Description': record.description,
+                    'BoughtFromShop': yes_no(record.bought_from_shop)
                 }
                 data['arts'].append(art)
 
             # Save Magic Items
-            for row in range(self.magic_model.rowCount()):
+            for record in self.inventory_store.records['Magic Items']:
                 magic_item = {
-                    'Name': get_item_text(self.magic_model, row, 0),
-                    'Rarity': get_item_text(self.magic_model, row, 1),
-                    'Attunement': get_item_text(self.magic_model, row, 2),
-                    'Value': get_item_text(self.magic_model, row, 3),
-                    'Weight': get_item_text(self.magic_model, row, 4),
-                    'Description': get_item_text(self.magic_model, row, 5),
-                    'BoughtFromShop': get_item_text(self.magic_model, row, 6)
+                    'Name': record.name,
+                    'Rarity': record.rarity,
+                    'Attunement': yes_no(record.requires_attunement),
+                    'Value': str(record.value),
+                    'Weight': str(record.weight),
+                    'Description': record.description,
+                    'BoughtFromShop': yes_no(record.bought_from_shop)
                 }
                 data['magic_items'].append(magic_item)
 
-            # Save Weapons
-            for row in range(self.weapons_model.rowCount()):
-                weapon = {
-                    'Name': get_item_text(self.weapons_model, row, 0),
-                    'Value': get_item_text(self.weapons_model, row, 1),
-                    'Weight': get_item_text(self.weapons_model, row, 2),
-                    'BoughtFromShop': get_item_text(self.weapons_model, row, 3),
-                    'Description': get_item_text(self.weapons_model, row, 4)
-                }
-                data['weapons'].append(weapon)
-
-            # Save Armor
-            for row in range(self.armor_model.rowCount()):
-                armor = {
-                    'Name': get_item_text(self.armor_model, row, 0),
-                    'Value': get_item_text(self.armor_model, row, 1),
-                    'Weight': get_item_text(self.armor_model, row, 2),
-                    'BoughtFromShop': get_item_text(self.armor_model, row, 3),
-                    'Description': get_item_text(self.armor_model, row, 4)
-                }
-                data['armor'].append(armor)
+            # Save Weapons and Armor
+            for key, category in (('weapons', 'Weapons'), ('armor', 'Armor')):
+                for record in self.inventory_store.records[category]:
+                    data[key].append({
+                        'Name': record.name,
+                        'Value': str(record.value),
+                        'Weight': str(record.weight),
+                        'BoughtFromShop': yes_no(record.bought_from_shop),
+                        'Description': record.description
+                    })
 
             # Save to JSON file
             try:
@@ -3378,6 +6026,11 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                 return
 
             # Load Currency
+            coin_system = data.get('coin_system', 'Standard')
+            if coin_system in self.coin_systems:
+                self.set_coin_system(coin_system)
+            else:
+                QtWidgets.QMessageBox.warning(self, "Warning", f"Unknown coin system '{coin_system}'; keeping {self.coin_system.name}.")
             for k, v in data.get('currency_vars', {}).items():
                 if k in self.currency_vars:
                     self.currency_vars[k] = Decimal(v)
@@ -3385,87 +6038,72 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                 else:
                     QtWidgets.QMessageBox.warning(self, "Warning", f"Unknown currency type: {k}")
 
+            def is_yes(entry, key):
+                return entry.get(key, 'No') == 'Yes'
+
             # Load Miscellaneous Items with Description
-            self.misc_model.setRowCount(0)
-            for item in data.get('misc_items', []):
-                row = [
-                    QtGui.QStandardItem(item['Name']),
-                    QtGui.QStandardItem(item['Value']),
-                    QtGui.QStandardItem(item['Weight']),
-                    QtGui.QStandardItem(item.get('BoughtFromShop', 'No')),
-                    QtGui.QStandardItem(item.get('Description', ''))  # Description
-                ]
-                self.misc_model.appendRow(row)
+            self.inventory_store.replace('Miscellaneous Items', [
+                InventoryRecord(
+                    'Miscellaneous Items', item['Name'], to_decimal(item['Value']), to_decimal(item['Weight']),
+                    bought_from_shop=is_yes(item, 'BoughtFromShop'), description=item.get('Description', '')
+                )
+                for item in data.get('misc_items', [])
+            ])
 
             # Load Gems
-            self.gem_model.setRowCount(0)
+            gems = []
             for gem in data.get('gems', []):
-                row = [
-                    QtGui.QStandardItem(gem['Type']),
-                    QtGui.QStandardItem(gem['Quantity']),
-                    QtGui.QStandardItem(gem['Total Value']),
-                    QtGui.QStandardItem(gem['Weight']),
-                    QtGui.QStandardItem(gem.get('BoughtFromShop', 'No'))
-                ]
-                self.gem_model.appendRow(row)
+                try:
+                    quantity = int(gem['Quantity'])
+                except (TypeError, ValueError):
+                    quantity = 1
+                gems.append(InventoryRecord(
+                    'Gems', gem['Type'], to_decimal(gem['Total Value']), to_decimal(gem['Weight']),
+                    quantity=quantity, bought_from_shop=is_yes(gem, 'BoughtFromShop')
+                ))
+            self.inventory_store.replace('Gems', gems)
 
             # Load Art Objects
-            self.art_model.setRowCount(0)
-            for art in data.get('arts', []):
-                row = [
-                    QtGui.QStandardItem(art['Name']),
-                    QtGui.QStandardItem(art['Value']),
-                    QtGui.QStandardItem(art['Weight']),
-                    QtGui.QStandardItem(art.get('Description', '')),
-                    QtGui.QStandardItem(art.get('BoughtFromShop', 'No'))
-                ]
-                self.art_model.appendRow(row)
+            self.inventory_store.replace('Art Objects', [
+                InventoryRecord(
+                    'Art Objects', art['Name'], to_decimal(art['Value']), to_decimal(art['Weight']),
+                    bought_from_shop=is_yes(art, 'BoughtFromShop'), description=art.get('Description', '')
+                )
+                for art in data.get('arts', [])
+            ])
 
             # Load Magic Items
-            self.magic_model.setRowCount(0)
-            for magic_item in data.get('magic_items', []):
-                row = [
-                    QtGui.QStandardItem(magic_item['Name']),
-                    QtGui.QStandardItem(magic_item['Rarity']),
-                    QtGui.QStandardItem(magic_item['Attunement']),
-                    QtGui.QStandardItem(magic_item['Value']),
-                    QtGui.QStandardItem(magic_item['Weight']),
-                    QtGui.QStandardItem(magic_item.get('Description', '')),
-                    QtGui.QStandardItem(magic_item.get('BoughtFromShop', 'No'))
-                ]
-                self.magic_model.appendRow(row)
-
-            # Load Weapons
-            self.weapons_model.setRowCount(0)
-            for weapon in data.get('weapons', []):
-                row = [
-                    QtGui.QStandardItem(weapon['Name']),
-                    QtGui.QStandardItem(weapon['Value']),
-                    QtGui.QStandardItem(weapon['Weight']),
-                    QtGui.QStandardItem(weapon.get('BoughtFromShop', 'No')),
-                    QtGui.QStandardItem(weapon.get('Description', ''))
-                ]
-                self.weapons_model.appendRow(row) 
-
-            # Load Armor
-            self.armor_model.setRowCount(0)
-            for armor in data.get('armor', []):
-                row = [
-                    QtGui.QStandardItem(armor['Name']),
-                    QtGui.QStandardItem(armor['Value']),
-                    QtGui.QStandardItem(armor['Weight']),
-                    QtGui.QStandardItem(armor.get('BoughtFromShop', 'No')),
-                    QtGui.QStandardItem(armor.get('Description', ''))
-                ]
-                self.armor_model.appendRow(row) 
+            self.inventory_store.replace('Magic Items', [
+                InventoryRecord(
+                    'Magic Items', magic_item['Name'], to_decimal(magic_item['Value']), to_decimal(magic_item['Weight']),
+                    bought_from_shop=is_yes(magic_item, 'BoughtFromShop'), description=magic_item.get('Description', ''),
+                    rarity=magic_item['Rarity'], requires_attunement=is_yes(magic_item, 'Attunement')
+                )
+                for magic_item in data.get('magic_items', [])
+            ])
+
+            # Load Weapons and Armor
+            for key, category in (('weapons', 'Weapons'), ('armor', 'Armor')):
+                self.inventory_store.replace(category, [
+                    InventoryRecord(
+                        category, entry['Name'], to_decimal(entry['Value']), to_decimal(entry['Weight']),
+                        bought_from_shop=is_yes(entry, 'BoughtFromShop'), description=entry.get('Description', '')
+                    )
+                    for entry in data.get(key, [])
+                ])
 
             self.update_total_wealth_and_weight()
+            self.record_currency_change('profile_load')
+            # Undo history refers to the records that were just replaced
+            self.journal.clear()
+            self.write_journal_snapshot()
+            self.update_undo_actions()
             QtWidgets.QMessageBox.information(self, "Success", "Profile loaded successfully.")
             
     def convert_currency(self, currency):
         amount = self.converter_inputs[currency].value()
         results = []
-        for target_currency in Currency:
+        for target_currency in self.coin_system:
             if target_currency.value != currency:
                 rate = self.get_conversion_rate(currency, target_currency.value)
                 if rate:
@@ -3476,7 +6114,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                         converted_amount_str = f"{converted_amount:.2f}"
                     results.append(f"{converted_amount_str} {target_currency.name}")
         self.converter_results[currency].setText('\n'.join(results))
-        for other_currency in Currency:
+        for other_currency in self.coin_system:
             if other_currency.value != currency:
                 self.converter_inputs[other_currency.value].blockSignals(True)
                 self.converter_inputs[other_currency.value].setValue(0)
@@ -3484,14 +6122,7 @@ class DnDWealthManager(QtWidgets.QMainWindow):
                 self.converter_inputs[other_currency.value].blockSignals(False)
 
     def get_conversion_rate(self, from_currency, to_currency):
-        rate = self.conversion_rates.get(from_currency, {}).get(to_currency, None)
-        if rate is None or rate == 0:
-            inverse_rate = self.conversion_rates.get(to_currency, {}).get(from_currency, None)
-            if inverse_rate and inverse_rate != 0:
-                rate = 1 / inverse_rate
-            else:
-                rate = None  
-        return rate
+        return self.currency_rates.float_rate(from_currency, to_currency)
             
     def show_about_dialog(self):
         QtWidgets.QMessageBox.about(self, "About D&D Wealth Manager",
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# =================== Configurable Sections ===================
+
+# Directory holding the recorded API responses, laid out like the URL paths
+# (e.g. api_fixtures/api/equipment.json, api_fixtures/api/equipment/club.json)
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_fixtures')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# =================== End of Configurable Sections ===================
+
+
+class StubApiConfig:
+    """Runtime behaviour of the stand-in server; can be changed while it is running."""
+
+    def __init__(self, fixtures_dir=DEFAULT_FIXTURES_DIR, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, error_status=500, record_from=None, seed=None):
+        self.fixtures_dir = fixtures_dir
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.record_from = record_from.rstrip('/') if record_from else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+
+    def fixture_path(self, path):
+        """Map a request path such as /api/equipment/club to its fixture file."""
+        parts = [part for part in path.split('?', 1)[0].split('/') if part]
+        if not parts or parts[0] != 'api' or any(part in ('.', '..') for part in parts):
+            return None
+        return os.path.join(self.fixtures_dir, *parts) + '.json'
+
+    def next_delay_and_error(self):
+        with self.lock:
+            self.request_count += 1
+            delay = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+            fail = self.error_rate > 0 and self.random.random() < self.error_rate
+            if fail:
+                self.error_count += 1
+        return delay / 1000.0, fail
+
+
+class StubApiRequestHandler(BaseHTTPRequestHandler):
+    """Serves /api/equipment, /api/magic-items and their detail endpoints from fixtures."""
+
+    server_version = 'DnDApiStub/1.0'
+
+    def do_GET(self):
+        config = self.server.config
+        delay, fail = config.next_delay_and_error()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self.send_json(config.error_status, {'error': 'Injected failure'})
+            return
+
+        fixture_path = config.fixture_path(self.path)
+        if fixture_path is None:
+            self.send_json(404, {'error': 'Not found'})
+            return
+        if not os.path.exists(fixture_path) and config.record_from:
+            self.record_fixture(fixture_path)
+        try:
+            with open(fixture_path, 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            self.send_json(404, {'error': 'Not found'})
+            return
+        self.send_body(200, body)
+
+    def record_fixture(self, fixture_path):
+        """Fetch a missing fixture from the upstream API and store it for later runs."""
+        url = f"{self.server.config.record_from}{self.path}"
+        try:
+            response = requests.get(url, timeout=30)
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Recording {url} failed: {e}")
+            return
+        if response.status_code != 200:
+            logging.warning(f"Recording {url} returned status {response.status_code}")
+            return
+        os.makedirs(os.path.dirname(fixture_path), exist_ok=True)
+        with open(fixture_path, 'w') as f:
+            json.dump(response.json(), f, indent=2)
+            f.write('\n')
+        logging.info(f"Recorded {self.path} -> {fixture_path}")
+
+    def send_json(self, status, data):
+        self.send_body(status, json.dumps(data).encode('utf-8'))
+
+    def send_body(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+
+def start_server(config=None, host=DEFAULT_HOST, port=0, background=True):
+    """
+    Start the stand-in server, by default on a background thread.
+
+    :param config: StubApiConfig; defaults to the bundled fixtures with no latency or errors.
+    :param port: Port to bind; 0 picks a free one.
+    :param background: If False the server is only bound; call server.serve_forever() to run it.
+    :return: (server, base_url). Call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), StubApiRequestHandler)
+    server.daemon_threads = True
+    server.config = config or StubApiConfig()
+    if background:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the D&D 5e API used by the Shop and item descriptions. "
+                    "Start it, then run the app with DND_API_BASE_URL=http://HOST:PORT."
+    )
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES_DIR, help="Fixture directory")
+    parser.add_argument('--latency', type=float, default=0, help="Fixed delay per request in ms")
+    parser.add_argument('--jitter', type=float, default=0, help="Extra random delay per request, up to this many ms")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that fail (0-1)")
+    parser.add_argument('--error-status', type=int, default=500, help="HTTP status returned for injected failures")
+    parser.add_argument('--record-from', default=None,
+                        help="Upstream base URL (e.g. https://www.dnd5eapi.co) used to record missing fixtures")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for latency jitter and error injection")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    config = StubApiConfig(
+        fixtures_dir=args.fixtures,
+        latency_ms=args.latency,
+        jitter_ms=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        record_from=args.record_from,
+        seed=args.seed
+    )
+    server, base_url = start_server(config, args.host, args.port, background=False)
+    logging.info(f"Serving {args.fixtures} on {base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logging.info(f"Served {config.request_count} requests ({config.error_count} injected errors)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
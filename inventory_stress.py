@@ -0,0 +1,360 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import importlib.util
+from decimal import Decimal
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# =================== Configurable Sections ===================
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_SCRIPT = os.path.join(APP_DIR, 'DnDWealthManager_V1.0.py')
+
+DEFAULT_ITEM_COUNT = 1000
+DEFAULT_REPEAT = 20
+DEFAULT_SELL_BATCH = 25
+
+# Operations run by default, in order; see OPERATIONS below
+DEFAULT_OPERATIONS = ['totals', 'add', 'add_gems', 'treasure', 'sort', 'search', 'sell', 'save', 'load', 'distribute']
+
+# =================== End of Configurable Sections ===================
+
+
+def load_app_module():
+    """Import the main application script (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location('dnd_wealth_manager', APP_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def silence_dialogs(QtWidgets, profile_path):
+    """Answer every message box and file dialog without user input."""
+    QtWidgets.QMessageBox.information = staticmethod(lambda *args, **kwargs: QtWidgets.QMessageBox.Ok)
+    QtWidgets.QMessageBox.warning = staticmethod(lambda *args, **kwargs: QtWidgets.QMessageBox.Ok)
+    QtWidgets.QMessageBox.critical = staticmethod(lambda *args, **kwargs: QtWidgets.QMessageBox.Ok)
+    QtWidgets.QMessageBox.question = staticmethod(lambda *args, **kwargs: QtWidgets.QMessageBox.Yes)
+    QtWidgets.QFileDialog.getSaveFileName = staticmethod(lambda *args, **kwargs: (profile_path, ''))
+    QtWidgets.QFileDialog.getOpenFileName = staticmethod(lambda *args, **kwargs: (profile_path, ''))
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class StressRun:
+    """Fills a main window with synthetic data and times operations on it."""
+
+    def __init__(self, app, module, window, item_count, sell_batch, seed=None):
+        self.app = app
+        self.module = module
+        self.window = window
+        self.item_count = item_count
+        self.sell_batch = sell_batch
+        self.rng = random.Random(seed)
+        self.timings = {}
+
+        items = list(window.base_items.values())
+        self.weapons = [item for item in items if item.get('type') == 'weapon'] or items
+        self.armor = [item for item in items if item.get('type') == 'armor'] or items
+        self.misc = [item for item in items if item.get('type') not in ('weapon', 'armor')] or items
+        self.gem_values = [10, 50, 100, 500, 1000, 5000]
+        self.art_values = [25, 250, 750, 2500, 7500]
+
+    def random_record(self, category, source):
+        item = self.rng.choice(source)
+        return self.module.InventoryRecord(
+            category,
+            item.get('id', 'Unknown'),
+            Decimal(self.rng.randint(1, 50000)) / Decimal('10'),
+            Decimal(str(item.get('weight', self.rng.randint(0, 20)))),
+            bought_from_shop=self.rng.random() < 0.5,
+            description=f"Synthetic {category.lower()} entry",
+            rarity=item.get('rarity', 'Unknown').title(),
+            requires_attunement=bool(item.get('requires_attunement', False))
+        )
+
+    def random_gems(self, count):
+        return self.window.generate_gems(count, self.rng.choice(self.gem_values))
+
+    def random_art(self, count):
+        return self.window.generate_art_objects(count, self.rng.choice(self.art_values))
+
+    def populate(self):
+        """Put item_count entries in every inventory category, the currency holdings and the party loot."""
+        window = self.window
+        batch = self.module.InventoryBatch(window.inventory_store)
+        for category, source in (('Weapons', self.weapons), ('Armor', self.armor),
+                                 ('Miscellaneous Items', self.misc), ('Magic Items', self.misc)):
+            for _ in range(self.item_count):
+                batch.add(self.random_record(category, source))
+        for gem in self.random_gems(self.item_count):
+            batch.add(self.module.InventoryRecord('Gems', gem['Name'], Decimal(gem['Value']), Decimal(gem['Weight'])), merge=True)
+        for art in self.random_art(self.item_count):
+            batch.add(self.module.InventoryRecord(
+                'Art Objects', art['Name'], Decimal(art['Value']), Decimal(art['Weight']),
+                description="Synthetic art object"
+            ))
+        batch.commit()
+
+        for currency, spin_box in window.currency_inputs.items():
+            spin_box.setValue(self.rng.randint(self.item_count, self.item_count * 1000))
+
+        self.fill_party_loot()
+        window.update_total_wealth_and_weight()
+        self.app.processEvents()
+
+    def fill_party_loot(self):
+        window = self.window
+        window.party_loot = {
+            'Coins': {currency: self.rng.randint(0, self.item_count * 100) for currency in window.currency_vars},
+            'Gems': self.random_gems(self.item_count),
+            'Art Objects': self.random_art(self.item_count),
+            'Magic Items': [self.rng.choice(self.misc).get('id', 'Unknown') for _ in range(self.item_count)]
+        }
+
+    def measure(self, name, operation, repeat, setup=None):
+        """Run operation repeat times, recording its wall time in milliseconds (events included)."""
+        durations = self.timings.setdefault(name, [])
+        for _ in range(repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            operation()
+            self.app.processEvents()
+            durations.append((time.perf_counter() - start) * 1000)
+
+    def run_totals(self, repeat):
+        self.measure('totals', self.window.update_total_wealth_and_weight, repeat)
+
+    def run_add(self, repeat):
+        window = self.window
+
+        def fill_inputs():
+            item = self.rng.choice(self.weapons)
+            window.weapon_name_input.setText(item.get('id', 'Unknown'))
+            window.weapon_value_input.setValue(self.rng.randint(1, 5000))
+            window.weapon_weight_input.setValue(self.rng.randint(0, 20))
+            window.weapon_desc_input.setText("Synthetic weapon entry")
+
+        self.measure('add_weapon', window.add_weapon_item, repeat, setup=fill_inputs)
+
+    def run_add_gems(self, repeat):
+        window = self.window
+
+        def choose_gem():
+            window.gem_type_combo.setCurrentIndex(self.rng.randrange(window.gem_type_combo.count()))
+            window.gem_quantity_input.setValue(self.rng.randint(1, 100))
+
+        self.measure('add_gems', window.add_gem_item, repeat, setup=choose_gem)
+
+    def run_treasure(self, repeat):
+        window = self.window
+        # Descriptions would go to the network; the API stand-in is timed elsewhere
+        window.fetch_description_from_api = lambda item_name, category: "Synthetic description"
+
+        def generate():
+            window.treasure = window.generate_complete_treasure('Hoard', self.rng.choice(['0-4', '5-10', '11-16', '17+']))
+
+        self.measure('add_treasure', window.add_treasure_to_inventory, repeat, setup=generate)
+
+    def run_sort(self, repeat):
+        window = self.window
+        combos = [window.weapons_sort_combo, window.armor_sort_combo, window.misc_sort_combo,
+                  window.gem_sort_combo, window.art_sort_combo, window.magic_sort_combo]
+        for combo in combos:
+            def pick_key(combo=combo):
+                combo.blockSignals(True)
+                combo.setCurrentIndex(self.rng.randrange(combo.count()))
+                combo.blockSignals(False)
+
+            def sort(combo=combo):
+                combo.currentIndexChanged.emit(combo.currentIndex())
+
+            self.measure('sort', sort, max(1, repeat // len(combos)), setup=pick_key)
+
+    def run_search(self, repeat):
+        window = self.window
+        records = list(window.inventory_store.all_records())
+        queries = []
+
+        def pick_query():
+            # A prefix of one of the words in an existing item name, as typed into the search box
+            words = self.rng.choice(records).name.split() if records else ['a']
+            word = self.rng.choice(words)
+            queries.append(word[:self.rng.randint(1, len(word))])
+
+        self.measure('search', lambda: window.inventory_search_input.setText(queries[-1]), repeat, setup=pick_query)
+        window.inventory_search_input.clear()
+
+    def run_sell(self, repeat):
+        window = self.window
+        window.tabs.setCurrentWidget(window.shop_tab)
+        categories = [window.sell_category_combo.itemText(i) for i in range(window.sell_category_combo.count())]
+
+        def select_rows():
+            window.sell_category_combo.setCurrentText(self.rng.choice(categories))
+            model = window.sell_model
+            selection = window.sell_table.selectionModel()
+            selection.clearSelection()
+            row_count = model.rowCount()
+            for row in self.rng.sample(range(row_count), min(self.sell_batch, row_count)):
+                selection.select(model.index(row, 0), selection.Select | selection.Rows)
+
+        self.measure('sell', window.sell_inventory_item, repeat, setup=select_rows)
+        window.tabs.setCurrentIndex(0)
+
+    def run_save(self, repeat):
+        self.measure('save_profile', self.window.save_profile, repeat)
+
+    def run_load(self, repeat):
+        self.measure('load_profile', self.window.load_profile, repeat)
+
+    def run_distribute(self, repeat):
+        window = self.window
+        window.member_count_input.setValue(window.member_count_input.maximum())
+        self.measure('distribute_loot', window.distribute_loot, repeat, setup=self.fill_party_loot)
+
+    def report(self):
+        rows = []
+        for name, durations in self.timings.items():
+            ordered = sorted(durations)
+            rows.append({
+                'operation': name,
+                'runs': len(ordered),
+                'p50_ms': percentile(ordered, 0.50),
+                'p90_ms': percentile(ordered, 0.90),
+                'p99_ms': percentile(ordered, 0.99),
+                'max_ms': ordered[-1] if ordered else 0.0
+            })
+        return rows
+
+
+OPERATIONS = {
+    'totals': StressRun.run_totals,
+    'add': StressRun.run_add,
+    'add_gems': StressRun.run_add_gems,
+    'treasure': StressRun.run_treasure,
+    'sort': StressRun.run_sort,
+    'search': StressRun.run_search,
+    'sell': StressRun.run_sell,
+    'save': StressRun.run_save,
+    'load': StressRun.run_load,
+    'distribute': StressRun.run_distribute
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, if the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def print_report(rows, item_count, populate_ms, memory):
+    print(f"Synthetic inventory: {item_count} entries per category (populated in {populate_ms:.0f} ms)")
+    print(f"{'operation':<16}{'runs':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for row in rows:
+        print(f"{row['operation']:<16}{row['runs']:>6}{row['p50_ms']:>10.2f}{row['p90_ms']:>10.2f}"
+              f"{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+    if memory.get('peak_rss_mb') is not None:
+        print(f"Peak RSS: {memory['peak_rss_mb']:.1f} MB")
+    if memory.get('peak_traced_mb') is not None:
+        print(f"Peak Python allocations (tracemalloc): {memory['peak_traced_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fill the wealth manager with a large synthetic inventory and time common operations offscreen."
+    )
+    parser.add_argument('--items', type=int, default=DEFAULT_ITEM_COUNT, help="Entries per inventory category")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Runs per operation")
+    parser.add_argument('--sell-batch', type=int, default=DEFAULT_SELL_BATCH, help="Rows selected per sale")
+    parser.add_argument('--operations', default=','.join(DEFAULT_OPERATIONS),
+                        help=f"Comma-separated subset of: {', '.join(OPERATIONS)}")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for the synthetic data")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="Also track peak Python allocations (slows every operation down)")
+    parser.add_argument('--api-base-url', default=None,
+                        help="Use this D&D API instead of starting the local stand-in server")
+    parser.add_argument('--json', dest='json_path', default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s %(message)s')
+    operations = [name.strip() for name in args.operations.split(',') if name.strip()]
+    unknown = [name for name in operations if name not in OPERATIONS]
+    if unknown:
+        parser.error(f"Unknown operations: {', '.join(unknown)}")
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    server = None
+    if args.api_base_url:
+        os.environ['DND_API_BASE_URL'] = args.api_base_url
+    else:
+        import dnd_api_stub_server
+        server, base_url = dnd_api_stub_server.start_server()
+        os.environ['DND_API_BASE_URL'] = base_url
+
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+
+    # The app reads its JSON data relative to the working directory
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    os.chdir(APP_DIR)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Keep the run's action journal out of the real application data directory
+        os.environ['DND_JOURNAL_DIR'] = os.path.join(temp_dir, 'journal')
+        module = load_app_module()
+        from PyQt5 import QtWidgets
+
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+        silence_dialogs(QtWidgets, os.path.join(temp_dir, 'stress_profile.json'))
+        window = module.DnDWealthManager()
+        window.show()
+
+        run = StressRun(app, module, window, args.items, args.sell_batch, seed=args.seed)
+        start = time.perf_counter()
+        run.populate()
+        populate_ms = (time.perf_counter() - start) * 1000
+
+        if 'load' in operations and 'save' not in operations:
+            window.save_profile()
+        for name in operations:
+            OPERATIONS[name](run, args.repeat)
+
+        window.close()
+
+    memory = {'peak_rss_mb': peak_rss_mb(), 'peak_traced_mb': None}
+    if args.tracemalloc:
+        memory['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    if server is not None:
+        server.shutdown()
+
+    rows = run.report()
+    print_report(rows, args.items, populate_ms, memory)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'items': args.items, 'repeat': args.repeat, 'populate_ms': populate_ms,
+                       'memory': memory, 'operations': rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())